@@ -0,0 +1,323 @@
+"""Load and soak test the full HTTP path against the mock provider.
+
+The mock provider runs in a subprocess so its sockets and memory stay out of
+the measurements. Concurrent ``run_prompt`` sessions then go through the real
+provider client, rate-limit scheduler, SSE parsing, and tools, in a temporary
+workspace. Each round reports throughput and latency percentiles, plus this
+process's RSS and open file descriptors after the round; RSS or descriptors
+that keep growing over rounds point to a leak.
+
+Usage:
+    uv run python benchmarks/loadtest.py --sessions 200 --concurrency 20
+    uv run python benchmarks/loadtest.py --rounds 20 --ttft 0.3 --tps 60
+    uv run python benchmarks/loadtest.py --protocol anthropic --error-rate 0.05
+"""
+
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Iterator
+from dataclasses import asdict, replace
+from pathlib import Path
+from typing import Any
+
+import click
+import httpx
+from rich.console import Console
+
+from llm_code.agent import use_workspace
+from llm_code.limits import RunLimits
+from llm_code.llm_code import _build_model, run_prompt
+from llm_code.mock_provider import MODEL_NAME, MockConfig, ToolCall, Turn
+from llm_code.settings import ProviderConfig, ProviderType, Settings
+
+PROVIDER = "mock"
+PROMPT = "Explain what src/module.py does."
+
+
+class _TimedOutput(io.StringIO):
+    """Console file that records when the first text arrived."""
+
+    first_write: float | None = None
+
+    def write(self, text: str) -> int:
+        if self.first_write is None and text.strip():
+            self.first_write = time.perf_counter()
+        return super().write(text)
+
+
+def default_config(*, ttft: float, tps: float, words: int) -> MockConfig:
+    """Return a script that reads a file and then answers in ``words`` words."""
+    answer = " ".join(f"word{index}" for index in range(words))
+    return MockConfig(
+        ttft=ttft,
+        tokens_per_second=tps,
+        script=(
+            Turn(tool_calls=(ToolCall("read", {"path": "src/module.py"}),)),
+            Turn(text=answer),
+        ),
+    )
+
+
+@contextlib.contextmanager
+def mock_server(config: MockConfig) -> Iterator[str]:
+    """Run the mock provider in a subprocess and yield its base URL."""
+    with tempfile.NamedTemporaryFile(
+        "w", suffix=".json", encoding="utf-8", delete=False
+    ) as script:
+        json.dump(asdict(config), script)
+    process = subprocess.Popen(
+        [sys.executable, "-m", "llm_code.mock_provider", "--script", script.name],
+        stdout=subprocess.PIPE,
+        text=True,
+    )
+    try:
+        assert process.stdout is not None
+        base_url = process.stdout.readline().strip()
+        if not base_url:
+            raise click.ClickException("The mock provider did not start.")
+        yield base_url
+    finally:
+        process.terminate()
+        process.wait(timeout=10)
+        Path(script.name).unlink(missing_ok=True)
+
+
+def make_workspace(root: Path) -> Path:
+    """Create the small repository the scripted sessions read from."""
+    (root / "src").mkdir(parents=True)
+    body = "".join(
+        f"def function_{index}():\n    return {index}\n\n" for index in range(50)
+    )
+    (root / "src" / "module.py").write_text(body, encoding="utf-8")
+    return root
+
+
+def process_resources() -> dict[str, float]:
+    """Return this process's resident memory in MiB and open descriptors."""
+    gc.collect()
+    pages = int(Path("/proc/self/statm").read_text().split()[1])
+    return {
+        "rss_mb": pages * os.sysconf("SC_PAGE_SIZE") / 2**20,
+        "fds": len(os.listdir("/proc/self/fd")),
+    }
+
+
+def percentiles(samples: list[float]) -> dict[str, float]:
+    """Return p50, p90, and p99 of ``samples``."""
+    if len(samples) < 2:
+        value = samples[0] if samples else 0.0
+        return {"p50": value, "p90": value, "p99": value}
+    cuts = statistics.quantiles(samples, n=100, method="inclusive")
+    return {"p50": cuts[49], "p90": cuts[89], "p99": cuts[98]}
+
+
+async def run_round(
+    *, model: Any, workspace: Path, sessions: int, concurrency: int
+) -> dict[str, Any]:
+    """Run ``sessions`` prompts, ``concurrency`` at a time, and time each one."""
+    slots = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+    first_tokens: list[float] = []
+    errors: list[str] = []
+
+    async def session() -> None:
+        async with slots:
+            output = _TimedOutput()
+            started = time.perf_counter()
+            try:
+                with use_workspace(workspace):
+                    await run_prompt(
+                        PROMPT,
+                        model=model,
+                        console=Console(file=output),
+                        limits=RunLimits(repeated_calls=0),
+                    )
+            except Exception as exc:
+                errors.append(f"{type(exc).__name__}: {exc}")
+                return
+            latencies.append(time.perf_counter() - started)
+            if output.first_write is not None:
+                first_tokens.append(output.first_write - started)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stderr(io.StringIO()):
+        await asyncio.gather(*(session() for _ in range(sessions)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "sessions": sessions,
+        "errors": len(errors),
+        "first_errors": errors[:3],
+        "seconds": elapsed,
+        "sessions_per_second": len(latencies) / elapsed if elapsed else 0.0,
+        "latency": percentiles(latencies),
+        "first_text": percentiles(first_tokens),
+        **process_resources(),
+    }
+
+
+async def run_load_test(
+    *,
+    base_url: str,
+    protocol: ProviderType,
+    sessions: int,
+    concurrency: int,
+    rounds: int,
+    workspace: Path,
+) -> dict[str, Any]:
+    """Drive rounds of sessions through the mock provider and collect results."""
+    settings = Settings(
+        model=f"{PROVIDER}:{MODEL_NAME}",
+        openai_api_key=None,
+        anthropic_api_key=None,
+        google_api_key=None,
+        max_concurrent_requests=concurrency,
+        providers={
+            PROVIDER: ProviderConfig(
+                type=protocol, base_url=base_url, api_key="mock", models=[MODEL_NAME]
+            )
+        },
+    )
+    model, schedulers = _build_model(settings)
+    before = process_resources()
+
+    results = []
+    for index in range(rounds):
+        result = await run_round(
+            model=model,
+            workspace=workspace,
+            sessions=sessions,
+            concurrency=concurrency,
+        )
+        results.append(result)
+        click.echo(
+            f"round {index + 1:>3}  {result['sessions_per_second']:7.1f} sessions/s  "
+            f"p50 {result['latency']['p50']:.3f}s  "
+            f"p99 {result['latency']['p99']:.3f}s  "
+            f"first text p50 {result['first_text']['p50']:.3f}s  "
+            f"rss {result['rss_mb']:.1f} MiB  fds {result['fds']}  "
+            f"errors {result['errors']}"
+        )
+
+    async with httpx.AsyncClient() as client:
+        response = await client.get(f"{base_url}/stats")
+        server = response.json()
+
+    warm = results[0]
+    return {
+        "before": before,
+        "rounds": results,
+        "rss_growth_mb": results[-1]["rss_mb"] - warm["rss_mb"],
+        "fd_growth": results[-1]["fds"] - warm["fds"],
+        "scheduler": schedulers[PROVIDER].metrics.summary(),
+        "server": server,
+    }
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option("--sessions", default=100, show_default=True, help="Sessions per round.")
+@click.option(
+    "--concurrency", default=10, show_default=True, help="Sessions run at once."
+)
+@click.option(
+    "--rounds", default=3, show_default=True, help="Rounds; raise for soak tests."
+)
+@click.option(
+    "--protocol",
+    type=click.Choice(["openai", "anthropic"]),
+    default="openai",
+    show_default=True,
+    help="Provider API the mock speaks.",
+)
+@click.option("--ttft", default=0.05, show_default=True, help="Seconds to first token.")
+@click.option("--tps", default=200.0, show_default=True, help="Tokens per second.")
+@click.option("--words", default=100, show_default=True, help="Words in the answer.")
+@click.option(
+    "--error-rate",
+    default=0.0,
+    show_default=True,
+    help="Fraction of requests that fail with 429 or 5xx.",
+)
+@click.option(
+    "--script",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="JSON mock provider config to use instead of the default script.",
+)
+@click.option(
+    "--output",
+    type=click.Path(path_type=Path),
+    default=Path("benchmarks/results/loadtest.json"),
+    show_default=True,
+    help="Where to write the JSON results.",
+)
+def main(
+    sessions: int,
+    concurrency: int,
+    rounds: int,
+    protocol: ProviderType,
+    ttft: float,
+    tps: float,
+    words: int,
+    error_rate: float,
+    script: Path | None,
+    output: Path,
+) -> None:
+    """Run concurrent sessions against the mock provider and report results."""
+    if script is not None:
+        config = MockConfig.load(script)
+    else:
+        config = default_config(ttft=ttft, tps=tps, words=words)
+    config = replace(config, error_rate=error_rate or config.error_rate)
+
+    with (
+        tempfile.TemporaryDirectory(prefix="llm-code-load-") as temp_dir,
+        mock_server(config) as base_url,
+    ):
+        workspace = make_workspace(Path(temp_dir))
+        results = asyncio.run(
+            run_load_test(
+                base_url=base_url,
+                protocol=protocol,
+                sessions=sessions,
+                concurrency=concurrency,
+                rounds=rounds,
+                workspace=workspace,
+            )
+        )
+
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "protocol": protocol,
+        "sessions": sessions,
+        "concurrency": concurrency,
+        "config": asdict(config),
+        **results,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    server = results["server"]
+    click.echo(
+        f"server: {server['requests']} requests over {server['connections']} "
+        f"connections, {server['errors']} injected errors"
+    )
+    click.echo(
+        f"growth after the first round: rss {results['rss_growth_mb']:+.1f} MiB, "
+        f"fds {results['fd_growth']:+d}"
+    )
+
+
+if __name__ == "__main__":
+    main()
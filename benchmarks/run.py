@@ -0,0 +1,347 @@
+"""Run the llm-code performance benchmarks.
+
+Each benchmark runs several times inside a freshly generated synthetic
+repository. Results are written as JSON so two commits can be compared, and a
+baseline file can be passed to fail the run when any benchmark regresses past a
+threshold.
+
+Usage:
+    uv run python benchmarks/run.py --output results.json
+    uv run python benchmarks/run.py --baseline main.json --threshold 1.25
+"""
+
+import asyncio
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import click
+from pydantic_ai.models.test import TestModel
+from synthetic import FULL_SHAPE, SMALL_SHAPE, generate_repo
+
+from llm_code.agent import (
+    _read_files,
+    _resolve_paths,
+    _run_bash,
+    _search_with_python,
+    _search_with_rg,
+    _write_file,
+)
+from llm_code.symbols import SymbolIndex
+from llm_code.tui import LlmCodeApp
+from llm_code.watcher import WorkspaceWatcher
+
+BENCHMARKS: dict[str, Callable[[], None]] = {}
+REQUIREMENTS: dict[str, str] = {}
+
+
+def benchmark(
+    name: str,
+    *,
+    requires: str | None = None,
+) -> Callable[[Callable[[], None]], Callable[[], None]]:
+    """Register a benchmark that runs with the synthetic repo as cwd.
+
+    Args:
+        name: Name used in results and with ``--only``.
+        requires: An executable that must be on PATH, or the benchmark is
+            skipped.
+    """
+
+    def register(function: Callable[[], None]) -> Callable[[], None]:
+        BENCHMARKS[name] = function
+        if requires:
+            REQUIREMENTS[name] = requires
+        return function
+
+    return register
+
+
+@benchmark("read_small_files")
+def bench_read_small_files() -> None:
+    asyncio.run(_read_files("small/**/*.py"))
+
+
+@benchmark("read_huge_files")
+def bench_read_huge_files() -> None:
+    asyncio.run(_read_files("huge/*.txt"))
+
+
+@benchmark("resolve_deep_glob")
+def bench_resolve_deep_glob() -> None:
+    _resolve_paths("deep/**/*.txt")
+
+
+@benchmark("resolve_small_glob")
+def bench_resolve_small_glob() -> None:
+    _resolve_paths("small/**/*.py")
+
+
+@benchmark("search_rg_tree", requires="rg")
+def bench_search_rg_tree() -> None:
+    _search_with_rg("needle_leaf", targets=[Path(".")], context_lines=2)
+
+
+@benchmark("search_rg_many_matches", requires="rg")
+def bench_search_rg_many_matches() -> None:
+    _search_with_rg(r"needle_42\b", targets=[Path("small")], context_lines=2)
+
+
+@benchmark("search_grep_tree", requires="grep")
+def bench_search_grep_tree() -> None:
+    subprocess.run(
+        ["grep", "-R", "-n", "-E", "needle_leaf", "."], check=False, capture_output=True
+    )
+
+
+@benchmark("search_grep_many_matches", requires="grep")
+def bench_search_grep_many_matches() -> None:
+    subprocess.run(
+        ["grep", "-R", "-n", "-E", r"needle_42\b", "small"],
+        check=False,
+        capture_output=True,
+    )
+
+
+@benchmark("search_python_tree")
+def bench_search_python_tree() -> None:
+    _search_with_python("needle_leaf", targets=[Path(".")], context_lines=2)
+
+
+@benchmark("search_python_many_matches")
+def bench_search_python_many_matches() -> None:
+    _search_with_python(r"needle_42\b", targets=[Path("small")], context_lines=2)
+
+
+@benchmark("write_files")
+def bench_write_files() -> None:
+    async def write_all() -> None:
+        for index in range(200):
+            await _write_file(f"out/file_{index:03d}.txt", "content\n" * 100)
+
+    asyncio.run(write_all())
+
+
+@benchmark("run_bash")
+def bench_run_bash() -> None:
+    async def run_all() -> None:
+        for _ in range(20):
+            await _run_bash("true")
+
+    asyncio.run(run_all())
+
+
+@benchmark("tui_append_transcript")
+def bench_tui_append_transcript() -> None:
+    async def stream() -> None:
+        app = LlmCodeApp(model=TestModel())
+        async with app.run_test():
+            for index in range(2000):
+                app._append_transcript(f"token {index} ")
+
+    asyncio.run(stream())
+
+
+@benchmark("watch_invalidation_latency")
+def bench_watch_invalidation_latency() -> None:
+    watcher = WorkspaceWatcher(Path.cwd())
+    dirty = watcher.subscribe()
+    watcher.start()
+    try:
+        dirty.drain()
+        target = Path("small/watched.py")
+        for index in range(50):
+            target.write_text(f"value = {index}\n", encoding="utf-8")
+            while not dirty.drain():
+                time.sleep(0.001)
+    finally:
+        watcher.stop()
+
+
+@benchmark("watch_start_tree")
+def bench_watch_start_tree() -> None:
+    watcher = WorkspaceWatcher(Path.cwd())
+    watcher.start()
+    watcher.stop()
+
+
+@benchmark("poll_scan_tree")
+def bench_poll_scan_tree() -> None:
+    WorkspaceWatcher(Path.cwd(), use_inotify=False)._scan()
+
+
+@benchmark("symbol_refresh_unwatched")
+def bench_symbol_refresh_unwatched() -> None:
+    index = SymbolIndex(Path.cwd())
+    index.refresh()
+    for _ in range(20):
+        index.refresh()
+
+
+@benchmark("symbol_refresh_watched")
+def bench_symbol_refresh_watched() -> None:
+    watcher = WorkspaceWatcher(Path.cwd())
+    index = SymbolIndex(Path.cwd(), changes=watcher.subscribe())
+    watcher.start()
+    try:
+        index.refresh()
+        for _ in range(20):
+            index.refresh()
+    finally:
+        watcher.stop()
+
+
+@benchmark("cli_cold_start")
+def bench_cli_cold_start() -> None:
+    subprocess.run(
+        [sys.executable, "-m", "llm_code.llm_code", "--help"],
+        check=True,
+        capture_output=True,
+    )
+
+
+def run_benchmarks(
+    names: list[str],
+    *,
+    repo: Path,
+    repeat: int,
+) -> dict[str, dict[str, float]]:
+    """Run benchmarks inside ``repo`` and return timing statistics in seconds."""
+    results: dict[str, dict[str, float]] = {}
+    previous_cwd = Path.cwd()
+    os.chdir(repo)
+    try:
+        for name in names:
+            if name in REQUIREMENTS and not shutil.which(REQUIREMENTS[name]):
+                continue
+            samples = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                BENCHMARKS[name]()
+                samples.append(time.perf_counter() - started)
+            results[name] = {
+                "median": statistics.median(samples),
+                "min": min(samples),
+                "max": max(samples),
+                "repeat": repeat,
+            }
+    finally:
+        os.chdir(previous_cwd)
+    return results
+
+
+def find_regressions(
+    results: dict[str, dict[str, float]],
+    baseline: dict[str, dict[str, float]],
+    *,
+    threshold: float,
+) -> list[str]:
+    """Return a description of each benchmark slower than baseline * threshold."""
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name]["median"]
+        if previous > 0 and stats["median"] > previous * threshold:
+            ratio = stats["median"] / previous
+            regressions.append(
+                f"{name}: {stats['median']:.4f}s vs {previous:.4f}s ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def _git_commit() -> str | None:
+    """Return the current commit hash, if available."""
+    result = subprocess.run(
+        ["git", "rev-parse", "HEAD"],
+        check=False,
+        capture_output=True,
+        text=True,
+    )
+    return result.stdout.strip() or None
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option(
+    "--only",
+    multiple=True,
+    type=click.Choice(sorted(BENCHMARKS)),
+    help="Run only the named benchmark. Repeatable.",
+)
+@click.option("--repeat", default=5, show_default=True, help="Runs per benchmark.")
+@click.option(
+    "--small",
+    is_flag=True,
+    help="Use a small synthetic repository for quick smoke runs.",
+)
+@click.option(
+    "--output",
+    type=click.Path(path_type=Path),
+    default=Path("benchmarks/results/latest.json"),
+    show_default=True,
+    help="Where to write the JSON results.",
+)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, path_type=Path),
+    default=None,
+    help="Earlier results to compare against.",
+)
+@click.option(
+    "--threshold",
+    default=1.25,
+    show_default=True,
+    help="Fail when a median exceeds the baseline median by this factor.",
+)
+def main(
+    only: tuple[str, ...],
+    repeat: int,
+    small: bool,
+    output: Path,
+    baseline: Path | None,
+    threshold: float,
+) -> None:
+    """Run benchmarks, write JSON results, and fail on regressions."""
+    shape = SMALL_SHAPE if small else FULL_SHAPE
+    names = list(only) or list(BENCHMARKS)
+
+    with tempfile.TemporaryDirectory(prefix="llm-code-bench-") as temp_dir:
+        repo = generate_repo(Path(temp_dir) / "repo", shape)
+        results = run_benchmarks(names, repo=repo, repeat=repeat)
+
+    report: dict[str, Any] = {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "shape": "small" if small else "full",
+        "results": results,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+
+    for name, stats in results.items():
+        click.echo(f"{name:<28} median {stats['median']:.4f}s  min {stats['min']:.4f}s")
+
+    if baseline is None:
+        return
+
+    previous = json.loads(baseline.read_text(encoding="utf-8"))["results"]
+    regressions = find_regressions(results, previous, threshold=threshold)
+    if regressions:
+        click.echo("Regressions:", err=True)
+        for regression in regressions:
+            click.echo(f"  {regression}", err=True)
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
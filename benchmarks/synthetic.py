@@ -0,0 +1,97 @@
+"""Generate synthetic repositories for benchmarks.
+
+The layout mixes the shapes that stress the tool layer differently: many small
+source files, a few very large files, a deep directory chain, and binary blobs.
+Generation is deterministic so results are comparable across commits.
+"""
+
+import random
+from dataclasses import dataclass
+from pathlib import Path
+
+SMALL_FILE_TEMPLATE = '''"""Module {index}."""
+
+import os
+
+
+class Widget{index}:
+    """A small synthetic class."""
+
+    def __init__(self, value: int) -> None:
+        self.value = value
+
+    def compute(self) -> int:
+        return self.value * {index}
+
+
+def helper_{index}(items: list[int]) -> int:
+    # TODO: needle_{marker}
+    return sum(items) + len(os.sep)
+'''
+
+
+@dataclass(frozen=True)
+class RepoShape:
+    """Sizes used to generate a synthetic repository."""
+
+    small_dirs: int = 40
+    small_files_per_dir: int = 50
+    huge_files: int = 3
+    huge_file_lines: int = 200_000
+    deep_levels: int = 60
+    binary_files: int = 20
+    binary_file_bytes: int = 512 * 1024
+
+
+FULL_SHAPE = RepoShape()
+SMALL_SHAPE = RepoShape(
+    small_dirs=4,
+    small_files_per_dir=10,
+    huge_files=1,
+    huge_file_lines=5_000,
+    deep_levels=10,
+    binary_files=2,
+    binary_file_bytes=4096,
+)
+
+
+def generate_repo(root: Path, shape: RepoShape = FULL_SHAPE) -> Path:
+    """Write a synthetic repository under ``root`` and return it."""
+    rng = random.Random(0)
+    root.mkdir(parents=True, exist_ok=True)
+
+    for dir_index in range(shape.small_dirs):
+        package = root / "small" / f"pkg_{dir_index:03d}"
+        package.mkdir(parents=True, exist_ok=True)
+        for file_index in range(shape.small_files_per_dir):
+            index = dir_index * shape.small_files_per_dir + file_index
+            (package / f"module_{file_index:03d}.py").write_text(
+                SMALL_FILE_TEMPLATE.format(index=index, marker=index % 97),
+                encoding="utf-8",
+            )
+
+    huge_dir = root / "huge"
+    huge_dir.mkdir(exist_ok=True)
+    for file_index in range(shape.huge_files):
+        lines = (
+            f"line {line} value={rng.randint(0, 1_000_000)} needle_{line % 997}\n"
+            for line in range(shape.huge_file_lines)
+        )
+        (huge_dir / f"huge_{file_index}.txt").write_text(
+            "".join(lines), encoding="utf-8"
+        )
+
+    deep_dir = root / "deep"
+    for level in range(shape.deep_levels):
+        deep_dir = deep_dir / f"level_{level:02d}"
+    deep_dir.mkdir(parents=True, exist_ok=True)
+    (deep_dir / "leaf.txt").write_text("needle_leaf\n", encoding="utf-8")
+
+    binary_dir = root / "blobs"
+    binary_dir.mkdir(exist_ok=True)
+    for file_index in range(shape.binary_files):
+        (binary_dir / f"blob_{file_index}.bin").write_bytes(
+            rng.randbytes(shape.binary_file_bytes)
+        )
+
+    return root
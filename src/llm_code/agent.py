@@ -2,37 +2,245 @@
 
 This module builds the coding agent and wires in a small set of tools for
 working with files and the local shell. All file access is restricted to the
-current working directory so prompts cannot read or write outside the project
-root.
+workspace root so prompts cannot read or write outside the project. The
+workspace defaults to the current working directory and can be overridden per
+task with ``use_workspace`` so concurrent runs each get their own root. When
+the last task using a root leaves it, the root's watcher and caches are
+released.
+
+The ``delegate`` tool fans independent subtasks out to child agents that run
+concurrently on the same model, so they share its provider clients and rate
+limit scheduling. Each child has its own token budget and returns a compact
+summary instead of its full transcript.
 """
 
 import asyncio
 import json
+import re
 import shutil
 import subprocess
-from pathlib import Path
+import threading
+import time
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, replace
+from pathlib import Path, PurePosixPath
 from typing import Any
 
-from pydantic_ai import Agent
-from pydantic_ai.capabilities import Thinking
+from pydantic import BaseModel
+from pydantic_ai import Agent, RunContext
+from pydantic_ai.capabilities import AbstractCapability, Thinking
+from pydantic_ai.exceptions import UsageLimitExceeded
 from pydantic_ai.models import Model
+from pydantic_ai.usage import RunUsage, UsageLimits
+
+from llm_code import pysearch
+from llm_code.checkpoint import current_checkpoint, replace_files
+from llm_code.limits import LoopGuard
+from llm_code.memory import MIB, MemoryCeiling, MemoryGuard
+from llm_code.prefetch import read_cache, release_read_cache
+from llm_code.response_cache import current_touches
+from llm_code.retrieval import release_retrieval_index, retrieval_index
+from llm_code.spill import SpillStore
+from llm_code.symbols import release_symbol_index, symbol_index
+from llm_code.usage import new_session_id
+from llm_code.watcher import release_watcher, walk_relative
 
 DEFAULT_INSTRUCTIONS = "You are an expert at coding."
+SUBAGENT_INSTRUCTIONS = (
+    "You are a sub-agent working on one part of a larger task. Stay within the "
+    "task and files you are given. Finish with a compact summary of what you "
+    "found or changed, including file paths, in at most 200 words."
+)
+MAX_SUMMARY_CHARS = 2000
+MAX_SCOPED_FILES = 200
+FILE_TYPES: dict[str, tuple[str, ...]] = {
+    "c": (".c", ".h"),
+    "cpp": (".cc", ".cpp", ".cxx", ".h", ".hh", ".hpp"),
+    "css": (".css", ".scss"),
+    "go": (".go",),
+    "html": (".htm", ".html"),
+    "java": (".java",),
+    "js": (".cjs", ".js", ".jsx", ".mjs"),
+    "json": (".json",),
+    "kotlin": (".kt", ".kts"),
+    "md": (".markdown", ".md"),
+    "py": (".py", ".pyi"),
+    "rb": (".rb",),
+    "rust": (".rs",),
+    "sh": (".bash", ".sh", ".zsh"),
+    "sql": (".sql",),
+    "toml": (".toml",),
+    "ts": (".ts", ".tsx"),
+    "yaml": (".yaml", ".yml"),
+}
+
+_workspace: ContextVar[Path | None] = ContextVar("workspace", default=None)
+_workspace_users: dict[Path, int] = {}
+_workspace_users_lock = threading.Lock()
+
+
+def workspace_root() -> Path:
+    """Return the resolved directory tools operate in.
+
+    This is the workspace set by ``use_workspace`` for the current task, or the
+    current working directory.
+    """
+    return (_workspace.get() or Path.cwd()).resolve()
+
+
+@contextmanager
+def use_workspace(path: Path) -> Iterator[Path]:
+    """Run tools rooted at ``path`` for the current task and its threads.
+
+    Uses are counted per root; when the last one ends, the root's watcher and
+    caches are released with ``release_workspace``.
+
+    Args:
+        path: The directory to use as the workspace root.
+
+    Yields:
+        The resolved workspace root.
+    """
+    root = path.resolve()
+    with _workspace_users_lock:
+        _workspace_users[root] = _workspace_users.get(root, 0) + 1
+    token = _workspace.set(root)
+    try:
+        yield root
+    finally:
+        _workspace.reset(token)
+        with _workspace_users_lock:
+            _workspace_users[root] -= 1
+            if not _workspace_users[root]:
+                del _workspace_users[root]
+                release_workspace(root)
+
+
+def release_workspace(root: Path) -> None:
+    """Stop the watcher and drop the indexes and caches kept for ``root``."""
+    release_read_cache(root)
+    release_retrieval_index(root)
+    release_symbol_index(root)
+    release_watcher(root)
+
+
+@dataclass(frozen=True)
+class SearchFilters:
+    """File filters applied by ``search`` before any line is matched."""
+
+    include: tuple[str, ...] = ()
+    exclude: tuple[str, ...] = ()
+    file_types: tuple[str, ...] = ()
+    max_filesize: int | None = None
+
+    def __post_init__(self) -> None:
+        unknown = sorted(set(self.file_types) - FILE_TYPES.keys())
+        if unknown:
+            raise ValueError(
+                f"Unknown file types {unknown}; use one of {sorted(FILE_TYPES)}"
+            )
+
+    @property
+    def active(self) -> bool:
+        """Whether any filter is set."""
+        return bool(
+            self.include
+            or self.exclude
+            or self.file_types
+            or self.max_filesize is not None
+        )
+
+    def allows(self, relative: str, size: int) -> bool:
+        """Return whether a relative POSIX file path and size pass every filter."""
+        if self.max_filesize is not None and size > self.max_filesize:
+            return False
+        path = PurePosixPath(relative)
+        if self.file_types and not any(
+            path.suffix in FILE_TYPES[name] for name in self.file_types
+        ):
+            return False
+        if self.include and not any(_glob_matches(path, g) for g in self.include):
+            return False
+        return not any(_glob_matches(path, glob) for glob in self.exclude)
+
+
+class Subtask(BaseModel):
+    """One unit of work handed to a child agent by the ``delegate`` tool."""
+
+    instructions: str
+    paths: list[str] = []
+    token_budget: int | None = None
 
 
-def build_agent(model: Model, *, effort: str | None = None) -> Agent:
+def build_agent(
+    model: Model,
+    *,
+    effort: str | None = None,
+    instructions: str = DEFAULT_INSTRUCTIONS,
+    max_subagents: int = 4,
+    repo_map_tokens: int = 0,
+    prefetch_budget_mb: int = 0,
+    spill_chars: int = 0,
+    session_id: str | None = None,
+    max_repeated_calls: int = 0,
+    memory_limit_mb: int = 0,
+) -> Agent:
     """Build an agent configured with local filesystem and shell tools.
 
     Args:
         model: The model to use for the agent.
+        effort: Optional reasoning effort.
+        instructions: System instructions for the agent.
+        max_subagents: Maximum child agents running at once for ``delegate``.
+            Zero leaves the tool out.
+        repo_map_tokens: Token budget for a map of the workspace's files and
+            symbols added to the instructions. Zero leaves the map out.
+        prefetch_budget_mb: Memory budget of the read cache that ``read`` fills
+            with the imports and tests of files it returns. Zero disables it.
+        spill_chars: Tool results larger than this many characters are stored
+            in the session's spill store and replaced by a handle that the
+            ``fetch`` tool reads. Reads of a single file are never spilled.
+            Zero keeps every result inline.
+        session_id: Session whose spill store is used; a new one by default.
+        max_repeated_calls: Stop a run once one tool call has returned the
+            same result this many times in a row. Zero disables the guard.
+        memory_limit_mb: Resident memory above which old tool results are
+            dropped from the history and caches are emptied before the next
+            model request. Zero disables the ceiling.
     """
-    capabilities = []
-    if effort:
-        capabilities = [Thinking(effort=effort)]
+    store = None
+    if spill_chars > 0:
+        session_id = session_id or new_session_id()
+        store = SpillStore.for_session(session_id)
 
-    agent = Agent(
-        model=model, instructions=DEFAULT_INSTRUCTIONS, capabilities=capabilities
-    )
+    async def spill(result: Any) -> Any:
+        if store is None:
+            return result
+        return await asyncio.to_thread(store.spill, result, limit=spill_chars)
+
+    capabilities: list[AbstractCapability[Any]] = []
+    if effort:
+        capabilities.append(Thinking(effort=effort))
+    if max_repeated_calls > 0:
+        capabilities.append(LoopGuard(max_repeated_calls))
+    if memory_limit_mb > 0:
+        capabilities.append(MemoryGuard(MemoryCeiling(memory_limit_mb * MIB)))
+
+    agent = Agent(model=model, instructions=instructions, capabilities=capabilities)
+
+    if repo_map_tokens > 0:
+
+        @agent.instructions
+        async def repo_map() -> str:
+            """Describe the workspace's files and symbols."""
+            text = await asyncio.to_thread(
+                lambda: symbol_index(workspace_root()).repo_map(
+                    token_budget=repo_map_tokens
+                )
+            )
+            return f"Repository map (signatures with line numbers):\n{text}"
 
     @agent.tool_plain
     async def read(path: str) -> dict[str, str]:
@@ -44,7 +252,10 @@ def build_agent(model: Model, *, effort: str | None = None) -> Agent:
         Returns:
             A mapping of relative file paths to file contents.
         """
-        return await _read_files(path)
+        files = await _read_files(path, prefetch_budget_mb=prefetch_budget_mb)
+        # A file asked for by name is the content the model wants; spilling it
+        # would only cost another round trip through ``fetch``.
+        return files if len(files) == 1 else await spill(files)
 
     @agent.tool_plain
     async def write(path: str, content: str) -> str:
@@ -59,25 +270,105 @@ def build_agent(model: Model, *, effort: str | None = None) -> Agent:
         """
         return await _write_file(path, content)
 
+    @agent.tool_plain
+    async def write_many(files: dict[str, str]) -> dict[str, list[str]]:
+        """Write several files at once; either all of them change or none do.
+
+        Prefer this over repeated ``write`` calls for edits spanning files.
+        Files whose contents are already identical are not rewritten.
+
+        Args:
+            files: A mapping of relative file paths to full file contents.
+
+        Returns:
+            The paths ``written`` and left ``unchanged``.
+        """
+        return await _write_files(files)
+
     @agent.tool_plain
     async def search(
-        pattern: str,
+        pattern: str | list[str],
         path: str = ".",
         context_lines: int = 2,
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        file_types: list[str] | None = None,
+        max_filesize: int | None = None,
     ) -> list[dict[str, Any]]:
         """Search files and return grouped matches with context snippets.
 
+        Pass several patterns at once to find related identifiers in one
+        search; each match then lists the patterns it matched.
+
         Args:
-            pattern: A regular expression to search for.
+            pattern: A regular expression, or a list of them, to search for.
             path: A relative file path, directory, or glob pattern to limit the
                 search.
             context_lines: Number of surrounding lines to include in each
                 snippet.
+            include: Only search files matching any of these globs, such as
+                ``src/**`` or ``*.py``.
+            exclude: Skip files matching any of these globs.
+            file_types: Only search these file types, such as ``py`` or ``ts``.
+            max_filesize: Skip files larger than this many bytes.
 
         Returns:
             A list of per-file match groups with line numbers and snippets.
         """
-        return await _search_files(pattern, path=path, context_lines=context_lines)
+        return await spill(
+            await _search_files(
+                pattern,
+                path=path,
+                context_lines=context_lines,
+                include=include,
+                exclude=exclude,
+                file_types=file_types,
+                max_filesize=max_filesize,
+            )
+        )
+
+    @agent.tool_plain
+    async def outline(path: str) -> dict[str, list[dict[str, Any]]]:
+        """List the classes, functions, and methods in files with line ranges.
+
+        Prefer this over reading whole files to find where code lives.
+
+        Args:
+            path: A relative file path or glob pattern.
+
+        Returns:
+            A mapping of relative file paths to their symbols in source order.
+        """
+        return await _outline_files(path)
+
+    @agent.tool_plain
+    async def find_symbol(name: str) -> list[dict[str, Any]]:
+        """Find where a class, function, or method is defined.
+
+        Args:
+            name: A symbol name such as ``load`` or ``Settings.load``. Falls back
+                to a case-insensitive substring match.
+
+        Returns:
+            Matching symbols with their signatures, paths, and line ranges.
+        """
+        return await _find_symbol(name)
+
+    @agent.tool_plain
+    async def retrieve(query: str, k: int = 5) -> list[dict[str, Any]]:
+        """Find the code chunks most relevant to a free-text query.
+
+        Use this for exploratory questions where the exact text to search for
+        is unknown. Results are ranked with BM25 over identifiers and words.
+
+        Args:
+            query: Words or identifiers describing what to find.
+            k: Maximum number of chunks to return.
+
+        Returns:
+            The best matching chunks with their paths, line ranges, and content.
+        """
+        return await spill(await _retrieve(query, k=k))
 
     @agent.tool_plain
     async def bash(command: str) -> dict[str, Any]:
@@ -89,23 +380,226 @@ def build_agent(model: Model, *, effort: str | None = None) -> Agent:
         Returns:
             A mapping containing the command's return code, stdout, and stderr.
         """
-        return await _run_bash(command)
+        return await spill(await _run_bash(command))
+
+    if store is not None:
+
+        @agent.tool_plain
+        async def fetch(
+            handle: str, offset: int = 0, length: int = 8000
+        ) -> dict[str, Any]:
+            """Read part of a tool result that was too large to include.
+
+            Args:
+                handle: The handle from a result marked ``spilled``.
+                offset: Character offset to start reading at.
+                length: Maximum number of characters to return.
+
+            Returns:
+                The requested slice, the total size, and the offset of the next
+                slice, or ``None`` at the end.
+            """
+            _mark_unreplayable()
+            return await asyncio.to_thread(
+                store.fetch, handle, offset=offset, length=length
+            )
+
+    if max_subagents > 0:
+        semaphore = asyncio.Semaphore(max_subagents)
+
+        @agent.tool
+        async def delegate(
+            ctx: RunContext[None], tasks: list[Subtask]
+        ) -> list[dict[str, Any]]:
+            """Run independent subtasks concurrently in child agents.
+
+            Use this to split large tasks, such as auditing many modules, into
+            parts that do not depend on each other.
+
+            Args:
+                tasks: Subtasks, each with instructions, optional relative paths
+                    or globs it is limited to, and an optional token budget.
+
+            Returns:
+                One compact result per subtask, in order.
+            """
+            child = build_agent(
+                model,
+                effort=effort,
+                instructions=f"{instructions}\n\n{SUBAGENT_INSTRUCTIONS}",
+                max_subagents=0,
+                prefetch_budget_mb=prefetch_budget_mb,
+                spill_chars=spill_chars,
+                session_id=session_id,
+                max_repeated_calls=max_repeated_calls,
+                memory_limit_mb=memory_limit_mb,
+            )
+
+            async def run_one(task: Subtask) -> dict[str, Any]:
+                async with semaphore:
+                    return await _run_subtask(child, task, usage=ctx.usage)
+
+            return list(await asyncio.gather(*(run_one(task) for task in tasks)))
 
     return agent
 
 
-async def _read_files(path: str) -> dict[str, str]:
+async def _run_subtask(
+    agent: Agent,
+    task: Subtask,
+    *,
+    usage: RunUsage,
+) -> dict[str, Any]:
+    """Run one subtask in a child agent and summarize the outcome.
+
+    Args:
+        agent: The child agent to run.
+        task: The subtask to run.
+        usage: The parent run's usage, which the child's tokens are added to.
+            The child's requests and tool calls are limited by its own run
+            and are left out, so they do not count against the parent's
+            request and tool call limits.
+
+    Returns:
+        A mapping with the status, summary or error, tokens used, and elapsed
+        seconds.
+    """
+    started = time.perf_counter()
+    child_usage = RunUsage()
+    prompt = task.instructions
+    try:
+        if task.paths:
+            files = sorted(
+                {file for path in task.paths for file in _resolve_paths(path)}
+            )
+            listing = "\n".join(str(file) for file in files[:MAX_SCOPED_FILES])
+            if len(files) > MAX_SCOPED_FILES:
+                listing += f"\n... and {len(files) - MAX_SCOPED_FILES} more"
+            prompt = f"{prompt}\n\nOnly work with these files:\n{listing}"
+
+        result = await agent.run(
+            prompt,
+            usage=child_usage,
+            usage_limits=UsageLimits(total_tokens_limit=task.token_budget),
+        )
+    except UsageLimitExceeded as exc:
+        return {
+            "status": "budget_exceeded",
+            "error": str(exc),
+            "elapsed": time.perf_counter() - started,
+        }
+    except Exception as exc:
+        return {
+            "status": "error",
+            "error": str(exc) or type(exc).__name__,
+            "elapsed": time.perf_counter() - started,
+        }
+    finally:
+        usage.incr(replace(child_usage, requests=0, tool_calls=0))
+
+    summary = str(result.output)
+    if len(summary) > MAX_SUMMARY_CHARS:
+        summary = f"{summary[: MAX_SUMMARY_CHARS - 1]}…"
+    return {
+        "status": "ok",
+        "summary": summary,
+        "tokens": child_usage.total_tokens,
+        "elapsed": time.perf_counter() - started,
+    }
+
+
+async def _outline_files(path: str) -> dict[str, list[dict[str, Any]]]:
+    """Return the symbols of each file selected by a path or glob.
+
+    Args:
+        path: A relative file path or glob pattern.
+
+    Returns:
+        A mapping of relative file paths to symbol records.
+    """
+    _mark_unreplayable()
+    files = _resolve_paths(path)
+    index = symbol_index(workspace_root())
+
+    def outline_sync() -> dict[str, list[dict[str, Any]]]:
+        return {
+            file.as_posix(): [
+                symbol.as_dict() for symbol in index.outline(file.as_posix())
+            ]
+            for file in files
+        }
+
+    return await asyncio.to_thread(outline_sync)
+
+
+async def _find_symbol(name: str) -> list[dict[str, Any]]:
+    """Look up symbols by name in the workspace index.
+
+    Args:
+        name: A plain or class-qualified symbol name.
+
+    Returns:
+        Symbol records for the matching definitions.
+    """
+    _mark_unreplayable()
+    index = symbol_index(workspace_root())
+    symbols = await asyncio.to_thread(index.find, name)
+    return [symbol.as_dict() for symbol in symbols]
+
+
+async def _retrieve(query: str, *, k: int = 5) -> list[dict[str, Any]]:
+    """Rank workspace chunks against a query with the local BM25 index.
+
+    Args:
+        query: Free-text query.
+        k: Maximum number of chunks to return.
+
+    Returns:
+        Chunk records ordered from most to least relevant.
+    """
+    _mark_unreplayable()
+    index = retrieval_index(workspace_root())
+    return await asyncio.to_thread(index.search, query, k=max(1, min(k, 50)))
+
+
+def _mark_unreplayable() -> None:
+    """Keep the current run out of the response cache.
+
+    Tools that scan the workspace, or return results the touch log cannot
+    check, depend on files the run never recorded reading.
+    """
+    if (touches := current_touches()) is not None:
+        touches.replayable = False
+
+
+async def _read_files(path: str, *, prefetch_budget_mb: int = 0) -> dict[str, str]:
     """Read one or more files selected by a relative path or glob pattern.
 
     Args:
         path: A relative file path or glob pattern rooted at the current working
             directory.
+        prefetch_budget_mb: Serve reads from the workspace read cache with this
+            budget and prefetch related files into it. Zero reads from disk.
 
     Returns:
         A mapping of relative file paths to their UTF-8 contents.
     """
+    if not (workspace_root() / path).is_file():
+        _mark_unreplayable()
     files = _resolve_paths(path)
-    return await asyncio.to_thread(_read_files_sync, files)
+    if prefetch_budget_mb <= 0:
+        contents = await asyncio.to_thread(_read_files_sync, files)
+    else:
+        cache = read_cache(workspace_root(), budget=prefetch_budget_mb * 1024 * 1024)
+        contents = await asyncio.to_thread(
+            lambda: {str(file): cache.read(file.as_posix()) for file in files}
+        )
+        cache.prefetch([file.as_posix() for file in files])
+
+    if (touches := current_touches()) is not None:
+        for file, content in contents.items():
+            touches.read(Path(file).as_posix(), content)
+    return contents
 
 
 async def _write_file(path: str, content: str) -> str:
@@ -122,30 +616,65 @@ async def _write_file(path: str, content: str) -> str:
     return await asyncio.to_thread(_write_file_sync, target, content)
 
 
+async def _write_files(files: dict[str, str]) -> dict[str, list[str]]:
+    """Write several UTF-8 files within the current working directory at once.
+
+    Every path is checked before anything is written, and the writes succeed
+    or fail together.
+
+    Args:
+        files: Full file contents by relative path.
+
+    Returns:
+        The relative paths ``written`` and left ``unchanged``.
+    """
+    targets = {_resolve_relative_path(path): content for path, content in files.items()}
+    return await asyncio.to_thread(_write_files_sync, targets)
+
+
 async def _search_files(
-    pattern: str,
+    pattern: str | list[str],
     *,
     path: str = ".",
     context_lines: int = 2,
+    include: list[str] | None = None,
+    exclude: list[str] | None = None,
+    file_types: list[str] | None = None,
+    max_filesize: int | None = None,
 ) -> list[dict[str, Any]]:
-    """Search files using ``rg`` when available and ``grep`` otherwise.
+    """Search files using ``rg`` when available and a built-in engine otherwise.
+
+    All patterns and filters go to a single search, so the tree is walked once.
 
     Args:
-        pattern: The regular expression to search for.
+        pattern: The regular expression, or list of expressions, to search for.
         path: A relative path, directory, or glob pattern used to restrict the
             search scope.
         context_lines: The number of lines of context to include before and
             after each matching line.
+        include: Globs a file must match one of to be searched.
+        exclude: Globs of files to skip.
+        file_types: File type names from ``FILE_TYPES`` to search.
+        max_filesize: Largest file size, in bytes, to search.
 
     Returns:
-        A list of grouped match records keyed by relative file path.
+        A list of grouped match records keyed by relative file path. With more
+        than one pattern, each match lists the patterns it matched.
     """
+    filters = SearchFilters(
+        include=tuple(include or ()),
+        exclude=tuple(exclude or ()),
+        file_types=tuple(file_types or ()),
+        max_filesize=max_filesize,
+    )
+    _mark_unreplayable()
     targets = _resolve_search_targets(path)
     return await asyncio.to_thread(
         _search_files_sync,
         pattern,
         targets,
         context_lines,
+        filters,
     )
 
 
@@ -170,11 +699,12 @@ def _read_files_sync(files: list[Path]) -> dict[str, str]:
     Returns:
         A mapping of file paths to file contents.
     """
-    return {str(file): file.read_text(encoding="utf-8") for file in files}
+    root = workspace_root()
+    return {str(file): (root / file).read_text(encoding="utf-8") for file in files}
 
 
 def _write_file_sync(target: Path, content: str) -> str:
-    """Synchronously write text to a file, creating parent directories.
+    """Synchronously replace a file's text, creating parent directories.
 
     Args:
         target: The relative file path to write.
@@ -183,22 +713,74 @@ def _write_file_sync(target: Path, content: str) -> str:
     Returns:
         A confirmation message describing the written file.
     """
-    target.parent.mkdir(parents=True, exist_ok=True)
-    target.write_text(content, encoding="utf-8")
-    return f"Wrote {target}"
+    if _write_files_sync({target: content})["written"]:
+        return f"Wrote {target}"
+    return f"Unchanged {target}"
+
+
+def _write_files_sync(files: dict[Path, str]) -> dict[str, list[str]]:
+    """Synchronously write several files, all or none, skipping unchanged ones.
+
+    Files whose contents already match are left alone, so watchers and
+    incremental builds do not see a change. The rest are saved to the current
+    checkpoint and then replaced together; if any write fails, none of them
+    takes effect.
+
+    Args:
+        files: Full file contents by relative path.
+
+    Returns:
+        The relative paths ``written`` and left ``unchanged``.
+    """
+    root = workspace_root()
+    touches = current_touches()
+    checkpoint = current_checkpoint()
+    changed: dict[Path, str] = {}
+    summary: dict[str, list[str]] = {"written": [], "unchanged": []}
+    for target, content in files.items():
+        destination = root / target
+        try:
+            previous = destination.read_bytes()
+        except FileNotFoundError:
+            previous = None
+        except OSError:
+            previous = None
+            if touches is not None:
+                touches.replayable = False
+
+        if touches is not None:
+            try:
+                text = None if previous is None else previous.decode("utf-8")
+            except UnicodeDecodeError:
+                touches.replayable = False
+                text = None
+            touches.write(target.as_posix(), text, content)
+
+        if previous == content.encode("utf-8"):
+            summary["unchanged"].append(target.as_posix())
+            continue
+        if checkpoint is not None:
+            checkpoint.save(target.as_posix())
+        changed[destination] = content
+        summary["written"].append(target.as_posix())
+
+    replace_files(changed)
+    return summary
 
 
 def _search_files_sync(
-    pattern: str,
+    pattern: str | list[str],
     targets: list[Path],
     context_lines: int,
+    filters: SearchFilters | None = None,
 ) -> list[dict[str, Any]]:
-    """Synchronously search files with the best available external tool.
+    """Synchronously search files with ``rg``, or the built-in engine without it.
 
     Args:
-        pattern: The regular expression to search for.
+        pattern: The regular expression, or list of expressions, to search for.
         targets: Relative files or directories to search.
         context_lines: Number of surrounding lines to include in each snippet.
+        filters: Optional file filters.
 
     Returns:
         A list of grouped match records.
@@ -208,12 +790,14 @@ def _search_files_sync(
             pattern,
             targets=targets,
             context_lines=context_lines,
+            filters=filters,
         )
 
-    return _search_with_grep(
+    return _search_with_python(
         pattern,
         targets=targets,
         context_lines=context_lines,
+        filters=filters,
     )
 
 
@@ -226,13 +810,14 @@ def _run_bash_sync(command: str) -> dict[str, Any]:
     Returns:
         A mapping with the subprocess return code, stdout, and stderr.
     """
+    _mark_unreplayable()
     result = subprocess.run(
         command,
         shell=True,
         check=False,
         capture_output=True,
         text=True,
-        cwd=Path.cwd(),
+        cwd=workspace_root(),
     )
     return {
         "returncode": result.returncode,
@@ -242,17 +827,19 @@ def _run_bash_sync(command: str) -> dict[str, Any]:
 
 
 def _search_with_rg(
-    pattern: str,
+    pattern: str | list[str],
     *,
     targets: list[Path],
     context_lines: int,
+    filters: SearchFilters | None = None,
 ) -> list[dict[str, Any]]:
     """Search with ripgrep and convert matches into grouped result records.
 
     Args:
-        pattern: The regular expression to search for.
+        pattern: The regular expression, or list of expressions, to search for.
         targets: Relative files or directories to search.
         context_lines: Number of surrounding lines to include in each snippet.
+        filters: Optional file filters, passed to ``rg`` as flags.
 
     Returns:
         A list of grouped match records.
@@ -260,12 +847,27 @@ def _search_with_rg(
     Raises:
         RuntimeError: If ``rg`` exits with an unexpected failure code.
     """
-    command = ["rg", "-n", "--json", pattern, *[str(target) for target in targets]]
+    patterns = _as_patterns(pattern)
+    command = ["rg", "-n", "--json"]
+    if filters is not None:
+        command.extend(f"--glob={glob}" for glob in filters.include)
+        command.extend(f"--glob=!{glob}" for glob in filters.exclude)
+        for name in filters.file_types:
+            command.extend(
+                [f"--type-add=llm{name}:*{suffix}" for suffix in FILE_TYPES[name]]
+            )
+            command.append(f"--type=llm{name}")
+        if filters.max_filesize is not None:
+            command.append(f"--max-filesize={filters.max_filesize}")
+    for item in patterns:
+        command.extend(["-e", item])
+    command.extend(["--", *[str(target) for target in targets]])
     result = subprocess.run(
         command,
         check=False,
         capture_output=True,
         text=True,
+        cwd=workspace_root(),
     )
 
     if result.returncode not in {0, 1}:
@@ -285,54 +887,106 @@ def _search_with_rg(
             file_path=file_path,
             line_number=line_number,
             context_lines=context_lines,
+            patterns=_tag_patterns(patterns, data["lines"].get("text", "")),
         )
 
     return _format_search_results(grouped_matches)
 
 
-def _search_with_grep(
-    pattern: str,
+def _search_with_python(
+    pattern: str | list[str],
     *,
     targets: list[Path],
     context_lines: int,
+    filters: SearchFilters | None = None,
 ) -> list[dict[str, Any]]:
-    """Search with grep and convert matches into grouped result records.
+    """Search with the built-in parallel engine and group its matches.
+
+    The targets are walked once, pruning vendored and hidden directories, and
+    the files that pass the filters are searched by ``llm_code.pysearch``.
 
     Args:
-        pattern: The regular expression to search for.
+        pattern: The regular expression, or list of expressions, to search for.
         targets: Relative files or directories to search.
         context_lines: Number of surrounding lines to include in each snippet.
+        filters: Optional file filters.
 
     Returns:
         A list of grouped match records.
-
-    Raises:
-        RuntimeError: If ``grep`` exits with an unexpected failure code.
     """
-    command = ["grep", "-R", "-n", "-E", pattern, *[str(target) for target in targets]]
-    result = subprocess.run(
-        command,
-        check=False,
-        capture_output=True,
-        text=True,
-    )
-
-    if result.returncode not in {0, 1}:
-        raise RuntimeError(result.stderr.strip() or "grep failed")
-
+    patterns = _as_patterns(pattern)
+    files = _filtered_files(targets, filters or SearchFilters())
     grouped_matches: dict[str, list[dict[str, Any]]] = {}
-    for line in result.stdout.splitlines():
-        file_path, line_number, _matched_text = line.split(":", maxsplit=2)
+    for match in pysearch.search_files(patterns, files, workspace_root()):
         _add_match(
             grouped_matches,
-            file_path=_normalize_result_path(file_path),
-            line_number=int(line_number),
+            file_path=match.path,
+            line_number=match.line_number,
             context_lines=context_lines,
+            patterns=list(match.patterns) if len(patterns) > 1 else None,
         )
 
     return _format_search_results(grouped_matches)
 
 
+def _filtered_files(targets: list[Path], filters: SearchFilters) -> list[str]:
+    """Walk the targets once and return the relative files that pass filters."""
+    root = workspace_root()
+    files: list[str] = []
+    for target in targets:
+        start = root / target
+        if start.is_file():
+            candidates: Iterable[str] = [start.relative_to(root).as_posix()]
+        else:
+            candidates = walk_relative(root, start)
+        if not filters.active:
+            files.extend(candidates)
+            continue
+        for relative in candidates:
+            size = 0
+            if filters.max_filesize is not None:
+                try:
+                    size = (root / relative).stat().st_size
+                except OSError:
+                    continue
+            if filters.allows(relative, size):
+                files.append(relative)
+    return files
+
+
+def _as_patterns(pattern: str | list[str]) -> list[str]:
+    """Return the search patterns as a non-empty list."""
+    patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+    if not patterns:
+        raise ValueError("At least one search pattern is required")
+    return patterns
+
+
+def _tag_patterns(patterns: list[str], text: str) -> list[str] | None:
+    """Return which patterns a matched line contains, or None for one pattern.
+
+    Patterns Python cannot compile, or lines none of them match under Python's
+    regex dialect, are tagged with every pattern.
+    """
+    if len(patterns) == 1:
+        return None
+    matched = []
+    for item in patterns:
+        try:
+            if re.search(item, text):
+                matched.append(item)
+        except re.error:
+            matched.append(item)
+    return matched or list(patterns)
+
+
+def _glob_matches(path: PurePosixPath, glob: str) -> bool:
+    """Match a relative path like an ``rg`` glob: by file name without a slash."""
+    if "/" not in glob:
+        return PurePosixPath(path.name).full_match(glob)
+    return path.full_match(glob.removeprefix("/"))
+
+
 def _resolve_paths(path: str) -> list[Path]:
     """Resolve a relative file path or glob pattern into a sorted file list.
 
@@ -344,13 +998,13 @@ def _resolve_paths(path: str) -> list[Path]:
     """
     _validate_relative_path_input(path)
 
-    candidate = Path(path)
-    if candidate.is_file():
+    root = workspace_root()
+    if (root / path).is_file():
         return [_resolve_relative_path(path)]
 
     files = sorted(
-        _ensure_within_cwd(file.resolve()).relative_to(Path.cwd().resolve())
-        for file in Path().glob(path)
+        _ensure_within_cwd(file.resolve()).relative_to(root)
+        for file in root.glob(path)
         if file.is_file()
     )
     return files
@@ -363,20 +1017,21 @@ def _resolve_search_targets(path: str) -> list[Path]:
         path: A relative path, directory, or glob pattern.
 
     Returns:
-        A list of relative paths suitable for passing to ``rg`` or ``grep``.
+        A list of relative paths suitable for passing to a search backend.
     """
     if path in {"", "."}:
         return [Path(".")]
 
     _validate_relative_path_input(path)
+    root = workspace_root()
     candidate = Path(path)
-    if candidate.exists():
-        resolved = _ensure_within_cwd(candidate.resolve())
-        return [resolved.relative_to(Path.cwd().resolve())]
+    if (root / candidate).exists():
+        resolved = _ensure_within_cwd((root / candidate).resolve())
+        return [resolved.relative_to(root)]
 
     matches = sorted(
-        _ensure_within_cwd(match.resolve()).relative_to(Path.cwd().resolve())
-        for match in Path().glob(path)
+        _ensure_within_cwd(match.resolve()).relative_to(root)
+        for match in root.glob(path)
     )
     if matches:
         return matches
@@ -394,8 +1049,9 @@ def _resolve_relative_path(path: str) -> Path:
         The normalized relative path.
     """
     _validate_relative_path_input(path)
-    resolved = _ensure_within_cwd(Path(path).resolve())
-    return resolved.relative_to(Path.cwd().resolve())
+    root = workspace_root()
+    resolved = _ensure_within_cwd((root / path).resolve())
+    return resolved.relative_to(root)
 
 
 def _validate_relative_path_input(path: str) -> None:
@@ -426,7 +1082,7 @@ def _ensure_within_cwd(path: Path) -> Path:
         ValueError: If the resolved path points outside the current working
             directory.
     """
-    cwd = Path.cwd().resolve()
+    cwd = workspace_root()
 
     try:
         path.relative_to(cwd)
@@ -457,6 +1113,7 @@ def _add_match(
     file_path: str,
     line_number: int,
     context_lines: int,
+    patterns: list[str] | None = None,
 ) -> None:
     """Add one search hit and its snippet to the grouped result mapping.
 
@@ -465,15 +1122,17 @@ def _add_match(
         file_path: Relative path of the file containing the match.
         line_number: One-based line number reported by the search tool.
         context_lines: Number of surrounding lines to include in the snippet.
+        patterns: The patterns the line matched, for multi-pattern searches.
     """
     snippet = _build_snippet(
         Path(file_path),
         line_number=line_number,
         context_lines=context_lines,
     )
-    grouped_matches.setdefault(file_path, []).append(
-        {"line_number": line_number, "snippet": snippet}
-    )
+    match: dict[str, Any] = {"line_number": line_number, "snippet": snippet}
+    if patterns is not None:
+        match["patterns"] = patterns
+    grouped_matches.setdefault(file_path, []).append(match)
 
 
 def _format_search_results(
@@ -505,7 +1164,7 @@ def _build_snippet(path: Path, *, line_number: int, context_lines: int) -> str:
     Returns:
         A newline-delimited snippet with line numbers prefixed.
     """
-    lines = path.read_text(encoding="utf-8").splitlines()
+    lines = (workspace_root() / path).read_text(encoding="utf-8").splitlines()
     start = max(1, line_number - context_lines)
     end = min(len(lines), line_number + context_lines)
 
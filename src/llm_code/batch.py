@@ -0,0 +1,296 @@
+"""Run many prompts concurrently in one process.
+
+A batch file is JSONL with one item per line::
+
+    {"id": "hints-utils", "prompt": "add type hints to utils.py", "cwd": "repos/a"}
+
+Items share one agent and therefore one set of provider HTTP clients, which
+pools connections instead of opening fresh ones per process. Each item runs in
+its own workspace with a timeout and retries, and results are appended to a
+progress file so an interrupted batch resumes where it stopped.
+"""
+
+import asyncio
+import random
+import time
+from collections.abc import Callable
+from pathlib import Path
+
+import httpx
+from pydantic import BaseModel
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelAPIError, UsageLimitExceeded
+from pydantic_ai.models import Model
+
+from llm_code.agent import build_agent, use_workspace
+from llm_code.checkpoint import CheckpointStore, use_checkpoint
+from llm_code.limits import RunLimits, run_deadline
+from llm_code.usage import UsageLedger, find_project_root
+
+
+class BatchItem(BaseModel):
+    """One prompt to run as part of a batch."""
+
+    id: str
+    prompt: str
+    cwd: Path | None = None
+    timeout: float | None = None
+
+
+class BatchResult(BaseModel):
+    """The outcome of one batch item, as stored in the progress file."""
+
+    id: str
+    status: str
+    output: str | None = None
+    error: str | None = None
+    attempts: int = 0
+    elapsed: float = 0.0
+
+
+def load_batch(path: Path) -> list[BatchItem]:
+    """Load batch items from a JSONL file.
+
+    A relative ``cwd`` is resolved against the batch file's directory.
+
+    Raises:
+        ValueError: If two items share an id.
+    """
+    items = [
+        BatchItem.model_validate_json(line)
+        for line in path.read_text(encoding="utf-8").splitlines()
+        if line.strip()
+    ]
+    seen: set[str] = set()
+    for item in items:
+        if item.id in seen:
+            raise ValueError(f"Duplicate batch item id: {item.id}")
+        seen.add(item.id)
+        if item.cwd is not None and not item.cwd.is_absolute():
+            item.cwd = path.parent / item.cwd
+    return items
+
+
+def load_progress(path: Path) -> dict[str, BatchResult]:
+    """Return the latest recorded result per item id from a progress file."""
+    if not path.is_file():
+        return {}
+
+    results: dict[str, BatchResult] = {}
+    for line in path.read_text(encoding="utf-8").splitlines():
+        if line.strip():
+            result = BatchResult.model_validate_json(line)
+            results[result.id] = result
+    return results
+
+
+async def run_batch(
+    items: list[BatchItem],
+    *,
+    model: Model,
+    progress_path: Path,
+    concurrency: int = 4,
+    timeout: float | None = None,
+    retries: int = 2,
+    ledger: UsageLedger | None = None,
+    session_id: str | None = None,
+    on_result: Callable[[BatchResult], None] | None = None,
+    repo_map_tokens: int = 0,
+    prefetch_budget_mb: int = 0,
+    spill_chars: int = 0,
+    limits: RunLimits | None = None,
+    checkpoints: CheckpointStore | None = None,
+) -> list[BatchResult]:
+    """Run batch items concurrently, skipping items already completed.
+
+    Args:
+        items: The prompts to run.
+        model: The model shared by every item.
+        progress_path: JSONL file that completed results are appended to.
+        concurrency: Maximum number of items running at once.
+        timeout: Default per-item timeout in seconds.
+        retries: Extra attempts after a timeout or a transport or rate-limit
+            error.
+        ledger: Optional usage ledger to record each item's usage.
+        session_id: Session identifier recorded with usage.
+        on_result: Called with each item's result as it finishes.
+        repo_map_tokens: Token budget for the repository map in instructions.
+        prefetch_budget_mb: Read cache budget for prefetching related files.
+        spill_chars: Size above which tool results are replaced by handles.
+        limits: Per-item run limits. Items stopped by a limit are not retried.
+        checkpoints: Store that saves files before each attempt changes them.
+
+    Returns:
+        The results of the items run in this invocation.
+    """
+    completed = {
+        item_id
+        for item_id, result in load_progress(progress_path).items()
+        if result.status == "ok"
+    }
+    pending = [item for item in items if item.id not in completed]
+
+    limits = limits or RunLimits()
+    agent = build_agent(
+        model,
+        repo_map_tokens=repo_map_tokens,
+        prefetch_budget_mb=prefetch_budget_mb,
+        spill_chars=spill_chars,
+        session_id=session_id,
+        max_repeated_calls=limits.repeated_calls,
+        memory_limit_mb=limits.memory_mb,
+    )
+    semaphore = asyncio.Semaphore(concurrency)
+    progress_path.parent.mkdir(parents=True, exist_ok=True)
+
+    async def run_one(item: BatchItem) -> BatchResult:
+        async with semaphore:
+            result = await _run_with_retries(
+                agent,
+                item,
+                model_name=model.model_name,
+                timeout=item.timeout or timeout,
+                retries=retries,
+                ledger=ledger,
+                session_id=session_id,
+                limits=limits,
+                checkpoints=checkpoints,
+            )
+        with progress_path.open("a", encoding="utf-8") as progress_file:
+            progress_file.write(result.model_dump_json() + "\n")
+        if on_result is not None:
+            on_result(result)
+        return result
+
+    return list(await asyncio.gather(*(run_one(item) for item in pending)))
+
+
+async def _run_with_retries(
+    agent: Agent,
+    item: BatchItem,
+    *,
+    model_name: str,
+    timeout: float | None,
+    retries: int,
+    ledger: UsageLedger | None,
+    session_id: str | None,
+    limits: RunLimits,
+    checkpoints: CheckpointStore | None = None,
+) -> BatchResult:
+    """Run one item, retrying transient failures with jittered exponential backoff.
+
+    Timeouts and transport or rate-limit errors are retried, as the scheduler
+    does. Any other error, such as a missing working directory, would fail the
+    same way again, and a run stopped by a limit would likely loop again, so
+    neither is retried.
+    """
+    started = time.perf_counter()
+    error: str | None = None
+
+    for attempt in range(1, retries + 2):
+        try:
+            async with asyncio.timeout(timeout):
+                output = await _run_item(
+                    agent,
+                    item,
+                    model_name=model_name,
+                    ledger=ledger,
+                    session_id=session_id,
+                    limits=limits,
+                    checkpoints=checkpoints,
+                )
+        except TimeoutError:
+            error = f"Timed out after {timeout}s"
+        except UsageLimitExceeded as exc:
+            return BatchResult(
+                id=item.id,
+                status="error",
+                error=f"Stopped early: {exc}",
+                attempts=attempt,
+                elapsed=time.perf_counter() - started,
+            )
+        except (ModelAPIError, httpx.TransportError) as exc:
+            error = str(exc) or type(exc).__name__
+        except Exception as exc:
+            return BatchResult(
+                id=item.id,
+                status="error",
+                error=str(exc) or type(exc).__name__,
+                attempts=attempt,
+                elapsed=time.perf_counter() - started,
+            )
+        else:
+            return BatchResult(
+                id=item.id,
+                status="ok",
+                output=output,
+                attempts=attempt,
+                elapsed=time.perf_counter() - started,
+            )
+
+        if attempt <= retries:
+            await asyncio.sleep(random.uniform(0, 2**attempt))
+
+    return BatchResult(
+        id=item.id,
+        status="error",
+        error=error,
+        attempts=retries + 1,
+        elapsed=time.perf_counter() - started,
+    )
+
+
+async def _run_item(
+    agent: Agent,
+    item: BatchItem,
+    *,
+    model_name: str,
+    ledger: UsageLedger | None,
+    session_id: str | None,
+    limits: RunLimits,
+    checkpoints: CheckpointStore | None = None,
+) -> str:
+    """Run one item's prompt inside its workspace and return the final text."""
+    workspace = item.cwd or Path.cwd()
+    if not workspace.is_dir():
+        raise ValueError(f"Working directory does not exist: {workspace}")
+
+    started = time.perf_counter()
+    with use_workspace(workspace) as root:
+        checkpoint = None
+        if checkpoints is not None:
+            checkpoint = await asyncio.to_thread(checkpoints.begin, root, item.prompt)
+        async with run_deadline(limits.seconds):
+            with use_checkpoint(checkpoint):
+                result = await agent.run(
+                    item.prompt, usage_limits=limits.usage_limits()
+                )
+
+    if ledger is not None:
+        ledger.record_run(
+            model=model_name,
+            messages=result.new_messages(),
+            usage=result.usage(),
+            duration_seconds=time.perf_counter() - started,
+            project=find_project_root(root),
+            session_id=session_id,
+        )
+    return str(result.output)
+
+
+def summarize_results(results: list[BatchResult]) -> dict[str, int]:
+    """Return counts of successful and failed results."""
+    succeeded = sum(result.status == "ok" for result in results)
+    return {"ok": succeeded, "error": len(results) - succeeded}
+
+
+def default_progress_path(batch_path: Path) -> Path:
+    """Return the progress file stored next to a batch file."""
+    return batch_path.with_name(f"{batch_path.name}.progress.jsonl")
+
+
+def format_result(result: BatchResult) -> str:
+    """Format one result as a compact status line."""
+    if result.status == "ok":
+        return f"[ok] {result.id} ({result.elapsed:.1f}s)"
+    return f"[error] {result.id} after {result.attempts} attempts: {result.error}"
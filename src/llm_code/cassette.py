@@ -0,0 +1,254 @@
+"""Record and replay model traffic for offline runs and benchmarks.
+
+A cassette is a JSON file holding every model response from a real run along
+with the stream chunks that produced it and when each chunk arrived. Replaying
+a cassette through a ``FunctionModel`` exercises the agent, tool, and rendering
+paths deterministically without network access.
+"""
+
+import asyncio
+import json
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, Literal
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelMessagesTypeAdapter,
+    ModelResponse,
+    ModelResponseStreamEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    TextPart,
+    TextPartDelta,
+    ThinkingPart,
+    ThinkingPartDelta,
+    ToolCallPart,
+    ToolCallPartDelta,
+)
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.function import (
+    AgentInfo,
+    DeltaThinkingPart,
+    DeltaToolCall,
+    FunctionModel,
+)
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+REPLAY_PREFIX = "replay:"
+CASSETTE_VERSION = 1
+
+ReplayLatency = Literal["original", "zero"]
+
+
+class Cassette:
+    """An ordered list of recorded model exchanges backed by a JSON file."""
+
+    def __init__(self, path: Path, exchanges: list[dict[str, Any]] | None = None):
+        self.path = path
+        self.exchanges = exchanges or []
+        self._cursor = 0
+
+    @classmethod
+    def load(cls, path: Path) -> Cassette:
+        """Load a cassette from disk.
+
+        Raises:
+            ValueError: If the file was written by an unsupported version.
+        """
+        data = json.loads(path.read_text(encoding="utf-8"))
+        if data.get("version") != CASSETTE_VERSION:
+            raise ValueError(f"Unsupported cassette version in {path}")
+        return cls(path, data["exchanges"])
+
+    def append(self, response: ModelResponse, chunks: list[dict[str, Any]]) -> None:
+        """Add one exchange and rewrite the cassette file."""
+        (serialized,) = ModelMessagesTypeAdapter.dump_python([response], mode="json")
+        self.exchanges.append({"response": serialized, "chunks": chunks})
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.write_text(
+            json.dumps({"version": CASSETTE_VERSION, "exchanges": self.exchanges}),
+            encoding="utf-8",
+        )
+
+    def next_exchange(self) -> dict[str, Any]:
+        """Return the next recorded exchange in order.
+
+        Raises:
+            RuntimeError: If every recorded exchange has been replayed.
+        """
+        if self._cursor >= len(self.exchanges):
+            raise RuntimeError(f"Cassette {self.path} has no more recorded responses")
+        exchange = self.exchanges[self._cursor]
+        self._cursor += 1
+        return exchange
+
+
+class RecordingModel(WrapperModel):
+    """Model wrapper that writes every response and its stream timing to a cassette."""
+
+    def __init__(self, wrapped: Model, cassette: Cassette) -> None:
+        super().__init__(wrapped)
+        self.cassette = cassette
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        """Forward a request and record its response."""
+        response = await super().request(
+            messages, model_settings, model_request_parameters
+        )
+        self.cassette.append(response, [])
+        return response
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+        run_context: RunContext[Any] | None = None,
+    ) -> AsyncIterator[StreamedResponse]:
+        """Forward a streamed request and record each chunk with its arrival time."""
+        started = time.perf_counter()
+        chunks: list[dict[str, Any]] = []
+
+        async with super().request_stream(
+            messages, model_settings, model_request_parameters, run_context
+        ) as response_stream:
+            events = aiter(response_stream)
+
+            async def recording_iterator() -> AsyncIterator[ModelResponseStreamEvent]:
+                async for event in events:
+                    chunk = _chunk_from_event(event)
+                    if chunk is not None:
+                        chunk["at"] = time.perf_counter() - started
+                        chunks.append(chunk)
+                    yield event
+
+            response_stream._event_iterator = recording_iterator()
+            yield response_stream
+
+        self.cassette.append(response_stream.get(), chunks)
+
+
+def build_replay_model(
+    cassette: Cassette,
+    *,
+    latency: ReplayLatency = "original",
+) -> FunctionModel:
+    """Build a model that replays a cassette's responses in order.
+
+    Args:
+        cassette: The recorded exchanges to replay.
+        latency: ``"original"`` to reproduce recorded chunk timing, or
+            ``"zero"`` to emit chunks as fast as possible.
+    """
+
+    async def respond(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        return _load_response(cassette.next_exchange()["response"])
+
+    async def stream(
+        _messages: list[ModelMessage], _info: AgentInfo
+    ) -> AsyncIterator[Any]:
+        exchange = cassette.next_exchange()
+        chunks = exchange["chunks"] or _chunks_from_response(exchange["response"])
+        elapsed = 0.0
+        for chunk in chunks:
+            if latency == "original" and chunk.get("at", 0.0) > elapsed:
+                await asyncio.sleep(chunk["at"] - elapsed)
+                elapsed = chunk["at"]
+            yield _delta_from_chunk(chunk)
+
+    return FunctionModel(
+        respond,
+        stream_function=stream,
+        model_name=f"{REPLAY_PREFIX}{cassette.path.name}",
+    )
+
+
+def _chunk_from_event(event: ModelResponseStreamEvent) -> dict[str, Any] | None:
+    """Convert a stream event into a JSON-serializable chunk record."""
+    if isinstance(event, PartStartEvent):
+        part = event.part
+        if isinstance(part, TextPart):
+            return {"kind": "text", "index": event.index, "content": part.content}
+        if isinstance(part, ThinkingPart):
+            return {"kind": "thinking", "index": event.index, "content": part.content}
+        if isinstance(part, ToolCallPart):
+            return {
+                "kind": "tool_call",
+                "index": event.index,
+                "name": part.tool_name,
+                "args": part.args_as_json_str(),
+                "tool_call_id": part.tool_call_id,
+            }
+    elif isinstance(event, PartDeltaEvent):
+        delta = event.delta
+        if isinstance(delta, TextPartDelta):
+            return {
+                "kind": "text",
+                "index": event.index,
+                "content": delta.content_delta,
+            }
+        if isinstance(delta, ThinkingPartDelta):
+            return {
+                "kind": "thinking",
+                "index": event.index,
+                "content": delta.content_delta,
+            }
+        if isinstance(delta, ToolCallPartDelta):
+            args = delta.args_delta
+            return {
+                "kind": "tool_call",
+                "index": event.index,
+                "name": delta.tool_name_delta,
+                "args": json.dumps(args) if isinstance(args, dict) else args,
+                "tool_call_id": delta.tool_call_id,
+            }
+    return None
+
+
+def _chunks_from_response(response: dict[str, Any]) -> list[dict[str, Any]]:
+    """Build zero-latency chunks from a response recorded without streaming."""
+    chunks: list[dict[str, Any]] = []
+    for index, part in enumerate(_load_response(response).parts):
+        event = PartStartEvent(index=index, part=part)
+        chunk = _chunk_from_event(event)
+        if chunk is not None:
+            chunks.append(chunk)
+    return chunks
+
+
+def _load_response(serialized: dict[str, Any]) -> ModelResponse:
+    """Validate a recorded response.
+
+    Raises:
+        ValueError: If the recorded message is not a model response.
+    """
+    (message,) = ModelMessagesTypeAdapter.validate_python([serialized])
+    if not isinstance(message, ModelResponse):
+        raise ValueError(f"Expected a recorded response, got a {message.kind}")
+    return message
+
+
+def _delta_from_chunk(chunk: dict[str, Any]) -> Any:
+    """Convert a chunk record into the delta type ``FunctionModel`` streams."""
+    if chunk["kind"] == "text":
+        return chunk["content"] or ""
+    if chunk["kind"] == "thinking":
+        return {chunk["index"]: DeltaThinkingPart(content=chunk["content"])}
+    return {
+        chunk["index"]: DeltaToolCall(
+            name=chunk["name"],
+            json_args=chunk["args"],
+            tool_call_id=chunk["tool_call_id"],
+        )
+    }
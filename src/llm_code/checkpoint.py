@@ -0,0 +1,600 @@
+"""Workspace checkpoints so agent edits can be undone.
+
+Before a run first changes a file, the file's bytes are saved in a
+content-addressed object store, so each distinct pre-image is kept once no
+matter how many runs saw it. ``llm_code undo`` writes those pre-images back and
+deletes the files the run created, which takes time proportional to the files
+the run touched rather than the size of the tree.
+
+Runs can also take a snapshot of the whole tree before they start, which
+covers changes made through ``bash``. Snapshot files are reflinked where the
+filesystem supports it, so a snapshot of an unchanged file costs no data
+blocks, and copied otherwise. They are never hardlinked: a command that edits a
+file in place would change its snapshot too.
+"""
+
+import contextlib
+import hashlib
+import os
+import shutil
+import stat
+import sys
+import threading
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import (
+    DateTime,
+    Engine,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    delete,
+    event,
+    func,
+    select,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from llm_code.settings import data_dir
+from llm_code.watcher import walk_relative
+
+CLONE_METHODS = ("reflink", "copy")
+FICLONE = 0x40049409
+
+
+class Base(DeclarativeBase):
+    """Declarative base for checkpoint tables."""
+
+
+class CheckpointRun(Base):
+    """One agent run that changed files in a workspace."""
+
+    __tablename__ = "runs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    root: Mapped[str] = mapped_column(String(1024), index=True)
+    prompt: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    snapshot: Mapped[str | None] = mapped_column(String(16), nullable=True)
+    undone_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+
+
+class PreImage(Base):
+    """A file's contents before a run first changed it.
+
+    ``blob`` is ``None`` for a file the run created.
+    """
+
+    __tablename__ = "pre_images"
+
+    run_id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    path: Mapped[str] = mapped_column(String(1024), primary_key=True)
+    blob: Mapped[str | None] = mapped_column(String(64), nullable=True, index=True)
+    mode: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+
+@dataclass
+class Checkpoint:
+    """The pre-images recorded for one run."""
+
+    store: CheckpointStore
+    id: str
+    root: Path
+    prompt: str
+    created_at: datetime
+    snapshot: str | None = None
+    paths: set[str] = field(default_factory=set)
+    stored: bool = False
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def summary_line(self) -> str | None:
+        """Describe how to undo the run, or ``None`` if nothing was saved."""
+        if not self.stored:
+            return None
+        return (
+            f"Checkpoint {self.id[:12]}: {len(self.paths)} files saved; "
+            "`llm_code undo` restores them"
+        )
+
+    def save(self, path: str) -> None:
+        """Save ``path``'s contents unless this run already saved them.
+
+        Args:
+            path: The relative POSIX path about to be changed.
+        """
+        with self._lock:
+            if path in self.paths:
+                return
+            self.store.record(self, path)
+            self.paths.add(path)
+
+
+@dataclass(frozen=True)
+class RunSummary:
+    """A recorded run as listed by ``llm_code undo --list``."""
+
+    id: str
+    created_at: datetime
+    prompt: str
+    files: int
+    snapshot: str | None
+    undone: bool
+
+
+@dataclass(frozen=True)
+class UndoResult:
+    """The files an undo restored, removed, or left alone."""
+
+    run_id: str
+    restored: list[str]
+    removed: list[str]
+    left: list[str]
+
+    def summary_lines(self) -> list[str]:
+        """Describe the undo, listing every changed file."""
+        lines = [
+            f"Undid run {self.run_id[:12]}: {len(self.restored)} restored, "
+            f"{len(self.removed)} removed"
+        ]
+        lines.extend(f"  restored {path}" for path in self.restored)
+        lines.extend(f"  removed  {path}" for path in self.removed)
+        if self.left:
+            lines.append("Created since the snapshot and left in place:")
+            lines.extend(f"  {path}" for path in self.left)
+        return lines
+
+
+class CheckpointStore:
+    """SQLite index and object store of the files agent runs changed.
+
+    Args:
+        path: Directory holding the index, objects, and snapshots. Snapshots
+            can only be linked on the filesystem the workspace is on.
+        snapshot: Snapshot the whole workspace before each run.
+        keep_runs: Runs kept per workspace; older runs and the objects only
+            they used are deleted.
+    """
+
+    def __init__(
+        self, path: Path, *, snapshot: bool = False, keep_runs: int = 50
+    ) -> None:
+        path.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.snapshot = snapshot
+        self.keep_runs = keep_runs
+        self._engine = _create_engine(path / "checkpoints.sqlite")
+        Base.metadata.create_all(self._engine)
+
+    @classmethod
+    def default_path(cls) -> Path:
+        """Return the store path under XDG data home or ~/.local/share."""
+        return data_dir() / "checkpoints"
+
+    def begin(self, root: Path, prompt: str = "") -> Checkpoint:
+        """Start recording a run in ``root``, taking a snapshot if enabled.
+
+        A run without a snapshot is stored once it saves its first file, so
+        runs that change nothing are not listed.
+        """
+        checkpoint = Checkpoint(
+            store=self,
+            id=uuid.uuid4().hex,
+            root=root,
+            prompt=prompt,
+            created_at=datetime.now(UTC),
+        )
+        if self.snapshot:
+            checkpoint.snapshot = clone_tree(root, self._snapshot_path(checkpoint.id))
+            with Session(self._engine) as session, session.begin():
+                session.add(_run_row(checkpoint))
+            checkpoint.stored = True
+            self._prune(root)
+        return checkpoint
+
+    def record(self, checkpoint: Checkpoint, path: str) -> None:
+        """Save the current contents of ``path`` as the run's pre-image.
+
+        Callers go through ``Checkpoint.save``, which saves each path once.
+        """
+        source = checkpoint.root / path
+        try:
+            data = source.read_bytes()
+            mode = stat.S_IMODE(source.stat().st_mode)
+        except FileNotFoundError:
+            blob = mode = None
+        else:
+            blob = self._put_object(data)
+
+        created = not checkpoint.stored
+        with Session(self._engine) as session, session.begin():
+            if created:
+                session.add(_run_row(checkpoint))
+            session.merge(
+                PreImage(run_id=checkpoint.id, path=path, blob=blob, mode=mode)
+            )
+        checkpoint.stored = True
+        if created:
+            self._prune(checkpoint.root)
+
+    def runs(self, root: Path, *, limit: int = 10) -> list[RunSummary]:
+        """Return the newest runs recorded in ``root``, newest first."""
+        files = (
+            select(PreImage.run_id, func.count().label("files"))
+            .group_by(PreImage.run_id)
+            .subquery()
+        )
+        statement = (
+            select(CheckpointRun, func.coalesce(files.c.files, 0))
+            .outerjoin(files, files.c.run_id == CheckpointRun.id)
+            .where(CheckpointRun.root == str(root))
+            .order_by(CheckpointRun.created_at.desc())
+            .limit(limit)
+        )
+        with Session(self._engine) as session:
+            return [
+                RunSummary(
+                    id=run.id,
+                    created_at=run.created_at,
+                    prompt=run.prompt,
+                    files=count,
+                    snapshot=run.snapshot,
+                    undone=run.undone_at is not None,
+                )
+                for run, count in session.execute(statement)
+            ]
+
+    def undo(self, root: Path, run_id: str | None = None) -> UndoResult:
+        """Restore the files a run changed in ``root`` to their pre-images.
+
+        Files the run saved are restored, or removed if the run created them.
+        With a snapshot, other files that differ from it are restored too, and
+        files created since it are reported but left in place.
+
+        Args:
+            root: The workspace the run worked in.
+            run_id: A run id or unique prefix of one. Defaults to the newest
+                run in ``root`` that has not been undone.
+
+        Raises:
+            ValueError: If no run matches, or the run was already undone.
+        """
+        with Session(self._engine) as session, session.begin():
+            run = self._find_run(session, root, run_id)
+            if run.undone_at is not None:
+                raise ValueError(f"Run {run.id[:12]} was already undone")
+            images = list(
+                session.scalars(select(PreImage).where(PreImage.run_id == run.id))
+            )
+
+            restored: list[str] = []
+            removed: list[str] = []
+            left: list[str] = []
+            saved = {image.path for image in images}
+            if run.snapshot is not None:
+                snapshot = self._snapshot_path(run.id)
+                in_snapshot = set(walk_relative(snapshot))
+                for path in sorted(in_snapshot - saved):
+                    if _restore_from_snapshot(snapshot / path, root / path):
+                        restored.append(path)
+                left = sorted(set(walk_relative(root)) - in_snapshot - saved)
+
+            for image in sorted(images, key=lambda image: image.path):
+                target = root / image.path
+                if image.blob is None:
+                    if target.exists() or target.is_symlink():
+                        target.unlink()
+                        removed.append(image.path)
+                    continue
+                data = self._object_path(image.blob).read_bytes()
+                if _file_hash(target) != image.blob:
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    replace_file(target, data, mode=image.mode)
+                    restored.append(image.path)
+
+            run.undone_at = datetime.now(UTC)
+            return UndoResult(
+                run_id=run.id, restored=sorted(restored), removed=removed, left=left
+            )
+
+    def _find_run(
+        self, session: Session, root: Path, run_id: str | None
+    ) -> CheckpointRun:
+        """Return the run to undo, by id prefix or the newest not undone."""
+        statement = select(CheckpointRun).where(CheckpointRun.root == str(root))
+        if run_id is None:
+            statement = statement.where(CheckpointRun.undone_at.is_(None))
+        else:
+            statement = statement.where(CheckpointRun.id.startswith(run_id))
+        runs = list(
+            session.scalars(
+                statement.order_by(CheckpointRun.created_at.desc()).limit(2)
+            )
+        )
+        if not runs:
+            if run_id is None:
+                raise ValueError(f"No runs to undo in {root}")
+            raise ValueError(f"No run {run_id} in {root}")
+        if run_id is not None and len(runs) > 1:
+            raise ValueError(f"Run id {run_id} is ambiguous")
+        return runs[0]
+
+    def _prune(self, root: Path) -> None:
+        """Delete runs in ``root`` past ``keep_runs`` and objects only they used."""
+        with Session(self._engine) as session, session.begin():
+            stale = list(
+                session.scalars(
+                    select(CheckpointRun.id)
+                    .where(CheckpointRun.root == str(root))
+                    .order_by(CheckpointRun.created_at.desc())
+                    .offset(self.keep_runs)
+                )
+            )
+            if not stale:
+                return
+            blobs = {
+                blob
+                for blob in session.scalars(
+                    select(PreImage.blob).where(PreImage.run_id.in_(stale))
+                )
+                if blob is not None
+            }
+            session.execute(delete(PreImage).where(PreImage.run_id.in_(stale)))
+            session.execute(delete(CheckpointRun).where(CheckpointRun.id.in_(stale)))
+            blobs -= set(
+                session.scalars(select(PreImage.blob).where(PreImage.blob.in_(blobs)))
+            )
+
+        for blob in blobs:
+            self._object_path(blob).unlink(missing_ok=True)
+        for run_id in stale:
+            shutil.rmtree(self._snapshot_path(run_id), ignore_errors=True)
+
+    def _put_object(self, data: bytes) -> str:
+        """Store ``data`` once under its hash and return the hash."""
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            replace_file(path, data)
+        return digest
+
+    def _object_path(self, digest: str) -> Path:
+        return self.path / "objects" / digest[:2] / digest[2:]
+
+    def _snapshot_path(self, run_id: str) -> Path:
+        return self.path / "snapshots" / run_id
+
+
+_checkpoint: ContextVar[Checkpoint | None] = ContextVar("checkpoint", default=None)
+
+
+@contextmanager
+def use_checkpoint(checkpoint: Checkpoint | None) -> Iterator[Checkpoint | None]:
+    """Record the files tools change in the current task into ``checkpoint``."""
+    token = _checkpoint.set(checkpoint)
+    try:
+        yield checkpoint
+    finally:
+        _checkpoint.reset(token)
+
+
+def current_checkpoint() -> Checkpoint | None:
+    """Return the checkpoint of the current task, if edits are being recorded."""
+    return _checkpoint.get()
+
+
+def replace_file(path: Path, content: str | bytes, *, mode: int | None = None) -> None:
+    """Write ``path`` through a temporary file renamed over it.
+
+    Readers never see a partly written file, and hardlinks to the old file
+    keep the old contents. The file keeps its permissions unless ``mode`` is
+    given; a symlink is followed and its target replaced.
+    """
+    if path.is_symlink():
+        path = path.resolve()
+    temporary = _stage(path, content, mode=mode)
+    try:
+        temporary.replace(path)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+
+
+def replace_files(files: dict[Path, str]) -> None:
+    """Replace several files so that either all of them change or none do.
+
+    Every file is written to a temporary file beside it before any is renamed,
+    so the renames run back to back once all data is on disk. If a step fails,
+    renamed files get their old contents back, new files and the directories
+    made for them are removed, and the error is raised.
+
+    Args:
+        files: Full text contents by absolute path. Missing parent directories
+            are created.
+    """
+    staged: list[tuple[Path, Path]] = []
+    backups: dict[Path, Path | None] = {}
+    made: list[Path] = []
+    try:
+        for path, content in files.items():
+            if path.is_symlink():
+                path = path.resolve()
+            made.extend(_make_parents(path))
+            staged.append((_stage(path, content), path))
+        for temporary, path in staged:
+            backups[path] = _backup(path)
+            temporary.replace(path)
+    except BaseException:
+        for temporary, _path in staged:
+            temporary.unlink(missing_ok=True)
+        for path, backup in backups.items():
+            if backup is None:
+                path.unlink(missing_ok=True)
+            else:
+                backup.replace(path)
+        for directory in reversed(made):
+            with contextlib.suppress(OSError):
+                directory.rmdir()
+        raise
+
+    for backup in backups.values():
+        if backup is not None:
+            backup.unlink(missing_ok=True)
+
+
+def _stage(path: Path, content: str | bytes, *, mode: int | None = None) -> Path:
+    """Write ``content`` to a new temporary file beside ``path`` and return it.
+
+    The temporary file gets ``mode``, or the permissions of ``path`` if it
+    exists.
+    """
+    temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+    try:
+        if isinstance(content, str):
+            temporary.write_text(content, encoding="utf-8")
+        else:
+            temporary.write_bytes(content)
+        if mode is not None:
+            temporary.chmod(mode)
+        elif path.exists():
+            shutil.copymode(path, temporary)
+    except BaseException:
+        temporary.unlink(missing_ok=True)
+        raise
+    return temporary
+
+
+def _backup(path: Path) -> Path | None:
+    """Keep ``path``'s current file under a temporary name, if it exists.
+
+    The backup is a hardlink where possible, so it costs no copy.
+    """
+    if not path.exists():
+        return None
+    backup = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.bak")
+    try:
+        os.link(path, backup)
+    except OSError:
+        shutil.copy2(path, backup)
+    return backup
+
+
+def _make_parents(path: Path) -> list[Path]:
+    """Create the missing parents of ``path`` and return them, outermost first."""
+    missing = []
+    parent = path.parent
+    while not parent.exists():
+        missing.append(parent)
+        parent = parent.parent
+    missing.reverse()
+    for directory in missing:
+        directory.mkdir(exist_ok=True)
+    return missing
+
+
+def clone_tree(root: Path, destination: Path) -> str:
+    """Snapshot the files under ``root`` into ``destination``.
+
+    Files are walked like the watcher walks them, skipping dependency, build,
+    and hidden directories.
+
+    Returns:
+        The cheapest clone method that worked: ``reflink`` or ``copy``.
+    """
+    destination.mkdir(parents=True, exist_ok=True)
+    method = CLONE_METHODS[0]
+    for relative in walk_relative(root):
+        source = root / relative
+        target = destination / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        if source.is_symlink():
+            os.symlink(os.readlink(source), target)
+            continue
+        method = _clone_file(source, target, method)
+    return method
+
+
+def _clone_file(source: Path, target: Path, method: str) -> str:
+    """Clone one file with ``method`` or the next method that works."""
+    for candidate in CLONE_METHODS[CLONE_METHODS.index(method) :]:
+        try:
+            if candidate == "reflink":
+                _reflink(source, target)
+            else:
+                shutil.copy2(source, target)
+        except OSError:
+            target.unlink(missing_ok=True)
+            continue
+        return candidate
+    return method
+
+
+def _reflink(source: Path, target: Path) -> None:
+    """Share ``source``'s data blocks with a new ``target`` (Linux only)."""
+    if sys.platform != "linux":
+        raise OSError("reflinks are only attempted on Linux")
+    import fcntl
+
+    with source.open("rb") as reader, target.open("wb") as writer:
+        fcntl.ioctl(writer.fileno(), FICLONE, reader.fileno())
+    shutil.copystat(source, target)
+
+
+def _restore_from_snapshot(snapshot: Path, target: Path) -> bool:
+    """Restore ``target`` from its snapshot if it differs; return whether it did."""
+    if snapshot.is_symlink():
+        if target.is_symlink() and os.readlink(target) == os.readlink(snapshot):
+            return False
+        target.unlink(missing_ok=True)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.symlink(os.readlink(snapshot), target)
+        return True
+    data = snapshot.read_bytes()
+    with contextlib.suppress(OSError):
+        if target.is_file() and target.read_bytes() == data:
+            return False
+    target.parent.mkdir(parents=True, exist_ok=True)
+    replace_file(target, data, mode=stat.S_IMODE(snapshot.stat().st_mode))
+    return True
+
+
+def _file_hash(path: Path) -> str | None:
+    """Hash a file's bytes, or return ``None`` if it is missing."""
+    try:
+        return hashlib.sha256(path.read_bytes()).hexdigest()
+    except FileNotFoundError:
+        return None
+
+
+def _run_row(checkpoint: Checkpoint) -> CheckpointRun:
+    return CheckpointRun(
+        id=checkpoint.id,
+        root=str(checkpoint.root),
+        prompt=checkpoint.prompt,
+        created_at=checkpoint.created_at,
+        snapshot=checkpoint.snapshot,
+    )
+
+
+def _create_engine(path: Path) -> Engine:
+    """Create a SQLite engine for the checkpoint index."""
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection: Any, _record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
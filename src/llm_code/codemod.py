@@ -0,0 +1,280 @@
+"""Apply one prompt to many files with isolated agents.
+
+Files matched by a glob are split into shards. Each shard runs in its own agent
+with only that shard's files in context. The agent can read and search the
+workspace but cannot write; it returns the new contents of the files it changes.
+Edits are written once the shard finishes, and only if the file on disk still
+matches what the agent was shown. Any other edit is reported as a conflict
+instead of overwriting newer work.
+"""
+
+import asyncio
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+from pydantic import BaseModel
+from pydantic_ai import Agent
+from pydantic_ai.models import Model
+
+from llm_code.agent import (
+    DEFAULT_INSTRUCTIONS,
+    _read_files,
+    _read_files_sync,
+    _resolve_paths,
+    _resolve_relative_path,
+    _search_files,
+    _write_file_sync,
+    workspace_root,
+)
+from llm_code.usage import UsageLedger, find_project_root
+
+CODEMOD_INSTRUCTIONS = (
+    f"{DEFAULT_INSTRUCTIONS}\n\n"
+    "Apply the requested change to the files you are given. Return the complete "
+    "new contents of every file you change, and leave unchanged files out. Do "
+    "not edit files you were not given."
+)
+
+
+class FileEdit(BaseModel):
+    """The new contents of one file."""
+
+    path: str
+    content: str
+
+
+class FileResult(BaseModel):
+    """The outcome of a codemod for one file."""
+
+    path: str
+    shard: int
+    status: str
+    elapsed: float = 0.0
+    tokens: int = 0
+    error: str | None = None
+
+
+def shard_files(files: list[Path], files_per_shard: int) -> list[list[Path]]:
+    """Split files into consecutive shards of at most ``files_per_shard``."""
+    return [
+        files[start : start + files_per_shard]
+        for start in range(0, len(files), files_per_shard)
+    ]
+
+
+def build_codemod_agent(model: Model) -> Agent[None, list[FileEdit]]:
+    """Build a read-only agent that returns file edits."""
+
+    async def read(path: str) -> dict[str, str]:
+        """Read one file or a glob of files relative to the current directory.
+
+        Args:
+            path: A relative file path or glob pattern to read.
+
+        Returns:
+            A mapping of relative file paths to file contents.
+        """
+        return await _read_files(path)
+
+    async def search(
+        pattern: str | list[str],
+        path: str = ".",
+        context_lines: int = 2,
+        include: list[str] | None = None,
+        exclude: list[str] | None = None,
+        file_types: list[str] | None = None,
+        max_filesize: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Search files and return grouped matches with context snippets.
+
+        Args:
+            pattern: A regular expression, or a list of them, to search for.
+            path: A relative file path, directory, or glob pattern to limit the
+                search.
+            context_lines: Number of surrounding lines to include in each
+                snippet.
+            include: Only search files matching any of these globs.
+            exclude: Skip files matching any of these globs.
+            file_types: Only search these file types, such as ``py`` or ``ts``.
+            max_filesize: Skip files larger than this many bytes.
+
+        Returns:
+            A list of per-file match groups with line numbers and snippets.
+        """
+        return await _search_files(
+            pattern,
+            path=path,
+            context_lines=context_lines,
+            include=include,
+            exclude=exclude,
+            file_types=file_types,
+            max_filesize=max_filesize,
+        )
+
+    return Agent[None, list[FileEdit]](
+        model,
+        instructions=CODEMOD_INSTRUCTIONS,
+        output_type=list[FileEdit],
+        tools=[read, search],
+    )
+
+
+async def run_codemod(
+    prompt: str,
+    pattern: str,
+    *,
+    model: Model,
+    files_per_shard: int = 1,
+    concurrency: int = 4,
+    ledger: UsageLedger | None = None,
+    session_id: str | None = None,
+    on_result: Callable[[FileResult], None] | None = None,
+) -> list[FileResult]:
+    """Run ``prompt`` over every file matching ``pattern`` and apply the edits.
+
+    Args:
+        prompt: The change to make to each file.
+        pattern: A relative path or glob, resolved like the ``read`` tool.
+        model: The model shared by every shard.
+        files_per_shard: Number of files given to each agent.
+        concurrency: Maximum number of shards running at once.
+        ledger: Optional usage ledger to record each shard's usage.
+        session_id: Session identifier recorded with usage.
+        on_result: Called with each file's result as its shard finishes.
+
+    Returns:
+        One result per matched file, plus one per rejected edit outside a shard.
+    """
+    agent = build_codemod_agent(model)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_one(index: int, shard: list[Path]) -> list[FileResult]:
+        async with semaphore:
+            results = await _run_shard(
+                agent,
+                prompt,
+                index,
+                shard,
+                model_name=model.model_name,
+                ledger=ledger,
+                session_id=session_id,
+            )
+        if on_result is not None:
+            for result in results:
+                on_result(result)
+        return results
+
+    shards = shard_files(_resolve_paths(pattern), files_per_shard)
+    shard_results = await asyncio.gather(
+        *(run_one(index, shard) for index, shard in enumerate(shards))
+    )
+    return [result for results in shard_results for result in results]
+
+
+async def _run_shard(
+    agent: Agent[None, list[FileEdit]],
+    prompt: str,
+    index: int,
+    shard: list[Path],
+    *,
+    model_name: str,
+    ledger: UsageLedger | None,
+    session_id: str | None,
+) -> list[FileResult]:
+    """Run one shard's agent and apply its edits with conflict detection."""
+    started = time.perf_counter()
+    try:
+        snapshot = await asyncio.to_thread(_read_files_sync, shard)
+        result = await agent.run(_shard_prompt(prompt, snapshot))
+    except Exception as exc:
+        elapsed = time.perf_counter() - started
+        return [
+            FileResult(
+                path=str(path),
+                shard=index,
+                status="error",
+                elapsed=elapsed,
+                error=str(exc) or type(exc).__name__,
+            )
+            for path in shard
+        ]
+
+    elapsed = time.perf_counter() - started
+    tokens = result.usage().total_tokens
+    if ledger is not None:
+        ledger.record_run(
+            model=model_name,
+            messages=result.new_messages(),
+            usage=result.usage(),
+            duration_seconds=elapsed,
+            project=find_project_root(workspace_root()),
+            session_id=session_id,
+        )
+
+    statuses: dict[str, tuple[str, str | None]] = {
+        path: ("unchanged", None) for path in snapshot
+    }
+    for edit in result.output:
+        path, status, error = await asyncio.to_thread(_apply_edit, edit, snapshot)
+        statuses[path] = (status, error)
+
+    return [
+        FileResult(
+            path=path,
+            shard=index,
+            status=status,
+            elapsed=elapsed,
+            tokens=tokens,
+            error=error,
+        )
+        for path, (status, error) in statuses.items()
+    ]
+
+
+def _shard_prompt(prompt: str, snapshot: dict[str, str]) -> str:
+    """Build the prompt for one shard with its files inlined."""
+    files = "\n\n".join(
+        f"<file path={path!r}>\n{content}</file>" for path, content in snapshot.items()
+    )
+    return f"{prompt}\n\nFiles:\n\n{files}"
+
+
+def _apply_edit(
+    edit: FileEdit, snapshot: dict[str, str]
+) -> tuple[str, str, str | None]:
+    """Write one edit if its file is unchanged since the shard read it.
+
+    Returns:
+        The normalized path, the file's status, and an optional error message.
+    """
+    try:
+        target = _resolve_relative_path(edit.path)
+    except ValueError as exc:
+        return edit.path, "conflict", str(exc)
+
+    path = str(target)
+    original = snapshot.get(path)
+    if original is None:
+        return path, "conflict", "file is not part of this shard"
+    if edit.content == original:
+        return path, "unchanged", None
+
+    try:
+        current = (workspace_root() / target).read_text(encoding="utf-8")
+    except OSError, UnicodeDecodeError:
+        current = None
+    if current != original:
+        return path, "conflict", "file changed on disk while the shard was running"
+
+    _write_file_sync(target, edit.content)
+    return path, "changed", None
+
+
+def summarize_codemod(results: list[FileResult]) -> dict[str, int]:
+    """Return counts of results per status."""
+    counts = {"changed": 0, "unchanged": 0, "conflict": 0, "error": 0}
+    for result in results:
+        counts[result.status] = counts.get(result.status, 0) + 1
+    return counts
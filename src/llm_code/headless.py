@@ -0,0 +1,242 @@
+"""Headless NDJSON output for scripts and CI.
+
+Instead of a Rich status line and plain text, a headless run writes one JSON
+object per line to stdout: ``start``, ``text`` deltas, ``tool_call``,
+``tool_result`` with timing, ``usage``, ``checkpoint`` when files were
+changed, and a final ``end`` event. Text deltas are buffered and flushed in
+batches, at most ``max_delay`` after they were produced, so consumers see
+events as they happen without paying a write per token. Every other event is
+written immediately.
+"""
+
+import asyncio
+import json
+import sys
+import time
+from collections.abc import AsyncIterable
+from dataclasses import asdict
+from typing import Any, TextIO
+
+from pydantic_ai import capture_run_messages
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.messages import (
+    FunctionToolCallEvent,
+    FunctionToolResultEvent,
+    PartDeltaEvent,
+    PartStartEvent,
+    RetryPromptPart,
+    TextPart,
+    TextPartDelta,
+)
+from pydantic_ai.models import Model
+from pydantic_ai.usage import RunUsage
+from pydantic_core import to_jsonable_python
+
+from llm_code.agent import build_agent, workspace_root
+from llm_code.checkpoint import Checkpoint, CheckpointStore, use_checkpoint
+from llm_code.limits import RunLimits, run_deadline
+from llm_code.prefetch import read_caches
+from llm_code.router import RouteLog
+from llm_code.scheduler import RateLimitScheduler
+from llm_code.usage import UsageLedger, messages_cost
+
+IMMEDIATE_EVENTS = frozenset({"start", "tool_call", "tool_result", "end"})
+
+
+class NdjsonWriter:
+    """Buffer NDJSON events and flush them in batches.
+
+    Events in ``IMMEDIATE_EVENTS`` flush the buffer at once. Other events are
+    flushed when the batch is full or, inside an event loop, by a timer
+    ``max_delay`` after the first of them was queued.
+    """
+
+    def __init__(
+        self,
+        stream: TextIO | None = None,
+        *,
+        max_events: int = 64,
+        max_delay: float = 0.05,
+    ) -> None:
+        self._stream = stream or sys.stdout
+        self._max_events = max_events
+        self._max_delay = max_delay
+        self._buffer: list[str] = []
+        self._last_flush = time.monotonic()
+        self._timer: asyncio.TimerHandle | None = None
+
+    def emit(self, event_type: str, **fields: Any) -> None:
+        """Queue one event, flushing when it is urgent or the batch is full."""
+        event = {"type": event_type, **fields}
+        self._buffer.append(
+            json.dumps(
+                to_jsonable_python(event, fallback=repr),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+        )
+        if (
+            event_type in IMMEDIATE_EVENTS
+            or len(self._buffer) >= self._max_events
+            or time.monotonic() - self._last_flush >= self._max_delay
+        ):
+            self.flush()
+        elif self._timer is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                return
+            self._timer = loop.call_later(self._max_delay, self.flush)
+
+    def flush(self) -> None:
+        """Write all queued events to the stream."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._buffer:
+            self._stream.write("\n".join(self._buffer) + "\n")
+            self._buffer.clear()
+        self._stream.flush()
+        self._last_flush = time.monotonic()
+
+
+async def run_prompt_ndjson(
+    prompt: str,
+    *,
+    model: Model,
+    writer: NdjsonWriter,
+    ledger: UsageLedger | None = None,
+    session_id: str | None = None,
+    schedulers: dict[str, RateLimitScheduler] | None = None,
+    repo_map_tokens: int = 0,
+    prefetch_budget_mb: int = 0,
+    spill_chars: int = 0,
+    limits: RunLimits | None = None,
+    checkpoints: CheckpointStore | None = None,
+) -> bool:
+    """Run the coding agent and emit its progress as NDJSON events.
+
+    A run stopped by one of ``limits`` ends with status ``limit`` after the
+    events it produced so far. With ``checkpoints``, a run that changed files
+    emits a ``checkpoint`` event with the id ``llm_code undo`` accepts.
+
+    Returns:
+        ``True`` when the run finished successfully.
+    """
+    limits = limits or RunLimits()
+    agent = build_agent(
+        model,
+        repo_map_tokens=repo_map_tokens,
+        prefetch_budget_mb=prefetch_budget_mb,
+        spill_chars=spill_chars,
+        session_id=session_id,
+        max_repeated_calls=limits.repeated_calls,
+        memory_limit_mb=limits.memory_mb,
+    )
+    started = time.perf_counter()
+    tool_started: dict[str, float] = {}
+
+    async def handle_events(_ctx: Any, event_stream: AsyncIterable[Any]) -> None:
+        async for event in event_stream:
+            if isinstance(event, PartStartEvent) and isinstance(event.part, TextPart):
+                if event.part.content:
+                    writer.emit("text", delta=event.part.content)
+            elif isinstance(event, PartDeltaEvent) and isinstance(
+                event.delta, TextPartDelta
+            ):
+                writer.emit("text", delta=event.delta.content_delta)
+            elif isinstance(event, FunctionToolCallEvent):
+                tool_started[event.part.tool_call_id] = time.perf_counter()
+                writer.emit(
+                    "tool_call",
+                    tool_call_id=event.part.tool_call_id,
+                    tool_name=event.part.tool_name,
+                    args=event.part.args_as_dict(),
+                )
+            elif isinstance(event, FunctionToolResultEvent):
+                call_started = tool_started.pop(event.tool_call_id, None)
+                elapsed = time.perf_counter() - call_started if call_started else None
+                is_retry = isinstance(event.result, RetryPromptPart)
+                writer.emit(
+                    "tool_result",
+                    tool_call_id=event.tool_call_id,
+                    tool_name=event.result.tool_name,
+                    status="retry" if is_retry else "ok",
+                    content=(
+                        event.result.model_response()
+                        if is_retry
+                        else event.result.content
+                    ),
+                    elapsed=elapsed,
+                )
+
+    checkpoint = None
+    if checkpoints is not None:
+        checkpoint = await asyncio.to_thread(
+            checkpoints.begin, workspace_root(), prompt
+        )
+
+    usage = RunUsage()
+    writer.emit("start", model=model.model_name, session_id=session_id)
+    try:
+        with capture_run_messages() as messages, use_checkpoint(checkpoint):
+            async with run_deadline(limits.seconds):
+                result = await agent.run(
+                    prompt,
+                    event_stream_handler=handle_events,
+                    usage=usage,
+                    usage_limits=limits.usage_limits(),
+                )
+    except Exception as exc:
+        duration = time.perf_counter() - started
+        stopped = isinstance(exc, UsageLimitExceeded)
+        _emit_checkpoint(writer, checkpoint)
+        writer.emit(
+            "end",
+            status="limit" if stopped else "error",
+            error=str(exc),
+            elapsed=duration,
+        )
+        writer.flush()
+        if stopped and ledger is not None:
+            ledger.record_run(
+                model=model.model_name,
+                messages=messages,
+                usage=usage,
+                duration_seconds=duration,
+                session_id=session_id,
+            )
+        return False
+
+    duration = time.perf_counter() - started
+    messages = result.new_messages()
+    cost = messages_cost(messages)
+    writer.emit("usage", **to_jsonable_python(usage), cost=cost)
+    for name, scheduler in (schedulers or {}).items():
+        if scheduler.metrics.requests:
+            writer.emit("queue", provider=name, **scheduler.metrics.summary())
+    if isinstance(routes := getattr(model, "routes", None), RouteLog):
+        for decision in routes.decisions:
+            writer.emit("route", **asdict(decision))
+    if prefetch_budget_mb > 0:
+        for cache in read_caches():
+            writer.emit("read_cache", root=str(cache.root), **asdict(cache.stats))
+    _emit_checkpoint(writer, checkpoint)
+    writer.emit("end", status="ok", elapsed=duration)
+    writer.flush()
+
+    if ledger is not None:
+        ledger.record_run(
+            model=model.model_name,
+            messages=messages,
+            usage=usage,
+            duration_seconds=duration,
+            session_id=session_id,
+        )
+    return True
+
+
+def _emit_checkpoint(writer: NdjsonWriter, checkpoint: Checkpoint | None) -> None:
+    """Emit the checkpoint of a run that saved files before changing them."""
+    if checkpoint is not None and checkpoint.stored:
+        writer.emit("checkpoint", id=checkpoint.id, files=sorted(checkpoint.paths))
@@ -0,0 +1,244 @@
+"""Hedged requests and failover between two models.
+
+``HedgedModel`` sends each request to a primary model. If the primary fails,
+the request fails over to a backup model. If ``hedge_after`` is set and the
+primary has not produced its first token within that many seconds, a duplicate
+request goes to the backup; whichever responds first is used and the other is
+cancelled. Time to first token is tracked per model so the threshold can be
+tuned from observed percentiles.
+"""
+
+import asyncio
+import statistics
+import time
+from collections import deque
+from collections.abc import AsyncIterator, Awaitable, Callable, Coroutine
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic_ai import RunContext
+from pydantic_ai.exceptions import FallbackExceptionGroup
+from pydantic_ai.messages import ModelMessage, ModelResponse, ModelResponseStreamEvent
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.profiles import ModelProfile
+from pydantic_ai.settings import ModelSettings
+
+
+@dataclass
+class LatencyTracker:
+    """Time-to-first-token samples per model, in seconds."""
+
+    samples: dict[str, deque[float]] = field(default_factory=dict)
+    hedges: int = 0
+    hedge_wins: int = 0
+    failovers: int = 0
+
+    def record(self, model_name: str, seconds: float) -> None:
+        """Add one time-to-first-token sample for a model."""
+        self.samples.setdefault(model_name, deque(maxlen=1000)).append(seconds)
+
+    def percentiles(self, model_name: str) -> dict[str, float]:
+        """Return p50, p90, and p99 time to first token for a model."""
+        samples = sorted(self.samples.get(model_name, ()))
+        if not samples:
+            return {}
+        return {
+            "p50": statistics.median(samples),
+            "p90": samples[min(len(samples) - 1, int(len(samples) * 0.9))],
+            "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+        }
+
+    def summary_lines(self) -> list[str]:
+        """Format one line per model plus hedge and failover counts."""
+        lines = []
+        for model_name in self.samples:
+            stats = self.percentiles(model_name)
+            lines.append(
+                f"{model_name}: time to first token p50 {stats['p50']:.2f}s "
+                f"p90 {stats['p90']:.2f}s p99 {stats['p99']:.2f}s"
+            )
+        lines.append(
+            f"hedged {self.hedges} requests ({self.hedge_wins} won by backup), "
+            f"{self.failovers} failovers"
+        )
+        return lines
+
+
+class HedgedModel(Model):
+    """Model that hedges slow requests and fails over errors to a backup model."""
+
+    def __init__(
+        self,
+        primary: Model,
+        backup: Model,
+        *,
+        hedge_after: float | None = None,
+        latency: LatencyTracker | None = None,
+    ) -> None:
+        super().__init__()
+        self.primary = primary
+        self.backup = backup
+        self.hedge_after = hedge_after
+        self.latency = latency or LatencyTracker()
+
+    @property
+    def model_name(self) -> str:
+        """The primary model's name."""
+        return self.primary.model_name
+
+    @property
+    def system(self) -> str:
+        """The primary model's provider system."""
+        return self.primary.system
+
+    @property
+    def profile(self) -> ModelProfile:  # type: ignore[override]
+        """The primary model's profile."""
+        return self.primary.profile
+
+    def customize_request_parameters(
+        self, model_request_parameters: ModelRequestParameters
+    ) -> ModelRequestParameters:
+        """Leave parameters for each underlying model to customize."""
+        return model_request_parameters
+
+    def prepare_request(
+        self,
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> tuple[ModelSettings | None, ModelRequestParameters]:
+        """Leave settings for each underlying model to prepare."""
+        return model_settings, model_request_parameters
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        """Request from the primary, hedging or failing over to the backup."""
+
+        async def attempt(model: Model) -> ModelResponse:
+            started = time.perf_counter()
+            response = await model.request(
+                messages, model_settings, model_request_parameters
+            )
+            self.latency.record(model.model_name, time.perf_counter() - started)
+            return response
+
+        return await self._race(attempt)
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+        run_context: RunContext[Any] | None = None,
+    ) -> AsyncIterator[StreamedResponse]:
+        """Stream from whichever model produces its first event first."""
+
+        async def attempt(model: Model) -> tuple[AsyncExitStack, StreamedResponse]:
+            started = time.perf_counter()
+            stack = AsyncExitStack()
+            try:
+                response_stream = await stack.enter_async_context(
+                    model.request_stream(
+                        messages,
+                        model_settings,
+                        model_request_parameters,
+                        run_context,
+                    )
+                )
+                await _peek_first_event(response_stream)
+            except BaseException:
+                await stack.aclose()
+                raise
+            self.latency.record(model.model_name, time.perf_counter() - started)
+            return stack, response_stream
+
+        stack, response_stream = await self._race(attempt, cleanup=_close_stream)
+        async with stack:
+            yield response_stream
+
+    async def _race[T](
+        self,
+        attempt: Callable[[Model], Coroutine[Any, Any, T]],
+        cleanup: Callable[[T], Awaitable[None]] | None = None,
+    ) -> T:
+        """Run ``attempt`` on the primary, adding the backup on delay or error.
+
+        Args:
+            attempt: Coroutine function taking a model and returning its result.
+            cleanup: Optional coroutine function that releases a losing result.
+
+        Raises:
+            FallbackExceptionGroup: If both models fail.
+        """
+        primary = asyncio.create_task(attempt(self.primary))
+        tasks = {primary}
+        errors: list[BaseException] = []
+
+        try:
+            done, _pending = await asyncio.wait(tasks, timeout=self.hedge_after)
+            hedged = not done
+            if hedged:
+                self.latency.hedges += 1
+            elif (error := primary.exception()) is not None:
+                self.latency.failovers += 1
+                errors.append(error)
+                tasks.discard(primary)
+            else:
+                tasks.discard(primary)
+                return primary.result()
+
+            backup = asyncio.create_task(attempt(self.backup))
+            tasks.add(backup)
+
+            while tasks:
+                done, _pending = await asyncio.wait(
+                    tasks, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    tasks.discard(task)
+                    if (error := task.exception()) is not None:
+                        errors.append(error)
+                        continue
+                    if hedged and task is backup:
+                        self.latency.hedge_wins += 1
+                    return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+            if cleanup is not None:
+                for result in results:
+                    if not isinstance(result, BaseException):
+                        await cleanup(result)
+
+        raise FallbackExceptionGroup("Primary and backup models both failed", errors)
+
+
+async def _peek_first_event(response_stream: StreamedResponse) -> None:
+    """Wait for a stream's first event without losing it for later consumers."""
+    events = aiter(response_stream)
+    try:
+        first = await anext(events)
+    except StopAsyncIteration:
+        first = None
+
+    async def replay() -> AsyncIterator[ModelResponseStreamEvent]:
+        if first is None:
+            return
+        yield first
+        async for event in events:
+            yield event
+
+    response_stream._event_iterator = replay()
+
+
+async def _close_stream(result: tuple[AsyncExitStack, StreamedResponse]) -> None:
+    """Close a stream that lost the race."""
+    stack, _response_stream = result
+    await stack.aclose()
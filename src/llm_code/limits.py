@@ -0,0 +1,137 @@
+"""Per-run limits that stop a prompt before it runs away.
+
+Request, token, and tool call counts are enforced by pydantic-ai's usage
+limits. Wall-clock time is enforced with a deadline around the run. A
+``LoopGuard`` capability stops a run when the model keeps making the same tool
+call and getting the same result back, which is the usual shape of a model
+stuck re-reading or re-searching the same thing.
+
+Every limit raises ``UsageLimitExceeded``, so callers handle them in one place
+and keep whatever text the run produced before it stopped. The memory limit is
+the exception: going over it sheds caches and old tool results instead of
+stopping the run.
+"""
+
+import asyncio
+import hashlib
+import json
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any
+
+from pydantic_ai import RunContext
+from pydantic_ai.capabilities import AbstractCapability
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.messages import ToolCallPart
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.usage import UsageLimits
+
+from llm_code.memory import MIB, MemoryCeiling
+from llm_code.settings import Settings
+
+
+@dataclass(frozen=True)
+class RunLimits:
+    """Limits for one prompt; zero disables a limit."""
+
+    requests: int = 50
+    total_tokens: int = 0
+    tool_calls: int = 0
+    seconds: float = 0.0
+    repeated_calls: int = 3
+    memory_mb: int = 0
+
+    @classmethod
+    def from_settings(cls, settings: Settings) -> RunLimits:
+        """Return the limits configured in settings."""
+        return cls(
+            requests=settings.max_requests,
+            total_tokens=settings.max_total_tokens,
+            tool_calls=settings.max_tool_calls,
+            seconds=settings.max_run_seconds,
+            repeated_calls=settings.max_repeated_calls,
+            memory_mb=settings.memory_limit_mb,
+        )
+
+    def usage_limits(self) -> UsageLimits:
+        """Return the limits pydantic-ai enforces during a run."""
+        return UsageLimits(
+            request_limit=self.requests or None,
+            total_tokens_limit=self.total_tokens or None,
+            tool_calls_limit=self.tool_calls or None,
+        )
+
+    def memory_ceiling(self) -> MemoryCeiling | None:
+        """Return the session's memory ceiling, if one is set."""
+        return MemoryCeiling(self.memory_mb * MIB) if self.memory_mb else None
+
+
+@asynccontextmanager
+async def run_deadline(seconds: float) -> AsyncIterator[None]:
+    """Stop the enclosed run after ``seconds``; zero means no deadline.
+
+    Raises:
+        UsageLimitExceeded: If the deadline passes.
+    """
+    try:
+        async with asyncio.timeout(seconds or None) as deadline:
+            yield
+    except TimeoutError as exc:
+        if not deadline.expired():
+            raise
+        raise UsageLimitExceeded(
+            f"Exceeded the run time limit of {seconds:g}s"
+        ) from exc
+
+
+@dataclass
+class LoopGuard(AbstractCapability[Any]):
+    """Stop a run when one tool call keeps returning the same result.
+
+    Only consecutive calls count: any call with other arguments or a different
+    result starts the count again.
+
+    Args:
+        max_repeats: Number of identical calls in a row with identical results
+            that stop the run.
+    """
+
+    max_repeats: int = 3
+    _last: tuple[str, int] = field(default=("", 0), repr=False)
+
+    async def for_run(self, ctx: RunContext[Any]) -> LoopGuard:
+        """Return a guard with empty history for each run."""
+        return LoopGuard(self.max_repeats)
+
+    async def after_tool_execute(
+        self,
+        ctx: RunContext[Any],
+        *,
+        call: ToolCallPart,
+        tool_def: ToolDefinition,
+        args: dict[str, Any],
+        result: Any,
+    ) -> Any:
+        """Count repeats of this call and stop the run once it is looping.
+
+        Raises:
+            UsageLimitExceeded: If the call returned the same result
+                ``max_repeats`` times in a row.
+        """
+        digest = _digest([call.tool_name, args, result])
+        previous, count = self._last
+        count = count + 1 if digest == previous else 1
+        self._last = (digest, count)
+        if count >= self.max_repeats:
+            raise UsageLimitExceeded(
+                f"Stopped a loop: {call.tool_name} was called {count} times with "
+                f"the same arguments {json.dumps(args, default=str)[:200]} and "
+                "returned the same result each time"
+            )
+        return result
+
+
+def _digest(value: Any) -> str:
+    payload = json.dumps(value, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
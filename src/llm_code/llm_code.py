@@ -1,20 +1,67 @@
 import asyncio
 import json
+import time
 from collections.abc import AsyncIterable, Awaitable, Callable
-from typing import Any
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, get_args
 
 import click
+from pydantic_ai import capture_run_messages
+from pydantic_ai.exceptions import UsageLimitExceeded
 from pydantic_ai.messages import FunctionToolCallEvent, PartStartEvent
 from pydantic_ai.models import Model
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ThinkingEffort
+from pydantic_ai.usage import RunUsage
 from rich.console import Console
 from rich.status import Status
+from rich.table import Table
 
 from llm_code import __version__
-from llm_code.agent import build_agent
+from llm_code.agent import (
+    DEFAULT_INSTRUCTIONS,
+    build_agent,
+    workspace_root,
+)
+from llm_code.batch import (
+    default_progress_path,
+    format_result,
+    load_batch,
+    run_batch,
+    summarize_results,
+)
+from llm_code.cassette import (
+    REPLAY_PREFIX,
+    Cassette,
+    RecordingModel,
+    build_replay_model,
+)
+from llm_code.checkpoint import (
+    Checkpoint,
+    CheckpointStore,
+    RunSummary,
+    use_checkpoint,
+)
+from llm_code.codemod import FileResult, run_codemod, summarize_codemod
+from llm_code.headless import NdjsonWriter, run_prompt_ndjson
+from llm_code.hedging import HedgedModel, LatencyTracker
+from llm_code.limits import RunLimits, run_deadline
+from llm_code.memory import MemoryProfiler
 from llm_code.models import build_models
-from llm_code.providers import build_providers
+from llm_code.prefetch import read_caches
+from llm_code.providers import build_providers, provider_configs
+from llm_code.response_cache import ResponseCache, track_touches
+from llm_code.router import RoutedModel, RouteLog
+from llm_code.scheduler import RateLimitScheduler, build_schedulers, format_metrics
 from llm_code.settings import Settings
+from llm_code.symbols import symbol_index
 from llm_code.tui import launch_tui
+from llm_code.usage import (
+    GROUP_BY_COLUMNS,
+    UsageLedger,
+    new_session_id,
+)
 
 
 def _build_event_handler(
@@ -43,12 +90,17 @@ def _format_tool_call_status(event: FunctionToolCallEvent) -> str:
         return f"[yellow]Read[/yellow] {_format_value(args.get('path', '?'))}"
     if tool_name == "write":
         return f"[yellow]Write[/yellow] {_format_value(args.get('path', '?'))}"
+    if tool_name == "write_many":
+        files = args.get("files") or {}
+        return f"[yellow]Write[/yellow] {len(files)} files"
     if tool_name == "search":
         search_path = _format_value(args.get("path", "."))
         pattern = _format_value(args.get("pattern"))
         return f"[yellow]Search[/yellow] {search_path} for {pattern}"
     if tool_name == "bash":
         return f"[yellow]Bash[/yellow] {_format_value(args.get('command'))}"
+    if tool_name == "delegate":
+        return f"[yellow]Delegate[/yellow] {len(args.get('tasks') or [])} subtasks"
 
     return f"[yellow]{tool_name}[/yellow] {_format_tool_args(event.part.args)}"
 
@@ -100,50 +152,726 @@ async def run_prompt(
     *,
     model: Model,
     console: Console,
+    ledger: UsageLedger | None = None,
+    session_id: str | None = None,
+    repo_map_tokens: int = 0,
+    prefetch_budget_mb: int = 0,
+    spill_chars: int = 0,
+    response_cache: ResponseCache | None = None,
+    limits: RunLimits | None = None,
+    profiler: MemoryProfiler | None = None,
+    checkpoints: CheckpointStore | None = None,
 ) -> None:
-    """Run the coding agent with a prompt and stream its response."""
-    agent = build_agent(model)
+    """Run the coding agent with a prompt and stream its response.
+
+    With ``response_cache``, a cached run of the same prompt on the same files
+    is replayed instead of calling the model, and new runs are cached. A run
+    that hits one of ``limits`` keeps the text streamed so far and reports why
+    it stopped. With ``profiler``, memory is snapshotted while the run's
+    messages are still alive. With ``checkpoints``, files are saved before the
+    run changes them so ``llm_code undo`` can restore them.
+    """
+    limits = limits or RunLimits()
     event_console = Console(stderr=True)
+    checkpoint = None
+    if checkpoints is not None:
+        checkpoint = await asyncio.to_thread(
+            checkpoints.begin, workspace_root(), prompt
+        )
+    cache_key = None
+    if response_cache is not None:
+        cache_key = await asyncio.to_thread(
+            _response_cache_key, model, prompt, repo_map_tokens
+        )
+        hit = await asyncio.to_thread(
+            response_cache.lookup, cache_key, workspace_root()
+        )
+        if hit is not None:
+            with use_checkpoint(checkpoint):
+                await asyncio.to_thread(hit.replay, workspace_root())
+            console.print(hit.output, markup=False, highlight=False)
+            event_console.print(
+                f"Replayed cached response ({len(hit.effects)} files written)",
+                markup=False,
+                highlight=False,
+            )
+            _print_checkpoint(checkpoint, event_console)
+            return
+
+    agent = build_agent(
+        model,
+        repo_map_tokens=repo_map_tokens,
+        prefetch_budget_mb=prefetch_budget_mb,
+        spill_chars=spill_chars,
+        session_id=session_id,
+        max_repeated_calls=limits.repeated_calls,
+        memory_limit_mb=limits.memory_mb,
+    )
+    started = time.perf_counter()
+    chunks: list[str] = []
+    usage = RunUsage()
+    stopped: UsageLimitExceeded | None = None
 
-    with event_console.status("[cyan]Thinking[/cyan]") as status:
+    with (
+        capture_run_messages() as messages,
+        track_touches() as touches,
+        use_checkpoint(checkpoint),
+        event_console.status("[cyan]Thinking[/cyan]") as status,
+    ):
         event_handler = _build_event_handler(status)
-        async with agent.run_stream(
-            prompt,
-            event_stream_handler=event_handler,
-        ) as result:
-            async for chunk in result.stream_text(delta=True, debounce_by=None):
-                console.print(chunk, end="", markup=False, highlight=False)
+        try:
+            async with (
+                run_deadline(limits.seconds),
+                agent.run_stream(
+                    prompt,
+                    event_stream_handler=event_handler,
+                    usage=usage,
+                    usage_limits=limits.usage_limits(),
+                ) as result,
+            ):
+                async for chunk in result.stream_text(delta=True, debounce_by=None):
+                    chunks.append(chunk)
+                    console.print(chunk, end="", markup=False, highlight=False)
+        except UsageLimitExceeded as exc:
+            stopped = exc
 
     console.print()
+    _print_checkpoint(checkpoint, event_console)
+
+    if stopped is not None:
+        event_console.print(
+            f"Stopped early, the response above is partial: {stopped}",
+            markup=False,
+            highlight=False,
+        )
+    elif response_cache is not None and cache_key is not None:
+        await asyncio.to_thread(
+            response_cache.store, cache_key, touches, "".join(chunks)
+        )
+
+    if ledger is not None:
+        ledger.record_run(
+            model=model.model_name,
+            messages=messages,
+            usage=usage,
+            duration_seconds=time.perf_counter() - started,
+            session_id=session_id,
+        )
+
+    if profiler is not None:
+        await asyncio.to_thread(profiler.snapshot, "prompt")
+
+
+def _print_checkpoint(checkpoint: Checkpoint | None, console: Console) -> None:
+    """Print how to undo a run that saved files to a checkpoint."""
+    if checkpoint is not None and (line := checkpoint.summary_line()):
+        console.print(line, markup=False, highlight=False)
+
+
+def _response_cache_key(model: Model, prompt: str, repo_map_tokens: int) -> str:
+    """Return the response cache key, including the repository map if enabled."""
+    instructions = DEFAULT_INSTRUCTIONS
+    if repo_map_tokens > 0:
+        repo_map = symbol_index(workspace_root()).repo_map(token_budget=repo_map_tokens)
+        instructions = f"{instructions}\n\n{repo_map}"
+    return ResponseCache.key(
+        model=model.model_name,
+        instructions=instructions,
+        prompt=prompt,
+        settings=_generation_settings(model),
+    )
+
+
+def _generation_settings(model: Model) -> dict[str, Any]:
+    """Return the effective settings that shape a model's responses.
+
+    These are the model's own settings, such as reasoning effort, ``max_tokens``,
+    and ``temperature``, without the request timeout. A router adds its route
+    override, its per-route efforts, and its fast model's settings. A hedged
+    model, which has no settings of its own, adds the names and settings of its
+    primary and backup models.
+    """
+    settings: dict[str, Any] = {
+        name: value
+        for name, value in (model.settings or {}).items()
+        if name != "timeout"
+    }
+    wrapper = model
+    while True:
+        if isinstance(wrapper, RoutedModel):
+            settings["route"] = wrapper.route
+            settings["efforts"] = wrapper.efforts
+            settings["fast"] = [
+                wrapper.fast.model_name,
+                _generation_settings(wrapper.fast),
+            ]
+        if isinstance(wrapper, HedgedModel):
+            for role, hedged in (
+                ("primary", wrapper.primary),
+                ("backup", wrapper.backup),
+            ):
+                settings[role] = [hedged.model_name, _generation_settings(hedged)]
+        if not isinstance(wrapper, WrapperModel):
+            return settings
+        wrapper = wrapper.wrapped
+
+
+class _DefaultCommandGroup(click.Group):
+    """Click group that treats unknown leading arguments as the default command.
+
+    A prompt that starts with a subcommand name, such as ``usage of foo in
+    bar.py``, goes to the default command when its words do not parse as that
+    subcommand's arguments.
+    """
+
+    default_command = "run"
+
+    def parse_args(self, ctx: click.Context, args: list[str]) -> list[str]:
+        """Route arguments that do not invoke a subcommand to the default command."""
+        group_options = {
+            name for param in self.params for name in param.opts + param.secondary_opts
+        }
+        group_options.update(self.get_help_option_names(ctx))
+        if not args or (
+            args[0] not in group_options
+            and (args[0] not in self.commands or not self._subcommand_parses(ctx, args))
+        ):
+            args = [self.default_command, *args]
+        return super().parse_args(ctx, args)
+
+    def _subcommand_parses(self, ctx: click.Context, args: list[str]) -> bool:
+        """Return whether ``args`` are a valid call of the subcommand they name."""
+        name, *rest = args
+        command = self.commands[name]
+        if name == self.default_command or any(
+            arg in command.get_help_option_names(ctx) for arg in rest
+        ):
+            return True
+        try:
+            command.make_context(name, rest, parent=ctx).close()
+        except click.UsageError:
+            return False
+        return True
 
 
-@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+def _build_model(
+    settings: Settings,
+) -> tuple[Model, dict[str, RateLimitScheduler]]:
+    """Build the configured model with per-provider rate-limit schedulers."""
+    schedulers = build_schedulers(settings)
+    providers = build_providers(settings, schedulers=schedulers)
+    configs = provider_configs(settings)
+    models = build_models(
+        providers,
+        schedulers=schedulers,
+        profiles=settings.profiles(configs),
+        configs=configs,
+    )
+    return _select_model(settings, models), schedulers
+
+
+def _select_model(settings: Settings, models: dict[str, Model]) -> Model:
+    """Pick the configured model, replaying or recording a cassette if requested."""
+    if settings.model.startswith(REPLAY_PREFIX):
+        cassette = Cassette.load(Path(settings.model.removeprefix(REPLAY_PREFIX)))
+        model: Model = build_replay_model(cassette, latency=settings.replay_latency)
+    else:
+        model = _lookup_model(settings.model, models)
+
+    if settings.backup_model:
+        model = HedgedModel(
+            model,
+            _lookup_model(settings.backup_model, models),
+            hedge_after=settings.hedge_after,
+        )
+
+    if settings.fast_model:
+        model = RoutedModel(
+            _lookup_model(settings.fast_model, models),
+            model,
+            fast_effort=settings.fast_effort,
+            heavy_effort=settings.effort,
+            route=None if settings.route == "auto" else settings.route,
+        )
+
+    if settings.record_cassette:
+        model = RecordingModel(model, Cassette(settings.record_cassette))
+
+    return model
+
+
+def _lookup_model(name: str, models: dict[str, Model]) -> Model:
+    """Return a built model by name."""
+    model = models.get(name)
+    if model is None:
+        raise ValueError(f"Model {name} not found")
+    return model
+
+
+def _load_ledger(settings: Settings) -> UsageLedger:
+    """Open the usage ledger configured in settings."""
+    return UsageLedger(settings.usage_db or UsageLedger.default_path())
+
+
+def _open_checkpoints(settings: Settings) -> CheckpointStore:
+    """Open the checkpoint store configured in settings."""
+    return CheckpointStore(
+        settings.checkpoint_dir or CheckpointStore.default_path(),
+        snapshot=settings.checkpoint_snapshot,
+        keep_runs=settings.checkpoint_runs,
+    )
+
+
+def _load_checkpoints(settings: Settings) -> CheckpointStore | None:
+    """Open the checkpoint store, or return ``None`` if checkpoints are off."""
+    return _open_checkpoints(settings) if settings.checkpoints else None
+
+
+@click.group(
+    cls=_DefaultCommandGroup,
+    context_settings={"help_option_names": ["-h", "--help"]},
+)
 @click.version_option(version=__version__, prog_name="llm_code")
+def main() -> None:
+    """Run the coding agent with PROMPT or launch the TUI when no prompt is given.
+
+    Use `llm_code run ...` for prompts that start with a subcommand name.
+    """
+
+
+@main.command()
+@click.option(
+    "--output",
+    "output_format",
+    type=click.Choice(["text", "json"]),
+    default="text",
+    show_default=True,
+    help="Stream text to the terminal, or NDJSON events for scripts.",
+)
+@click.option(
+    "--route",
+    type=click.Choice(["auto", "fast", "heavy"]),
+    default=None,
+    help="Force the fast or heavy model when `fast_model` is configured.",
+)
+@click.option(
+    "--effort",
+    type=click.Choice(get_args(ThinkingEffort)),
+    default=None,
+    help="Reasoning effort for the model, overriding its profile.",
+)
+@click.option(
+    "--max-tokens",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Maximum output tokens per response, overriding the model's profile.",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Bypass the response cache even when `response_cache` is enabled.",
+)
+@click.option(
+    "--memprofile",
+    is_flag=True,
+    help="Trace allocations and report memory use per turn on stderr.",
+)
 @click.argument("prompt", nargs=-1)
-def main(prompt: tuple[str, ...]) -> None:
+def run(
+    prompt: tuple[str, ...],
+    output_format: str,
+    route: str | None,
+    effort: ThinkingEffort | None,
+    max_tokens: int | None,
+    no_cache: bool,
+    memprofile: bool,
+) -> None:
     """Run the coding agent with PROMPT or launch the TUI when no prompt is given."""
+    profiler = None
+    if memprofile:
+        profiler = MemoryProfiler()
+        profiler.start()
     settings = Settings.load()
-    providers = build_providers(settings)
-    models = build_models(providers)
-
-    model = models.get(settings.model)
-    if model is None:
-        raise ValueError(f"Model {settings.model} not found")
+    overrides = {"route": route, "effort": effort, "max_tokens": max_tokens}
+    settings = settings.model_copy(
+        update={name: value for name, value in overrides.items() if value is not None}
+    )
+    model, schedulers = _build_model(settings)
 
+    ledger = _load_ledger(settings)
+    checkpoints = _load_checkpoints(settings)
+    session_id = new_session_id()
     user_prompt = " ".join(prompt).strip()
 
+    if output_format == "json":
+        if not user_prompt:
+            raise click.UsageError("--output json requires a prompt")
+        succeeded = asyncio.run(
+            run_prompt_ndjson(
+                user_prompt,
+                model=model,
+                writer=NdjsonWriter(),
+                ledger=ledger,
+                session_id=session_id,
+                schedulers=schedulers,
+                repo_map_tokens=settings.repo_map_tokens,
+                prefetch_budget_mb=settings.prefetch_budget_mb,
+                spill_chars=settings.spill_chars,
+                limits=RunLimits.from_settings(settings),
+                checkpoints=checkpoints,
+            )
+        )
+        _print_memory_report(profiler)
+        if not succeeded:
+            raise SystemExit(1)
+        return
+
     if user_prompt:
         console = Console()
+        response_cache = None
+        if settings.response_cache and not no_cache:
+            response_cache = ResponseCache(
+                ResponseCache.default_path(),
+                ttl=timedelta(hours=settings.response_cache_ttl_hours),
+                max_bytes=settings.response_cache_mb * 1024 * 1024,
+            )
         asyncio.run(
             run_prompt(
                 user_prompt,
                 console=console,
                 model=model,
+                ledger=ledger,
+                session_id=session_id,
+                repo_map_tokens=settings.repo_map_tokens,
+                prefetch_budget_mb=settings.prefetch_budget_mb,
+                spill_chars=settings.spill_chars,
+                response_cache=response_cache,
+                limits=RunLimits.from_settings(settings),
+                profiler=profiler,
+                checkpoints=checkpoints,
+            )
+        )
+        if isinstance(routes := getattr(model, "routes", None), RouteLog):
+            for line in routes.summary_lines():
+                Console(stderr=True).print(line, markup=False, highlight=False)
+        for cache in read_caches():
+            for line in cache.stats.summary_lines():
+                Console(stderr=True).print(line, markup=False, highlight=False)
+        _print_memory_report(profiler)
+        return
+
+    launch_tui(
+        model=model,
+        ledger=ledger,
+        session_id=session_id,
+        repo_map_tokens=settings.repo_map_tokens,
+        prefetch_budget_mb=settings.prefetch_budget_mb,
+        spill_chars=settings.spill_chars,
+        limits=RunLimits.from_settings(settings),
+        profiler=profiler,
+        checkpoints=checkpoints,
+    )
+    _print_memory_report(profiler)
+
+
+def _print_memory_report(profiler: MemoryProfiler | None) -> None:
+    """Print the profiler's per-turn reports, snapshotting once if it has none."""
+    if profiler is None:
+        return
+    if not profiler.reports:
+        profiler.snapshot("run")
+    for line in profiler.summary_lines():
+        Console(stderr=True).print(line, markup=False, highlight=False)
+
+
+@main.command()
+@click.argument(
+    "batch_file",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+)
+@click.option(
+    "--concurrency",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of prompts running at once.",
+)
+@click.option(
+    "--timeout",
+    type=float,
+    default=None,
+    help="Default per-item timeout in seconds.",
+)
+@click.option(
+    "--retries",
+    default=2,
+    show_default=True,
+    type=click.IntRange(min=0),
+    help="Extra attempts for items that fail or time out.",
+)
+@click.option(
+    "--progress",
+    "progress_path",
+    type=click.Path(dir_okay=False, path_type=Path),
+    default=None,
+    help="Progress file used to resume. Defaults to BATCH_FILE.progress.jsonl.",
+)
+def batch(
+    batch_file: Path,
+    concurrency: int,
+    timeout: float | None,
+    retries: int,
+    progress_path: Path | None,
+) -> None:
+    """Run every prompt in a JSONL BATCH_FILE concurrently in one process.
+
+    Each line is an object with `id`, `prompt`, and optional `cwd` and
+    `timeout`. Items already completed in the progress file are skipped.
+    """
+    settings = Settings.load()
+    model, schedulers = _build_model(settings)
+    console = Console()
+
+    results = asyncio.run(
+        run_batch(
+            load_batch(batch_file),
+            model=model,
+            progress_path=progress_path or default_progress_path(batch_file),
+            concurrency=concurrency,
+            timeout=timeout,
+            retries=retries,
+            ledger=_load_ledger(settings),
+            session_id=new_session_id(),
+            on_result=lambda result: console.print(
+                format_result(result), markup=False, highlight=False
+            ),
+            repo_map_tokens=settings.repo_map_tokens,
+            prefetch_budget_mb=settings.prefetch_budget_mb,
+            spill_chars=settings.spill_chars,
+            limits=RunLimits.from_settings(settings),
+            checkpoints=_load_checkpoints(settings),
+        )
+    )
+
+    totals = summarize_results(results)
+    console.print(f"{totals['ok']} succeeded, {totals['error']} failed")
+    for line in format_metrics(schedulers):
+        console.print(line, markup=False, highlight=False)
+    if isinstance(latency := getattr(model, "latency", None), LatencyTracker):
+        for line in latency.summary_lines():
+            console.print(line, markup=False, highlight=False)
+    if isinstance(routes := getattr(model, "routes", None), RouteLog):
+        for line in routes.summary_lines():
+            console.print(line, markup=False, highlight=False)
+    for cache in read_caches():
+        for line in cache.stats.summary_lines():
+            console.print(line, markup=False, highlight=False)
+    if totals["error"]:
+        raise SystemExit(1)
+
+
+@main.command("map")
+@click.option(
+    "--glob",
+    "pattern",
+    required=True,
+    help="Relative path or glob of the files to change, e.g. 'src/**/*.py'.",
+)
+@click.option(
+    "--files-per-shard",
+    default=1,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Number of files given to each agent.",
+)
+@click.option(
+    "--concurrency",
+    default=4,
+    show_default=True,
+    type=click.IntRange(min=1),
+    help="Maximum number of shards running at once.",
+)
+@click.argument("prompt", nargs=-1, required=True)
+def map_files(
+    pattern: str,
+    files_per_shard: int,
+    concurrency: int,
+    prompt: tuple[str, ...],
+) -> None:
+    """Apply PROMPT to every file matching --glob with one agent per shard.
+
+    Edits are written only if the file has not changed since its shard read
+    it; other edits are reported as conflicts.
+    """
+    settings = Settings.load()
+    model, _schedulers = _build_model(settings)
+    console = Console()
+    user_prompt = " ".join(prompt)
+    checkpoint = None
+    if (checkpoints := _load_checkpoints(settings)) is not None:
+        checkpoint = checkpoints.begin(workspace_root(), user_prompt)
+
+    started = time.perf_counter()
+    with use_checkpoint(checkpoint):
+        results = asyncio.run(
+            run_codemod(
+                user_prompt,
+                pattern,
+                model=model,
+                files_per_shard=files_per_shard,
+                concurrency=concurrency,
+                ledger=_load_ledger(settings),
+                session_id=new_session_id(),
             )
         )
+    if not results:
+        raise click.UsageError(f"No files match {pattern}")
+
+    console.print(_format_codemod_table(results))
+    _print_checkpoint(checkpoint, console)
+    counts = summarize_codemod(results)
+    tokens = sum({result.shard: result.tokens for result in results}.values())
+    console.print(
+        f"{counts['changed']} changed, {counts['unchanged']} unchanged, "
+        f"{counts['conflict']} conflicts, {counts['error']} errors; "
+        f"{tokens:,} tokens in {time.perf_counter() - started:.1f}s"
+    )
+    if counts["conflict"] or counts["error"]:
+        raise SystemExit(1)
+
+
+def _format_codemod_table(results: list[FileResult]) -> Table:
+    """Render per-file codemod results as a Rich table."""
+    table = Table()
+    table.add_column("File")
+    table.add_column("Shard", justify="right")
+    table.add_column("Status")
+    table.add_column("Time", justify="right")
+    table.add_column("Tokens", justify="right")
+    table.add_column("Error")
+
+    for result in sorted(results, key=lambda result: result.path):
+        table.add_row(
+            result.path,
+            str(result.shard),
+            result.status,
+            f"{result.elapsed:.1f}s",
+            f"{result.tokens:,}",
+            result.error or "",
+        )
+
+    return table
+
+
+@main.command()
+@click.option(
+    "--by",
+    "group_by",
+    type=click.Choice(GROUP_BY_COLUMNS),
+    multiple=True,
+    help="Group totals by day, model, or project. Repeatable.",
+)
+@click.option(
+    "--since",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default=None,
+    help="Only include runs on or after this day (YYYY-MM-DD).",
+)
+def usage(group_by: tuple[str, ...], since: datetime | None) -> None:
+    """Report recorded token usage and spend."""
+    ledger = _load_ledger(Settings.load())
+    rows = ledger.summarize(
+        group_by=group_by or GROUP_BY_COLUMNS,
+        since=since.date() if since else None,
+    )
+    Console().print(_format_usage_table(rows, group_by=group_by or GROUP_BY_COLUMNS))
+
+
+def _format_usage_table(
+    rows: list[dict[str, Any]],
+    *,
+    group_by: tuple[str, ...],
+) -> Table:
+    """Render aggregated usage rows as a Rich table."""
+    table = Table()
+    for column in group_by:
+        table.add_column(column.capitalize())
+    for label in ("Runs", "Input", "Output", "Cached", "Thinking", "Tools"):
+        table.add_column(label, justify="right")
+    table.add_column("Time", justify="right")
+    table.add_column("Cost", justify="right")
+
+    for row in rows:
+        table.add_row(
+            *[str(row[column]) for column in group_by],
+            *[
+                f"{row[key]:,}"
+                for key in (
+                    "runs",
+                    "input_tokens",
+                    "output_tokens",
+                    "cache_read_tokens",
+                    "thinking_tokens",
+                    "tool_calls",
+                )
+            ],
+            f"{row['duration_seconds']:.1f}s",
+            f"${row['cost']:.4f}",
+        )
+
+    return table
+
+
+@main.command()
+@click.option(
+    "--run",
+    "run_id",
+    default=None,
+    help="Run id, or a unique prefix, to undo. Defaults to the latest run.",
+)
+@click.option(
+    "--list",
+    "list_runs",
+    is_flag=True,
+    help="List recent runs in this workspace instead of undoing one.",
+)
+def undo(run_id: str | None, list_runs: bool) -> None:
+    """Restore the files an agent run changed to their contents before it.
+
+    Without --run, the latest run in this workspace that has not been undone
+    is restored.
+    """
+    checkpoints = _open_checkpoints(Settings.load())
+    root = workspace_root()
+    console = Console()
+    if list_runs:
+        console.print(_format_runs_table(checkpoints.runs(root)))
         return
 
-    launch_tui(model=model)
+    try:
+        result = checkpoints.undo(root, run_id)
+    except ValueError as exc:
+        raise click.ClickException(str(exc)) from exc
+    for line in result.summary_lines():
+        console.print(line, markup=False, highlight=False)
+
+
+def _format_runs_table(runs: list[RunSummary]) -> Table:
+    """Render recorded checkpoint runs as a Rich table."""
+    table = Table()
+    for label in ("Run", "Started", "Files", "Snapshot", "Prompt"):
+        table.add_column(label)
+
+    for run in runs:
+        table.add_row(
+            run.id[:12] + (" (undone)" if run.undone else ""),
+            run.created_at.astimezone().strftime("%Y-%m-%d %H:%M"),
+            str(run.files),
+            run.snapshot or "",
+            _format_value(run.prompt, max_length=60),
+        )
+
+    return table
 
 
 if __name__ == "__main__":
@@ -0,0 +1,325 @@
+"""Memory profiling and a memory ceiling for long sessions.
+
+``MemoryProfiler`` takes a ``tracemalloc`` snapshot after each turn. It
+attributes live allocations to the transcript, the message history, caches, or
+tool buffers by the innermost frame of their traceback that belongs to one of
+them. Each report lists the lines holding the most memory and those that grew
+since the previous turn.
+
+``MemoryCeiling`` compares the process's resident memory against a limit.
+When a session crosses it, ``relieve`` empties the read caches, collects
+garbage, and returns freed heap to the operating system, and the
+``MemoryGuard`` capability also drops old tool results from the running message
+history, so a long session sheds what it can rebuild before the host kills it.
+A session that stays over the limit is relieved again only after it has grown
+by another ``RELIEF_STEP`` of the limit, instead of before every request.
+"""
+
+import ctypes
+import gc
+import os
+import sysconfig
+import tracemalloc
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from pydantic_ai import RunContext
+from pydantic_ai.capabilities import AbstractCapability
+from pydantic_ai.messages import ModelMessage, ModelRequest, ToolReturnPart
+from pydantic_ai.models import ModelRequestContext
+
+from llm_code.prefetch import read_caches
+
+MIB = 1024 * 1024
+RELIEF_STEP = 0.1
+COMPACTED_TOOL_RESULT = (
+    "[Tool result dropped to stay under the memory limit. "
+    "Call the tool again if it is still needed.]"
+)
+
+CATEGORIES: dict[str, tuple[str, ...]] = {
+    "transcript": ("llm_code/tui.py", "/textual/", "/rich/"),
+    "message history": (
+        "/pydantic_ai/",
+        "/openai/",
+        "/anthropic/",
+        "/google/genai/",
+        "/httpx/",
+        "/httpcore/",
+    ),
+    "caches": (
+        "llm_code/prefetch.py",
+        "llm_code/symbols.py",
+        "llm_code/retrieval.py",
+        "llm_code/response_cache.py",
+        "llm_code/watcher.py",
+    ),
+    "tool buffers": (
+        "llm_code/agent.py",
+        "llm_code/spill.py",
+        "llm_code/pysearch.py",
+        "llm_code/codemod.py",
+    ),
+}
+OTHER = "other"
+
+_STDLIB = sysconfig.get_paths()["stdlib"]
+
+_IGNORED = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, __file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+@dataclass(frozen=True)
+class MemoryReport:
+    """Live memory after one turn."""
+
+    label: str
+    traced: int
+    peak: int
+    resident: int | None
+    categories: dict[str, int]
+    top: list[tuple[str, int]]
+    growth: list[tuple[str, int]]
+
+    def headline(self) -> str:
+        """Summarize the report on one line."""
+        resident = "" if self.resident is None else f", rss {_mib(self.resident)}"
+        split = ", ".join(
+            f"{name} {_mib(size)}" for name, size in self.categories.items()
+        )
+        return (
+            f"{self.label}: traced {_mib(self.traced)} "
+            f"(peak {_mib(self.peak)}){resident}; {split}"
+        )
+
+    def lines(self) -> list[str]:
+        """Format the headline, top allocators, and growth since the last turn."""
+        lines = [self.headline(), "  top allocators:"]
+        lines.extend(f"    {_mib(size):>10}  {where}" for where, size in self.top)
+        if self.growth:
+            lines.append("  grew since the previous turn:")
+            lines.extend(
+                f"    {'+' + _mib(size):>10}  {where}" for where, size in self.growth
+            )
+        return lines
+
+
+class MemoryProfiler:
+    """Take ``tracemalloc`` snapshots per turn and report where memory went.
+
+    Args:
+        frames: Frames kept per allocation; more frames attribute allocations
+            made through libraries more accurately but cost more memory.
+        top: Number of allocating lines listed per report.
+    """
+
+    def __init__(self, *, frames: int = 25, top: int = 10) -> None:
+        self.frames = frames
+        self.top = top
+        self.reports: list[MemoryReport] = []
+        self._previous: dict[str, int] | None = None
+
+    def start(self) -> None:
+        """Start tracing allocations, if not already tracing."""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+
+    def stop(self) -> None:
+        """Stop tracing and free the traces."""
+        tracemalloc.stop()
+        self._previous = None
+
+    def snapshot(self, label: str) -> MemoryReport:
+        """Snapshot live allocations and record a report for this turn.
+
+        Allocations are grouped by the innermost line outside the standard
+        library, so a file read shows up at the tool that read it rather than
+        in the codec that decoded it.
+        """
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED)
+        traced, peak = tracemalloc.get_traced_memory()
+
+        categories = dict.fromkeys([*CATEGORIES, OTHER], 0)
+        owners: dict[str, int] = {}
+        seen: dict[tracemalloc.Traceback, tuple[str, str]] = {}
+        for trace in snapshot.traces:
+            attribution = seen.get(trace.traceback)
+            if attribution is None:
+                attribution = seen[trace.traceback] = (
+                    categorize(trace.traceback),
+                    _owner(trace.traceback),
+                )
+            category, owner = attribution
+            categories[category] += trace.size
+            owners[owner] = owners.get(owner, 0) + trace.size
+
+        previous = self._previous
+        growth = []
+        if previous is not None:
+            growth = [
+                (owner, size - previous.get(owner, 0))
+                for owner, size in owners.items()
+                if size > previous.get(owner, 0)
+            ]
+        self._previous = owners
+
+        report = MemoryReport(
+            label=label,
+            traced=traced,
+            peak=peak,
+            resident=resident_memory(),
+            categories=categories,
+            top=_largest(owners.items(), self.top),
+            growth=_largest(growth, self.top),
+        )
+        self.reports.append(report)
+        return report
+
+    def summary_lines(self) -> list[str]:
+        """Format one line per turn, then the details of the last turn."""
+        if not self.reports:
+            return []
+        return [
+            *(report.headline() for report in self.reports[:-1]),
+            *self.reports[-1].lines(),
+        ]
+
+
+def categorize(traceback: tracemalloc.Traceback) -> str:
+    """Return the category of the innermost frame that belongs to one."""
+    for frame in reversed(traceback):
+        filename = frame.filename.replace(os.sep, "/")
+        for category, fragments in CATEGORIES.items():
+            if any(fragment in filename for fragment in fragments):
+                return category
+    return OTHER
+
+
+def _owner(traceback: tracemalloc.Traceback) -> str:
+    """Return the innermost frame outside the standard library as ``file:line``."""
+    for frame in reversed(traceback):
+        filename = frame.filename
+        if filename.startswith("<") or (
+            filename.startswith(_STDLIB) and "site-packages" not in filename
+        ):
+            continue
+        return f"{filename}:{frame.lineno}"
+    return str(traceback[-1])
+
+
+def _largest(sizes: Iterable[tuple[str, int]], count: int) -> list[tuple[str, int]]:
+    return sorted(sizes, key=lambda item: item[1], reverse=True)[:count]
+
+
+@dataclass
+class MemoryCeiling:
+    """Resident memory limit that sheds caches and history when exceeded.
+
+    Args:
+        limit: Resident memory in bytes above which memory is relieved.
+    """
+
+    limit: int
+    relieved: int = 0
+    _threshold: int = field(default=0, repr=False, compare=False)
+
+    def exceeded(self) -> bool:
+        """Return whether resident memory is over the limit.
+
+        Always false where resident memory cannot be read.
+        """
+        resident = resident_memory()
+        return resident is not None and resident > self.limit
+
+    def crossed(self) -> bool:
+        """Return whether resident memory has just crossed a relief threshold.
+
+        The first threshold is the limit. Each crossing raises the next one to
+        ``RELIEF_STEP`` of the limit above current memory, and dropping back
+        under the limit resets it. Always false where resident memory cannot
+        be read.
+        """
+        resident = resident_memory()
+        if resident is None or resident <= self.limit:
+            self._threshold = self.limit
+            return False
+        if resident <= self._threshold:
+            return False
+        self._threshold = resident + int(self.limit * RELIEF_STEP)
+        return True
+
+    def relieve(self) -> None:
+        """Empty the read caches and return freed memory to the OS."""
+        for cache in read_caches():
+            cache.clear()
+        gc.collect()
+        _trim_heap()
+        self.relieved += 1
+
+
+@dataclass
+class MemoryGuard(AbstractCapability[Any]):
+    """Relieve memory and compact the history when a run is over the ceiling.
+
+    Args:
+        ceiling: The memory ceiling checked before each model request.
+    """
+
+    ceiling: MemoryCeiling
+
+    async def before_model_request(
+        self, ctx: RunContext[Any], request_context: ModelRequestContext
+    ) -> ModelRequestContext:
+        """Drop old tool results and caches if memory crossed the ceiling."""
+        if self.ceiling.crossed():
+            compact_history(request_context.messages)
+            self.ceiling.relieve()
+        return request_context
+
+
+def compact_history(messages: list[ModelMessage], *, keep: int = 2) -> int:
+    """Replace tool results before the last ``keep`` requests with a note.
+
+    Returns:
+        The number of tool results replaced.
+    """
+    requests = [message for message in messages if isinstance(message, ModelRequest)]
+    compacted = 0
+    for request in requests[: max(len(requests) - keep, 0)]:
+        for part in request.parts:
+            if (
+                isinstance(part, ToolReturnPart)
+                and part.content != COMPACTED_TOOL_RESULT
+            ):
+                part.content = COMPACTED_TOOL_RESULT
+                compacted += 1
+    return compacted
+
+
+def resident_memory() -> int | None:
+    """Return this process's resident memory in bytes, where it can be read."""
+    try:
+        pages = int(Path("/proc/self/statm").read_text().split()[1])
+    except OSError, IndexError, ValueError:
+        return None
+    return pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def _trim_heap() -> None:
+    """Ask glibc to return free heap pages to the OS; a no-op elsewhere."""
+    try:
+        ctypes.CDLL("libc.so.6").malloc_trim(0)
+    except OSError, AttributeError:
+        pass
+
+
+def _mib(size: int) -> str:
+    return f"{size / MIB:.1f} MiB"
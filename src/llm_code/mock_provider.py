@@ -0,0 +1,672 @@
+"""Local stand-in for provider APIs, for end-to-end load and soak tests.
+
+``MockProviderServer`` speaks enough of the OpenAI Responses and Anthropic
+Messages APIs, streaming and non-streaming, for the real SDK clients to talk
+to it over HTTP. Replies follow a script of turns, each with text and tool
+calls. The server paces them with a configurable time to first token and
+tokens per second, and can fail requests with 429 and 5xx errors. That lets
+tests cover the parts a fake ``Model`` skips: SSE parsing, connection reuse,
+backpressure, and retries.
+
+The server is plain asyncio with HTTP/1.1 keep-alive and chunked SSE bodies.
+It keeps connection and request counts, served from ``GET /stats``. Run it on
+its own with::
+
+    python -m llm_code.mock_provider --port 8123 --ttft 0.2 --tps 80
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import re
+import time
+from dataclasses import asdict, dataclass, field, replace
+from pathlib import Path
+from typing import Any
+
+import click
+
+MODEL_NAME = "mock-model"
+
+_ERROR_MESSAGES = {
+    429: ("rate_limit_error", "Too Many Requests"),
+    500: ("api_error", "Internal Server Error"),
+    502: ("api_error", "Bad Gateway"),
+    503: ("overloaded_error", "Service Unavailable"),
+    529: ("overloaded_error", "Overloaded"),
+}
+_TOKEN_PATTERN = re.compile(r"\s*\S+")
+_ARGUMENT_CHUNK = 16
+
+
+@dataclass(frozen=True)
+class ToolCall:
+    """A tool call the mock model makes."""
+
+    name: str
+    arguments: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class Turn:
+    """One scripted model response: text, then any tool calls."""
+
+    text: str = ""
+    tool_calls: tuple[ToolCall, ...] = ()
+
+
+@dataclass(frozen=True)
+class MockConfig:
+    """How the mock provider answers.
+
+    Args:
+        ttft: Seconds before the first token of each response.
+        tokens_per_second: Streaming rate after the first token; zero streams
+            as fast as the client reads.
+        script: Responses by turn. A request gets the turn matching the number
+            of model responses already in its history; later requests repeat
+            the last turn.
+        error_rate: Fraction of requests that fail with one of
+            ``error_statuses``.
+        fail_first: Number of requests that fail before any succeed.
+        error_statuses: Status codes injected failures pick from.
+        retry_after: Seconds sent in the ``retry-after`` header of failures.
+        seed: Seed for choosing which requests fail.
+    """
+
+    ttft: float = 0.0
+    tokens_per_second: float = 0.0
+    script: tuple[Turn, ...] = (Turn(text="Done."),)
+    error_rate: float = 0.0
+    fail_first: int = 0
+    error_statuses: tuple[int, ...] = (429, 500, 503)
+    retry_after: float = 0.0
+    seed: int | None = None
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> MockConfig:
+        """Build a config from JSON-style data, such as a script file."""
+        data = dict(data)
+        if "script" in data:
+            data["script"] = tuple(
+                Turn(
+                    text=turn.get("text", ""),
+                    tool_calls=tuple(
+                        ToolCall(call["name"], call.get("arguments", {}))
+                        for call in turn.get("tool_calls", [])
+                    ),
+                )
+                for turn in data["script"]
+            )
+        if "error_statuses" in data:
+            data["error_statuses"] = tuple(data["error_statuses"])
+        return cls(**data)
+
+    @classmethod
+    def load(cls, path: Path) -> MockConfig:
+        """Load a config from a JSON file."""
+        return cls.from_dict(json.loads(path.read_text(encoding="utf-8")))
+
+
+@dataclass
+class ServerStats:
+    """Traffic the mock provider has served."""
+
+    connections: int = 0
+    open_connections: int = 0
+    requests: int = 0
+    streams: int = 0
+    errors: int = 0
+    disconnects: int = 0
+
+
+class MockProviderServer:
+    """Serve scripted OpenAI Responses and Anthropic Messages replies.
+
+    Point an OpenAI or Anthropic provider at ``base_url``. Requests are routed
+    by path suffix, so ``/v1/responses`` and ``/v1/messages`` both work from
+    the same base URL.
+    """
+
+    def __init__(
+        self,
+        config: MockConfig | None = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.stats = ServerStats()
+        self._server: asyncio.Server | None = None
+        self._random = random.Random(self.config.seed)
+        self._ids = itertools.count(1)
+
+    @property
+    def base_url(self) -> str:
+        """Return the base URL to configure providers with."""
+        return f"http://{self.host}:{self.port}/v1"
+
+    async def start(self) -> None:
+        """Start listening; with port 0, ``port`` is set to the bound port."""
+        self._server = await asyncio.start_server(
+            self._serve_connection, self.host, self.port
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self) -> None:
+        """Stop listening and close open connections."""
+        if self._server is None:
+            return
+        self._server.close()
+        self._server.close_clients()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def __aenter__(self) -> MockProviderServer:
+        await self.start()
+        return self
+
+    async def __aexit__(self, *_exc_info: object) -> None:
+        await self.close()
+
+    async def _serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve requests on one keep-alive connection until the client leaves."""
+        self.stats.connections += 1
+        self.stats.open_connections += 1
+        try:
+            while await self._serve_request(reader, writer):
+                pass
+        except (
+            asyncio.IncompleteReadError,
+            asyncio.LimitOverrunError,
+            ConnectionError,
+        ):
+            self.stats.disconnects += 1
+        finally:
+            self.stats.open_connections -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _serve_request(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+        """Read and answer one request; return whether to keep the connection."""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError as exc:
+            if exc.partial:
+                raise
+            return False
+
+        request_line, *header_lines = head.decode("latin-1").split("\r\n")
+        method, target, version = request_line.split(" ", 2)
+        headers = {}
+        for line in header_lines:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        length = int(headers.get("content-length", "0"))
+        body = await reader.readexactly(length) if length else b""
+        keep_alive = (
+            version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        )
+
+        self.stats.requests += 1
+        path = target.split("?", 1)[0]
+        if method == "GET" and path.endswith("/stats"):
+            await _send_json(writer, 200, asdict(self.stats), keep_alive=keep_alive)
+        elif method == "POST" and path.endswith(("/responses", "/messages")):
+            await self._answer(
+                writer,
+                json.loads(body or b"{}"),
+                anthropic=path.endswith("/messages"),
+                keep_alive=keep_alive,
+            )
+        else:
+            await _send_json(
+                writer, 404, {"error": {"message": f"No route for {path}"}}
+            )
+        return keep_alive
+
+    async def _answer(
+        self,
+        writer: asyncio.StreamWriter,
+        request: dict[str, Any],
+        *,
+        anthropic: bool,
+        keep_alive: bool,
+    ) -> None:
+        """Answer a model request with the scripted turn or an injected error."""
+        status = self._injected_error()
+        if status is not None:
+            self.stats.errors += 1
+            kind, message = _ERROR_MESSAGES.get(status, ("api_error", "Error"))
+            error = (
+                {"type": "error", "error": {"type": kind, "message": message}}
+                if anthropic
+                else {"error": {"message": message, "type": kind, "code": None}}
+            )
+            await _send_json(
+                writer,
+                status,
+                error,
+                headers={"retry-after": f"{self.config.retry_after:g}"},
+                keep_alive=keep_alive,
+            )
+            return
+
+        turns = _model_turns(request, anthropic=anthropic)
+        turn = self.config.script[min(turns, len(self.config.script) - 1)]
+        reply = _Reply(
+            id=next(self._ids),
+            model=request.get("model", MODEL_NAME),
+            turn=turn,
+            input_tokens=max(1, len(json.dumps(request)) // 4),
+        )
+        events = reply.anthropic_events() if anthropic else reply.openai_events()
+
+        if not request.get("stream"):
+            await asyncio.sleep(self.config.ttft)
+            if self.config.tokens_per_second:
+                await asyncio.sleep(reply.output_tokens / self.config.tokens_per_second)
+            final = reply.anthropic_message() if anthropic else reply.openai_response()
+            await _send_json(writer, 200, final, keep_alive=keep_alive)
+            return
+
+        self.stats.streams += 1
+        writer.write(
+            _head(
+                200,
+                {
+                    "content-type": "text/event-stream",
+                    "cache-control": "no-cache",
+                    "transfer-encoding": "chunked",
+                },
+                keep_alive=keep_alive,
+            )
+        )
+        await writer.drain()
+        await asyncio.sleep(self.config.ttft)
+        interval = (
+            1 / self.config.tokens_per_second if self.config.tokens_per_second else 0
+        )
+        first = True
+        for name, data, is_token in events:
+            if is_token:
+                if not first and interval:
+                    await asyncio.sleep(interval)
+                first = False
+            payload = f"event: {name}\ndata: {json.dumps(data)}\n\n".encode()
+            writer.write(b"%x\r\n%s\r\n" % (len(payload), payload))
+            await writer.drain()
+        writer.write(b"0\r\n\r\n")
+        await writer.drain()
+
+    def _injected_error(self) -> int | None:
+        """Return the status to fail this request with, if it should fail."""
+        failures = self.stats.errors
+        if failures < self.config.fail_first or (
+            self.config.error_rate and self._random.random() < self.config.error_rate
+        ):
+            return self._random.choice(self.config.error_statuses)
+        return None
+
+
+@dataclass
+class _Reply:
+    """Events and final bodies for one scripted turn."""
+
+    id: int
+    model: str
+    turn: Turn
+    input_tokens: int
+    output_tokens: int = 0
+
+    def __post_init__(self) -> None:
+        self.output_tokens = len(_text_tokens(self.turn.text)) + sum(
+            len(_argument_chunks(call)) for call in self.turn.tool_calls
+        )
+
+    def _usage(self) -> dict[str, Any]:
+        return {
+            "input_tokens": self.input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": self.output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": self.input_tokens + self.output_tokens,
+        }
+
+    def _openai_items(self) -> list[dict[str, Any]]:
+        items: list[dict[str, Any]] = []
+        if self.turn.text:
+            items.append(
+                {
+                    "type": "message",
+                    "id": f"msg_{self.id}",
+                    "role": "assistant",
+                    "status": "completed",
+                    "content": [
+                        {
+                            "type": "output_text",
+                            "text": self.turn.text,
+                            "annotations": [],
+                        }
+                    ],
+                }
+            )
+        for index, call in enumerate(self.turn.tool_calls):
+            items.append(
+                {
+                    "type": "function_call",
+                    "id": f"fc_{self.id}_{index}",
+                    "call_id": f"call_{self.id}_{index}",
+                    "name": call.name,
+                    "arguments": json.dumps(call.arguments),
+                    "status": "completed",
+                }
+            )
+        return items
+
+    def openai_response(self, *, status: str = "completed") -> dict[str, Any]:
+        """Return the Responses API body for this turn."""
+        completed = status == "completed"
+        return {
+            "id": f"resp_{self.id}",
+            "object": "response",
+            "created_at": int(time.time()),
+            "model": self.model,
+            "status": status,
+            "output": self._openai_items() if completed else [],
+            "usage": self._usage() if completed else None,
+            "parallel_tool_calls": True,
+            "tool_choice": "auto",
+            "tools": [],
+            "incomplete_details": None,
+            "error": None,
+        }
+
+    def openai_events(self) -> list[tuple[str, dict[str, Any], bool]]:
+        """Return Responses API stream events as ``(name, data, is_token)``."""
+        events: list[tuple[str, dict[str, Any], bool]] = []
+
+        def add(event: str, is_token: bool = False, /, **data: Any) -> None:
+            data = {"type": event, "sequence_number": len(events), **data}
+            events.append((event, data, is_token))
+
+        add("response.created", response=self.openai_response(status="in_progress"))
+        for index, item in enumerate(self._openai_items()):
+            if item["type"] == "message":
+                text = item["content"][0]["text"]
+                add(
+                    "response.output_item.added",
+                    output_index=index,
+                    item={**item, "status": "in_progress", "content": []},
+                )
+                part = {"type": "output_text", "text": "", "annotations": []}
+                add(
+                    "response.content_part.added",
+                    item_id=item["id"],
+                    output_index=index,
+                    content_index=0,
+                    part=part,
+                )
+                for token in _text_tokens(text):
+                    add(
+                        "response.output_text.delta",
+                        True,
+                        item_id=item["id"],
+                        output_index=index,
+                        content_index=0,
+                        delta=token,
+                        logprobs=[],
+                    )
+                add(
+                    "response.output_text.done",
+                    item_id=item["id"],
+                    output_index=index,
+                    content_index=0,
+                    text=text,
+                    logprobs=[],
+                )
+                add(
+                    "response.content_part.done",
+                    item_id=item["id"],
+                    output_index=index,
+                    content_index=0,
+                    part={**part, "text": text},
+                )
+            else:
+                add(
+                    "response.output_item.added",
+                    output_index=index,
+                    item={**item, "status": "in_progress", "arguments": ""},
+                )
+                for chunk in _chunks(item["arguments"]):
+                    add(
+                        "response.function_call_arguments.delta",
+                        True,
+                        item_id=item["id"],
+                        output_index=index,
+                        delta=chunk,
+                    )
+                add(
+                    "response.function_call_arguments.done",
+                    item_id=item["id"],
+                    output_index=index,
+                    name=item["name"],
+                    arguments=item["arguments"],
+                )
+            add("response.output_item.done", output_index=index, item=item)
+        add("response.completed", response=self.openai_response())
+        return events
+
+    def _anthropic_blocks(self) -> list[dict[str, Any]]:
+        blocks: list[dict[str, Any]] = []
+        if self.turn.text:
+            blocks.append({"type": "text", "text": self.turn.text})
+        for index, call in enumerate(self.turn.tool_calls):
+            blocks.append(
+                {
+                    "type": "tool_use",
+                    "id": f"toolu_{self.id}_{index}",
+                    "name": call.name,
+                    "input": call.arguments,
+                }
+            )
+        return blocks
+
+    def anthropic_message(self, *, complete: bool = True) -> dict[str, Any]:
+        """Return the Messages API body for this turn."""
+        stop_reason = "tool_use" if self.turn.tool_calls else "end_turn"
+        return {
+            "id": f"msg_{self.id}",
+            "type": "message",
+            "role": "assistant",
+            "model": self.model,
+            "content": self._anthropic_blocks() if complete else [],
+            "stop_reason": stop_reason if complete else None,
+            "stop_sequence": None,
+            "usage": {
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens if complete else 1,
+                "cache_creation_input_tokens": 0,
+                "cache_read_input_tokens": 0,
+            },
+        }
+
+    def anthropic_events(self) -> list[tuple[str, dict[str, Any], bool]]:
+        """Return Messages API stream events as ``(name, data, is_token)``."""
+        events: list[tuple[str, dict[str, Any], bool]] = []
+
+        def add(event: str, is_token: bool = False, /, **data: Any) -> None:
+            events.append((event, {"type": event, **data}, is_token))
+
+        add("message_start", message=self.anthropic_message(complete=False))
+        for index, block in enumerate(self._anthropic_blocks()):
+            if block["type"] == "text":
+                add(
+                    "content_block_start",
+                    index=index,
+                    content_block={"type": "text", "text": ""},
+                )
+                for token in _text_tokens(block["text"]):
+                    add(
+                        "content_block_delta",
+                        True,
+                        index=index,
+                        delta={"type": "text_delta", "text": token},
+                    )
+            else:
+                add(
+                    "content_block_start",
+                    index=index,
+                    content_block={**block, "input": {}},
+                )
+                for chunk in _chunks(json.dumps(block["input"])):
+                    add(
+                        "content_block_delta",
+                        True,
+                        index=index,
+                        delta={"type": "input_json_delta", "partial_json": chunk},
+                    )
+            add("content_block_stop", index=index)
+        message = self.anthropic_message()
+        add(
+            "message_delta",
+            delta={"stop_reason": message["stop_reason"], "stop_sequence": None},
+            usage={"output_tokens": self.output_tokens},
+        )
+        add("message_stop")
+        return events
+
+
+def _model_turns(request: dict[str, Any], *, anthropic: bool) -> int:
+    """Count the model responses already in a request's history."""
+    if anthropic:
+        return sum(
+            1
+            for message in request.get("messages", [])
+            if message["role"] == "assistant"
+        )
+    items = request.get("input", [])
+    if isinstance(items, str):
+        return 0
+    turns = 0
+    in_response = False
+    for item in items:
+        from_model = item.get("role") == "assistant" or item.get("type") in (
+            "function_call",
+            "reasoning",
+        )
+        if from_model and not in_response:
+            turns += 1
+        in_response = from_model
+    return turns
+
+
+def _text_tokens(text: str) -> list[str]:
+    """Split text into word-sized streaming deltas."""
+    return _TOKEN_PATTERN.findall(text)
+
+
+def _argument_chunks(call: ToolCall) -> list[str]:
+    return _chunks(json.dumps(call.arguments))
+
+
+def _chunks(text: str) -> list[str]:
+    """Split tool call arguments into fixed-size streaming deltas."""
+    return [
+        text[start : start + _ARGUMENT_CHUNK]
+        for start in range(0, len(text), _ARGUMENT_CHUNK)
+    ]
+
+
+def _head(status: int, headers: dict[str, str], *, keep_alive: bool = True) -> bytes:
+    """Return an HTTP/1.1 status line and headers."""
+    reason = _ERROR_MESSAGES.get(status, ("", "OK" if status == 200 else "Error"))[1]
+    lines = [f"HTTP/1.1 {status} {reason}"]
+    lines.extend(f"{name}: {value}" for name, value in headers.items())
+    lines.append(f"connection: {'keep-alive' if keep_alive else 'close'}")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+async def _send_json(
+    writer: asyncio.StreamWriter,
+    status: int,
+    data: Any,
+    *,
+    headers: dict[str, str] | None = None,
+    keep_alive: bool = True,
+) -> None:
+    """Send a complete JSON response."""
+    body = json.dumps(data).encode("utf-8")
+    writer.write(
+        _head(
+            status,
+            {
+                "content-type": "application/json",
+                "content-length": str(len(body)),
+                **(headers or {}),
+            },
+            keep_alive=keep_alive,
+        )
+        + body
+    )
+    await writer.drain()
+
+
+@click.command(context_settings={"help_option_names": ["-h", "--help"]})
+@click.option("--host", default="127.0.0.1", show_default=True)
+@click.option("--port", default=0, show_default=True, help="0 picks a free port.")
+@click.option(
+    "--script",
+    type=click.Path(exists=True, dir_okay=False, path_type=Path),
+    default=None,
+    help="JSON file with MockConfig fields, including the turn script.",
+)
+@click.option("--ttft", type=float, default=None, help="Seconds to first token.")
+@click.option("--tps", type=float, default=None, help="Tokens per second.")
+@click.option(
+    "--error-rate", type=float, default=None, help="Fraction of requests to fail."
+)
+def main(
+    host: str,
+    port: int,
+    script: Path | None,
+    ttft: float | None,
+    tps: float | None,
+    error_rate: float | None,
+) -> None:
+    """Run the mock provider until interrupted, printing its base URL."""
+    config = MockConfig.load(script) if script else MockConfig()
+    overrides = {
+        "ttft": ttft,
+        "tokens_per_second": tps,
+        "error_rate": error_rate,
+    }
+    config = replace(
+        config,
+        **{name: value for name, value in overrides.items() if value is not None},
+    )
+
+    async def serve() -> None:
+        async with MockProviderServer(config, host=host, port=port) as server:
+            click.echo(server.base_url)
+            await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,27 @@
-"""Registry of LLM models."""
+"""Registry of LLM models.
 
-from pydantic_ai.models import Model
+Every model is registered as ``<provider>:<model>``, and also under its bare
+name unless an earlier provider already serves a model with that name.
+"""
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from typing import Any
+
+from pydantic_ai import RunContext
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import ModelMessage, ModelResponseStreamEvent
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
 from pydantic_ai.models.anthropic import AnthropicModel
-from pydantic_ai.models.openai import OpenAIResponsesModel
+from pydantic_ai.models.google import GoogleModel
+from pydantic_ai.models.openai import OpenAIChatModel, OpenAIResponsesModel
+from pydantic_ai.models.wrapper import WrapperModel
 from pydantic_ai.providers import Provider
+from pydantic_ai.settings import ModelSettings
+
+from llm_code.scheduler import RateLimitScheduler, ScheduledModel
+from llm_code.settings import ModelProfile, ProviderConfig, ProviderType
 
 OPENAI_MODELS = [
     "gpt-5.3-codex",
@@ -16,18 +34,132 @@ ANTHROPIC_MODELS = [
     "claude-haiku-4-6",
 ]
 
+GOOGLE_MODELS = [
+    "gemini-3.1-pro-preview",
+    "gemini-3-flash-preview",
+    "gemini-2.5-flash",
+]
+
+MODEL_CLASSES: dict[ProviderType, Callable[..., Model]] = {
+    "openai": OpenAIResponsesModel,
+    "openai-chat": OpenAIChatModel,
+    "anthropic": AnthropicModel,
+    "google": GoogleModel,
+}
+
+DEFAULT_MODELS: dict[ProviderType, list[str]] = {
+    "openai": OPENAI_MODELS,
+    "anthropic": ANTHROPIC_MODELS,
+    "google": GOOGLE_MODELS,
+}
+
+
+class IdleTimeoutModel(WrapperModel):
+    """Model wrapper that fails a stream when no event arrives for too long."""
+
+    def __init__(self, wrapped: Model, idle_timeout: float) -> None:
+        super().__init__(wrapped)
+        self.idle_timeout = idle_timeout
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+        run_context: RunContext[Any] | None = None,
+    ) -> AsyncIterator[StreamedResponse]:
+        """Open a stream whose events must each arrive within the idle timeout.
 
-def build_models(providers: dict[str, Provider]) -> dict[str, Model]:
-    """Build models from providers."""
-    models = {}
-    if "openai" in providers:
-        for model_name in OPENAI_MODELS:
-            models[model_name] = OpenAIResponsesModel(
-                model_name=model_name, provider=providers["openai"]
+        Raises:
+            UnexpectedModelBehavior: If the first or any later event takes
+                longer than ``idle_timeout`` seconds.
+        """
+        async with super().request_stream(
+            messages, model_settings, model_request_parameters, run_context
+        ) as response_stream:
+            events = aiter(response_stream)
+            idle_timeout = self.idle_timeout
+            model_name = self.model_name
+
+            async def guarded_iterator() -> AsyncIterator[ModelResponseStreamEvent]:
+                while True:
+                    try:
+                        async with asyncio.timeout(idle_timeout):
+                            event = await anext(events)
+                    except StopAsyncIteration:
+                        return
+                    except TimeoutError as exc:
+                        raise UnexpectedModelBehavior(
+                            f"{model_name} sent nothing for {idle_timeout:g}s"
+                        ) from exc
+                    yield event
+
+            response_stream._event_iterator = guarded_iterator()
+            yield response_stream
+
+
+def build_models(
+    providers: dict[str, Provider],
+    *,
+    schedulers: dict[str, RateLimitScheduler] | None = None,
+    profiles: dict[str, ModelProfile] | None = None,
+    configs: dict[str, ProviderConfig] | None = None,
+) -> dict[str, Model]:
+    """Build models from providers, queued through their schedulers if given.
+
+    Args:
+        providers: Providers by name, such as ``openai``.
+        schedulers: Rate-limit schedulers by provider name.
+        profiles: Generation and timeout settings by model name, either
+            qualified with the provider or bare.
+        configs: Provider configs by name, giving each provider's API type and
+            models. Providers without one are treated as the built-in provider
+            of the same name with its default models.
+    """
+    schedulers = schedulers or {}
+    profiles = profiles or {}
+    configs = configs or {}
+    models: dict[str, Model] = {}
+    for provider_name, provider in providers.items():
+        config = configs.get(provider_name)
+        if config is None:
+            provider_type = next(
+                (name for name in DEFAULT_MODELS if name == provider_name), None
             )
-    if "anthropic" in providers:
-        for model_name in ANTHROPIC_MODELS:
-            models[model_name] = AnthropicModel(
-                model_name=model_name, provider=providers["anthropic"]
+            if provider_type is None:
+                continue
+            config = ProviderConfig(
+                type=provider_type, models=DEFAULT_MODELS[provider_type]
             )
+
+        for model_name in config.models:
+            key = f"{provider_name}:{model_name}"
+            profile = profiles.get(key) or profiles.get(model_name)
+            model = _build_model(config.type, model_name, provider, profile)
+            scheduler = schedulers.get(provider_name)
+            if scheduler is not None:
+                model = ScheduledModel(model, scheduler)
+            if profile is not None and profile.stream_idle_timeout:
+                model = IdleTimeoutModel(model, profile.stream_idle_timeout)
+            models[key] = model
+            models.setdefault(model_name, model)
     return models
+
+
+def _build_model(
+    provider_type: ProviderType,
+    model_name: str,
+    provider: Provider,
+    profile: ModelProfile | None,
+) -> Model:
+    """Build one model with the API class for its provider type."""
+    model_class = MODEL_CLASSES[provider_type]
+    return model_class(model_name, provider=provider, settings=_model_settings(profile))
+
+
+def _model_settings(profile: ModelProfile | None) -> ModelSettings | None:
+    """Return a profile's model settings, or ``None`` when it sets nothing."""
+    if profile is None:
+        return None
+    return profile.model_settings() or None
@@ -0,0 +1,319 @@
+"""A bounded read cache with speculative prefetch of related files.
+
+After the agent reads a Python module, its next request is often for that
+module's local imports or its tests. When prefetch is enabled, the ``read`` tool
+serves files through a per-workspace ``ReadCache`` and, once a read returns,
+loads the files it predicts will be asked for next in a background thread. The
+cache holds at most a fixed number of bytes and evicts the least recently used
+files first.
+
+Cached contents are checked against the file's size and modification time on
+every read, and paths reported by the workspace watcher are dropped, so a read
+never returns stale contents. Hit rates for demand reads and for prefetched
+files are kept so the prediction heuristic can be tuned.
+"""
+
+import ast
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from llm_code.watcher import SKIPPED_DIRS, DirtyPaths, workspace_watcher
+
+MAX_PREDICTIONS = 20
+SOURCE_DIRS = ("", "src")
+TEST_DIRS = ("tests", "test")
+
+
+@dataclass
+class _Entry:
+    content: str
+    size: int
+    state: tuple[int, int]
+    prefetched: bool
+
+
+@dataclass
+class PrefetchStats:
+    """Counters for demand reads and speculative loads."""
+
+    reads: int = 0
+    hits: int = 0
+    prefetched: int = 0
+    prefetch_hits: int = 0
+    wasted: int = 0
+
+    def summary_lines(self) -> list[str]:
+        """Format the read hit rate and how many prefetched files were used."""
+        if not self.reads and not self.prefetched:
+            return []
+        hit_rate = self.hits / self.reads if self.reads else 0.0
+        used = self.prefetch_hits / self.prefetched if self.prefetched else 0.0
+        return [
+            f"read cache: {self.reads} reads, {hit_rate:.0%} hits; "
+            f"prefetched {self.prefetched} files, {self.prefetch_hits} used "
+            f"({used:.0%}), {self.wasted} dropped unused"
+        ]
+
+
+class ReadCache:
+    """File contents under one root, bounded by a memory budget in bytes."""
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        budget: int,
+        changes: DirtyPaths | None = None,
+    ) -> None:
+        self.root = root
+        self.budget = budget
+        self.stats = PrefetchStats()
+        self._changes = changes
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._used = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="prefetch"
+        )
+
+    def read(self, relative: str) -> str:
+        """Return a file's UTF-8 contents, from the cache when still current.
+
+        Raises:
+            OSError: If the file cannot be read.
+            UnicodeDecodeError: If the file is not UTF-8 text.
+        """
+        self._drop_changed()
+        path = self.root / relative
+        stat = path.stat()
+        state = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            self.stats.reads += 1
+            entry = self._entries.get(relative)
+            if entry is not None and entry.state == state:
+                self._entries.move_to_end(relative)
+                self.stats.hits += 1
+                if entry.prefetched:
+                    self.stats.prefetch_hits += 1
+                    entry.prefetched = False
+                return entry.content
+
+        content = path.read_text(encoding="utf-8")
+        self._store(relative, content, state, prefetched=False)
+        return content
+
+    def prefetch(self, files: list[str]) -> Future[int]:
+        """Load files related to ``files`` in the background.
+
+        Returns:
+            A future for the number of files loaded.
+        """
+        return self._executor.submit(self._prefetch_related, files)
+
+    def clear(self) -> None:
+        """Drop every cached file, such as when memory runs short."""
+        with self._lock:
+            for relative in list(self._entries):
+                self._evict(relative)
+
+    def close(self) -> None:
+        """Stop prefetching and drop every cached file."""
+        self._executor.shutdown(cancel_futures=True)
+        self.clear()
+
+    def _prefetch_related(self, files: list[str]) -> int:
+        loaded = 0
+        for relative in files:
+            with self._lock:
+                entry = self._entries.get(relative)
+            if entry is None:
+                continue
+            for candidate in related_paths(self.root, relative, entry.content):
+                if self._load(candidate):
+                    loaded += 1
+        return loaded
+
+    def _load(self, relative: str) -> bool:
+        """Add a file to the cache as prefetched unless it is already cached."""
+        with self._lock:
+            if relative in self._entries:
+                return False
+        path = self.root / relative
+        try:
+            stat = path.stat()
+            if stat.st_size > self.budget // 4:
+                return False
+            content = path.read_text(encoding="utf-8")
+        except OSError, UnicodeDecodeError:
+            return False
+        self._store(
+            relative, content, (stat.st_mtime_ns, stat.st_size), prefetched=True
+        )
+        return True
+
+    def _store(
+        self, relative: str, content: str, state: tuple[int, int], *, prefetched: bool
+    ) -> None:
+        size = state[1]
+        if size > self.budget:
+            return
+        with self._lock:
+            self._evict(relative)
+            while self._entries and self._used + size > self.budget:
+                self._evict(next(iter(self._entries)))
+            self._entries[relative] = _Entry(content, size, state, prefetched)
+            self._used += size
+            if prefetched:
+                self.stats.prefetched += 1
+
+    def _evict(self, relative: str) -> None:
+        """Remove one entry; the caller holds the lock."""
+        entry = self._entries.pop(relative, None)
+        if entry is None:
+            return
+        self._used -= entry.size
+        if entry.prefetched:
+            self.stats.wasted += 1
+
+    def _drop_changed(self) -> None:
+        if self._changes is None:
+            return
+        dirty = self._changes.drain()
+        with self._lock:
+            if dirty is None:
+                for relative in list(self._entries):
+                    self._evict(relative)
+                return
+            for relative in dirty:
+                self._evict(relative)
+                prefix = f"{relative}/"
+                for known in [
+                    path for path in self._entries if path.startswith(prefix)
+                ]:
+                    self._evict(known)
+
+
+def related_paths(root: Path, relative: str, source: str) -> list[str]:
+    """Predict the files likely to be read after a Python module.
+
+    Args:
+        root: The workspace root.
+        relative: The module's path relative to ``root``.
+        source: The module's source.
+
+    Returns:
+        Existing relative paths of local imports, then conventional test files,
+        at most ``MAX_PREDICTIONS``.
+    """
+    path = Path(relative)
+    if path.suffix != ".py":
+        return []
+
+    candidates = [*_import_candidates(path, source), *_test_candidates(path)]
+    found: list[str] = []
+    for candidate in candidates:
+        name = candidate.as_posix()
+        if (
+            name == relative
+            or name in found
+            or any(part in SKIPPED_DIRS for part in candidate.parts)
+        ):
+            continue
+        if (root / candidate).is_file():
+            found.append(name)
+            if len(found) == MAX_PREDICTIONS:
+                break
+    return found
+
+
+def _import_candidates(path: Path, source: str) -> list[Path]:
+    """Return possible files for each module imported by ``source``."""
+    try:
+        tree = ast.parse(source)
+    except SyntaxError, ValueError:
+        return []
+
+    candidates: list[Path] = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                candidates.extend(_module_files(alias.name.split(".")))
+        elif isinstance(node, ast.ImportFrom):
+            parts = node.module.split(".") if node.module else []
+            if node.level:
+                package = path.parent
+                for _ in range(node.level - 1):
+                    package = package.parent
+                bases = [package.joinpath(*parts)]
+            else:
+                bases = [Path(source_dir, *parts) for source_dir in SOURCE_DIRS]
+            for base in bases:
+                candidates.extend([base.with_suffix(".py"), base / "__init__.py"])
+                candidates.extend(
+                    (base / alias.name).with_suffix(".py") for alias in node.names
+                )
+    return candidates
+
+
+def _module_files(parts: list[str]) -> list[Path]:
+    """Return the module and package paths an absolute import could name."""
+    candidates = []
+    for source_dir in SOURCE_DIRS:
+        base = Path(source_dir, *parts)
+        candidates.extend([base.with_suffix(".py"), base / "__init__.py"])
+    return candidates
+
+
+def _test_candidates(path: Path) -> list[Path]:
+    """Return conventional test paths for a module that is not a test itself."""
+    stem = path.stem
+    if stem.startswith("test_") or stem.endswith("_test") or stem == "__init__":
+        return []
+
+    filename = f"test_{stem}.py"
+    package = path.parent.parts
+    if package[:1] == ("src",):
+        package = package[1:]
+    candidates = [path.with_name(filename), path.with_name(f"{stem}_test.py")]
+    for test_dir in TEST_DIRS:
+        candidates.append(Path(test_dir, filename))
+        candidates.append(Path(test_dir, *package[1:], filename))
+        candidates.append(Path(test_dir, *package, filename))
+    return candidates
+
+
+_caches: dict[Path, ReadCache] = {}
+_caches_lock = threading.Lock()
+
+
+def read_cache(root: Path, *, budget: int) -> ReadCache:
+    """Return the shared read cache for a workspace root.
+
+    Args:
+        root: The workspace root.
+        budget: Memory budget in bytes, used when the cache is first created.
+    """
+    with _caches_lock:
+        cache = _caches.get(root)
+        if cache is None:
+            cache = _caches[root] = ReadCache(
+                root, budget=budget, changes=workspace_watcher(root).subscribe()
+            )
+        return cache
+
+
+def release_read_cache(root: Path) -> None:
+    """Close and forget the shared read cache for a workspace root, if any."""
+    with _caches_lock:
+        cache = _caches.pop(root, None)
+    if cache is not None:
+        cache.close()
+
+
+def read_caches() -> list[ReadCache]:
+    """Return every shared read cache created so far."""
+    with _caches_lock:
+        return list(_caches.values())
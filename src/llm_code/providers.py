@@ -1,18 +1,111 @@
-"""Registry of LLM providers."""
+"""Registry of LLM providers.
 
+The built-in ``openai``, ``anthropic``, and ``google`` providers are enabled by
+their API keys. The ``providers`` setting adds named providers, such as a local
+OpenAI-compatible server, or changes the base URL, key, or model list of a
+built-in one.
+"""
+
+import httpx
+from anthropic import AsyncAnthropic
+from openai import AsyncOpenAI
 from pydantic_ai.providers import Provider
 from pydantic_ai.providers.anthropic import AnthropicProvider
+from pydantic_ai.providers.google import GoogleProvider
 from pydantic_ai.providers.openai import OpenAIProvider
 
-from llm_code.settings import Settings
+from llm_code.models import DEFAULT_MODELS
+from llm_code.scheduler import RateLimitScheduler
+from llm_code.settings import ProviderConfig, Settings
+
+LOCAL_API_KEY = "not-needed"
+
+
+def provider_configs(settings: Settings) -> dict[str, ProviderConfig]:
+    """Return the enabled providers by name.
+
+    Built-in providers are enabled when they have an API key. Named providers
+    are enabled when they have an API key or a base URL; fields they set
+    override those of a built-in provider with the same name.
+    """
+    configs = {
+        "openai": ProviderConfig(type="openai", api_key=settings.openai_api_key),
+        "anthropic": ProviderConfig(
+            type="anthropic", api_key=settings.anthropic_api_key
+        ),
+        "google": ProviderConfig(type="google", api_key=settings.google_api_key),
+    }
+    for name, config in settings.providers.items():
+        base = configs.get(name)
+        if base is None:
+            configs[name] = config
+        else:
+            configs[name] = base.model_copy(
+                update=config.model_dump(exclude_unset=True)
+            )
+
+    enabled = {}
+    for name, config in configs.items():
+        if not config.api_key and not config.base_url:
+            continue
+        if not config.models:
+            config = config.model_copy(
+                update={"models": list(DEFAULT_MODELS.get(config.type, []))}
+            )
+        enabled[name] = config
+    return enabled
+
+
+def build_providers(
+    settings: Settings,
+    *,
+    schedulers: dict[str, RateLimitScheduler] | None = None,
+) -> dict[str, Provider]:
+    """Build providers from settings.
+
+    When a scheduler is given for a provider, its client reports rate-limit
+    headers to the scheduler and leaves retries to it instead of the SDK.
+    """
+    schedulers = schedulers or {}
+    return {
+        name: _build_provider(config, schedulers.get(name))
+        for name, config in provider_configs(settings).items()
+    }
+
+
+def _build_provider(
+    config: ProviderConfig, scheduler: RateLimitScheduler | None
+) -> Provider:
+    """Build one provider, routing its HTTP traffic through a scheduler if given."""
+    http_client: httpx.AsyncClient | None = None
+    if scheduler is not None:
+        http_client = scheduler.http_client()
 
+    if config.type == "anthropic":
+        if http_client is None:
+            return AnthropicProvider(api_key=config.api_key, base_url=config.base_url)
+        return AnthropicProvider(
+            anthropic_client=AsyncAnthropic(
+                api_key=config.api_key,
+                base_url=config.base_url,
+                http_client=http_client,
+                max_retries=0,
+            )
+        )
 
-def build_providers(settings: Settings) -> dict[str, Provider]:
-    """Build providers from settings."""
-    providers = {}
-    if settings.openai_api_key:
-        providers["openai"] = OpenAIProvider(api_key=settings.openai_api_key)
+    if config.type == "google":
+        return GoogleProvider(
+            api_key=config.api_key, base_url=config.base_url, http_client=http_client
+        )
 
-    if settings.anthropic_api_key:
-        providers["anthropic"] = AnthropicProvider(api_key=settings.anthropic_api_key)
-    return providers
+    api_key = config.api_key or LOCAL_API_KEY
+    if http_client is None:
+        return OpenAIProvider(api_key=api_key, base_url=config.base_url)
+    return OpenAIProvider(
+        openai_client=AsyncOpenAI(
+            api_key=api_key,
+            base_url=config.base_url,
+            http_client=http_client,
+            max_retries=0,
+        )
+    )
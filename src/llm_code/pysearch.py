@@ -0,0 +1,193 @@
+"""Parallel regex search in pure Python, used when ``rg`` is not installed.
+
+Files come from the caller, usually the workspace walker that prunes vendored
+and hidden directories. Small searches run in-process; larger ones are split
+into chunks across a shared process pool. Each worker compiles a pattern set
+once and reuses it for every chunk. Large files are memory-mapped, small ones
+read in one call, and each is scanned as a single bytes buffer, so matching
+runs over the whole file in C instead of line by line. Results come back as
+structured matches rather than text to parse.
+
+Patterns use Python's ``re`` syntax with ``^`` and ``$`` anchored at line
+boundaries, like grep. Binary files, detected by a NUL byte near the start,
+are skipped.
+"""
+
+import functools
+import mmap
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+PARALLEL_MIN_FILES = 256
+CHUNKS_PER_WORKER = 4
+BINARY_SNIFF_BYTES = 8192
+MMAP_MIN_BYTES = 256 * 1024
+
+type _Compiled = tuple[str, re.Pattern[bytes], bytes | None]
+
+
+@dataclass(frozen=True)
+class Match:
+    """One matching line."""
+
+    path: str
+    line_number: int
+    patterns: tuple[str, ...]
+
+
+def search_files(
+    patterns: list[str],
+    files: list[str],
+    root: Path,
+    *,
+    workers: int | None = None,
+) -> list[Match]:
+    """Search files for lines matching any of the patterns.
+
+    Args:
+        patterns: Regular expressions in Python ``re`` syntax.
+        files: File paths relative to ``root``.
+        root: Directory the paths are relative to.
+        workers: Number of worker processes; defaults to the usable CPUs.
+
+    Returns:
+        Matches in file order, then line order, each with the patterns its
+        line matched.
+
+    Raises:
+        ValueError: If a pattern is not a valid regular expression.
+    """
+    for pattern in patterns:
+        try:
+            re.compile(pattern)
+        except re.error as exc:
+            raise ValueError(f"Invalid pattern {pattern!r}: {exc}") from exc
+
+    workers = workers or os.process_cpu_count() or 1
+    key = tuple(patterns)
+    if workers == 1 or len(files) < PARALLEL_MIN_FILES:
+        return _search_chunk(str(root), key, files)
+
+    size = max(1, -(-len(files) // (workers * CHUNKS_PER_WORKER)))
+    chunks = [files[start : start + size] for start in range(0, len(files), size)]
+    search = functools.partial(_search_chunk, str(root), key)
+    return [
+        match for matches in _pool(workers).map(search, chunks) for match in matches
+    ]
+
+
+def _search_chunk(
+    root: str, patterns: tuple[str, ...], files: list[str]
+) -> list[Match]:
+    """Search one chunk of files; runs in a worker process for large searches."""
+    compiled = _compile(patterns)
+    matches: list[Match] = []
+    for relative in files:
+        matches.extend(_search_file(os.path.join(root, relative), relative, compiled))
+    return matches
+
+
+@functools.cache
+def _compile(patterns: tuple[str, ...]) -> tuple[_Compiled, ...]:
+    """Compile a pattern set once per process.
+
+    Patterns without regex syntax are also kept as bytes so they can be found
+    with ``mmap.find``, which is much faster than the regex engine.
+    """
+    compiled = []
+    for pattern in patterns:
+        encoded = pattern.encode("utf-8")
+        literal = encoded if encoded and re.escape(pattern) == pattern else None
+        compiled.append((pattern, re.compile(encoded, re.MULTILINE), literal))
+    return tuple(compiled)
+
+
+def _search_file(
+    path: str,
+    relative: str,
+    compiled: tuple[_Compiled, ...],
+) -> list[Match]:
+    """Return the matching lines of one file, memory-mapped if it is large."""
+    try:
+        with open(path, "rb") as handle:
+            size = os.fstat(handle.fileno()).st_size
+            if size == 0:
+                return []
+            if size < MMAP_MIN_BYTES:
+                return _search_buffer(handle.read(), relative, compiled)
+            with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                return _search_buffer(data, relative, compiled)
+    except OSError, ValueError:
+        return []
+
+
+def _search_buffer(
+    data: bytes | mmap.mmap, relative: str, compiled: tuple[_Compiled, ...]
+) -> list[Match]:
+    if data.find(b"\0", 0, BINARY_SNIFF_BYTES) != -1:
+        return []
+    return _number_lines(data, relative, _matching_lines(data, compiled))
+
+
+def _matching_lines(
+    data: bytes | mmap.mmap,
+    compiled: tuple[_Compiled, ...],
+) -> dict[int, list[str]]:
+    """Map the start offset of each matching line to the patterns it matched."""
+    size = len(data)
+    lines: dict[int, list[str]] = {}
+    for pattern, regex, literal in compiled:
+        position = 0
+        while position < size:
+            if literal is not None:
+                offset = data.find(literal, position)
+                if offset == -1:
+                    break
+            elif found := regex.search(data, position):
+                offset = found.start()
+            else:
+                break
+            start = data.rfind(b"\n", 0, offset) + 1
+            if start >= size:
+                break
+            lines.setdefault(start, []).append(pattern)
+            end = data.find(b"\n", offset)
+            position = size if end == -1 else end + 1
+    return lines
+
+
+def _number_lines(
+    data: bytes | mmap.mmap, relative: str, lines: dict[int, list[str]]
+) -> list[Match]:
+    """Convert line start offsets into one-based line numbers."""
+    matches = []
+    line_number = 1
+    previous = 0
+    for start in sorted(lines):
+        line_number += data[previous:start].count(b"\n")
+        previous = start
+        matches.append(Match(relative, line_number, tuple(lines[start])))
+    return matches
+
+
+_pools: dict[int, ProcessPoolExecutor] = {}
+_pools_lock = threading.Lock()
+
+
+def _pool(workers: int) -> ProcessPoolExecutor:
+    """Return the shared process pool with ``workers`` processes."""
+    with _pools_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            methods = multiprocessing.get_all_start_methods()
+            method = "forkserver" if "forkserver" in methods else "spawn"
+            pool = _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context(method),
+            )
+        return pool
@@ -0,0 +1,268 @@
+"""Exact-match cache of agent runs for repeated prompts on an unchanged tree.
+
+A run is looked up by model, generation settings, instructions, and prompt,
+then accepted only if every file the cached run read or wrote still has the
+contents it had when that run started. A hit replays the run's file writes and
+prints its final text without calling the model.
+
+Runs that used ``bash`` are never cached because their effects cannot be
+replayed. Neither are runs that scanned the workspace with ``search``,
+``retrieve``, ``outline``, ``find_symbol``, or a glob ``read``, or paged a
+spilled result with ``fetch``: their results depend on files the run did not
+record, such as a new file that would now match. Entries expire after a TTL,
+and the least recently used entries are evicted once the cache grows past its
+size limit.
+"""
+
+import hashlib
+import json
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import UTC, datetime, timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import (
+    DateTime,
+    Engine,
+    Integer,
+    String,
+    Text,
+    create_engine,
+    delete,
+    event,
+    func,
+    select,
+)
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from llm_code.checkpoint import current_checkpoint, replace_files
+from llm_code.settings import cache_dir
+
+
+class Base(DeclarativeBase):
+    """Declarative base for response cache tables."""
+
+
+class CachedResponse(Base):
+    """The effects and final text of one run in one workspace state."""
+
+    __tablename__ = "responses"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    state: Mapped[str] = mapped_column(String(64), primary_key=True)
+    files: Mapped[str] = mapped_column(Text)
+    effects: Mapped[str] = mapped_column(Text)
+    output: Mapped[str] = mapped_column(Text)
+    size: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    last_used: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+
+
+@dataclass
+class TouchLog:
+    """Files one run read or wrote, with their contents before the run."""
+
+    files: dict[str, str | None] = field(default_factory=dict)
+    effects: dict[str, str] = field(default_factory=dict)
+    replayable: bool = True
+
+    def read(self, path: str, content: str) -> None:
+        """Record a file read; only the first touch of a path sets its state."""
+        self.files.setdefault(path, text_hash(content))
+
+    def write(self, path: str, previous: str | None, content: str) -> None:
+        """Record a file write with the file's contents before it."""
+        self.files.setdefault(path, None if previous is None else text_hash(previous))
+        self.effects[path] = content
+
+
+@dataclass(frozen=True)
+class CacheHit:
+    """A cached run whose files still match the workspace."""
+
+    output: str
+    effects: dict[str, str]
+
+    def replay(self, root: Path) -> None:
+        """Write the cached run's files under ``root``."""
+        if (checkpoint := current_checkpoint()) is not None:
+            for path in self.effects:
+                checkpoint.save(path)
+        replace_files({root / path: content for path, content in self.effects.items()})
+
+
+_touches: ContextVar[TouchLog | None] = ContextVar("touches", default=None)
+
+
+@contextmanager
+def track_touches() -> Iterator[TouchLog]:
+    """Record the files tools read and write in the current task."""
+    log = TouchLog()
+    token = _touches.set(log)
+    try:
+        yield log
+    finally:
+        _touches.reset(token)
+
+
+def current_touches() -> TouchLog | None:
+    """Return the touch log of the current task, if one is being recorded."""
+    return _touches.get()
+
+
+class ResponseCache:
+    """SQLite store of replayable runs with TTL and size-based eviction."""
+
+    def __init__(
+        self,
+        path: Path,
+        *,
+        ttl: timedelta = timedelta(days=7),
+        max_bytes: int = 100 * 1024 * 1024,
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._engine = _create_engine(path)
+        Base.metadata.create_all(self._engine)
+
+    @classmethod
+    def default_path(cls) -> Path:
+        """Return the cache path under XDG cache home or ~/.cache."""
+        return cache_dir() / "responses.sqlite"
+
+    @staticmethod
+    def key(
+        *,
+        model: str,
+        instructions: str,
+        prompt: str,
+        settings: dict[str, Any] | None = None,
+    ) -> str:
+        """Return the lookup key for a model, its instructions, and a prompt.
+
+        Args:
+            model: The model name.
+            instructions: The agent's instructions.
+            prompt: The user prompt.
+            settings: Settings that change the model's output, such as
+                reasoning effort, ``max_tokens``, and ``temperature``.
+        """
+        payload = json.dumps(
+            [model, settings or {}, instructions, prompt],
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def lookup(self, key: str, root: Path) -> CacheHit | None:
+        """Return the newest unexpired run for ``key`` whose files still match.
+
+        Args:
+            key: A key from ``ResponseCache.key``.
+            root: The workspace root the cached paths are relative to.
+        """
+        now = datetime.now(UTC)
+        statement = (
+            select(CachedResponse)
+            .where(CachedResponse.key == key)
+            .where(CachedResponse.created_at >= now - self.ttl)
+            .order_by(CachedResponse.last_used.desc())
+        )
+        with Session(self._engine) as session, session.begin():
+            for entry in session.scalars(statement):
+                files: dict[str, str | None] = json.loads(entry.files)
+                if all(
+                    _current_hash(root / path) == expected
+                    for path, expected in files.items()
+                ):
+                    entry.last_used = now
+                    entry.hits += 1
+                    return CacheHit(entry.output, json.loads(entry.effects))
+        return None
+
+    def store(self, key: str, touches: TouchLog, output: str) -> bool:
+        """Save a finished run unless it had effects that cannot be replayed.
+
+        Returns:
+            Whether the run was cached.
+        """
+        if not touches.replayable:
+            return False
+
+        files = json.dumps(touches.files, sort_keys=True)
+        effects = json.dumps(touches.effects, ensure_ascii=False)
+        now = datetime.now(UTC)
+        entry = CachedResponse(
+            key=key,
+            state=hashlib.sha256(files.encode("utf-8")).hexdigest(),
+            files=files,
+            effects=effects,
+            output=output,
+            size=len(files) + len(effects) + len(output),
+            created_at=now,
+            last_used=now,
+            hits=0,
+        )
+        with Session(self._engine) as session, session.begin():
+            session.merge(entry)
+            session.execute(
+                delete(CachedResponse).where(CachedResponse.created_at < now - self.ttl)
+            )
+            self._evict_to_size(session)
+        return True
+
+    def _evict_to_size(self, session: Session) -> None:
+        """Delete least recently used entries until the cache fits its limit."""
+        total = session.scalar(select(func.coalesce(func.sum(CachedResponse.size), 0)))
+        if total <= self.max_bytes:
+            return
+        rows = session.execute(
+            select(
+                CachedResponse.key, CachedResponse.state, CachedResponse.size
+            ).order_by(CachedResponse.last_used)
+        )
+        for key, state, size in rows.all():
+            if total <= self.max_bytes:
+                break
+            session.execute(
+                delete(CachedResponse)
+                .where(CachedResponse.key == key)
+                .where(CachedResponse.state == state)
+            )
+            total -= size
+
+
+def text_hash(content: str) -> str:
+    """Return the hash used to compare file contents."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _current_hash(path: Path) -> str | None:
+    """Hash a file as the read tool sees it, or ``None`` if it is missing."""
+    try:
+        return text_hash(path.read_text(encoding="utf-8"))
+    except FileNotFoundError:
+        return None
+    except OSError, UnicodeDecodeError:
+        return ""
+
+
+def _create_engine(path: Path) -> Engine:
+    """Create a SQLite engine for the cache."""
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection: Any, _record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
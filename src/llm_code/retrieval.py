@@ -0,0 +1,385 @@
+"""Local lexical retrieval over workspace code.
+
+Files are split into chunks: top-level classes and functions where the symbol
+index can find them, and fixed line windows everywhere else. Chunks are stored
+in a SQLite FTS5 table and ranked with BM25. Identifiers are indexed whole and
+split into their snake_case and camelCase parts, so ``build agent`` finds
+``build_agent`` and ``buildAgent``. Only files whose size or modification time
+changed are re-chunked when the index is refreshed, and with a workspace
+watcher only the paths it reported as changed are checked.
+"""
+
+import hashlib
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import Connection, Engine, create_engine, event, text
+
+from llm_code.settings import data_dir
+from llm_code.symbols import MAX_INDEXED_BYTES, _is_source, _parse_file
+from llm_code.watcher import DirtyPaths, expand_changes, walk_files, workspace_watcher
+
+TEXT_SUFFIXES = frozenset(
+    {
+        ".cfg",
+        ".css",
+        ".html",
+        ".ini",
+        ".json",
+        ".md",
+        ".rst",
+        ".sh",
+        ".sql",
+        ".toml",
+        ".txt",
+        ".yaml",
+        ".yml",
+    }
+)
+WINDOW_LINES = 40
+MAX_CHUNK_LINES = 120
+MAX_RESULT_CHARS = 4000
+
+_IDENTIFIER_PATTERN = re.compile(r"[A-Za-z_][A-Za-z0-9_]*")
+_WORD_PATTERN = re.compile(r"[A-Z]+(?=[A-Z][a-z])|[A-Z]?[a-z]+|[A-Z]+|[0-9]+")
+
+_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS chunks (
+        id INTEGER PRIMARY KEY,
+        path TEXT NOT NULL,
+        name TEXT,
+        start_line INTEGER NOT NULL,
+        end_line INTEGER NOT NULL,
+        content TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_chunks_path ON chunks (path)",
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS chunk_terms USING fts5(
+        path, name, terms, tokenize = "unicode61 tokenchars '_'"
+    )
+    """,
+)
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """A contiguous range of lines from one file."""
+
+    path: str
+    name: str | None
+    start_line: int
+    end_line: int
+    content: str
+
+
+class RetrievalIndex:
+    """BM25 index of workspace chunks stored in SQLite."""
+
+    def __init__(
+        self, root: Path, path: Path, *, changes: DirtyPaths | None = None
+    ) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.root = root
+        self.path = path
+        self._changes = changes
+        self._engine = _create_engine(path)
+        self._lock = threading.Lock()
+        with self._engine.begin() as connection:
+            for statement in _SCHEMA:
+                connection.execute(text(statement))
+
+    @classmethod
+    def default_path(cls, root: Path) -> Path:
+        """Return the index path for a workspace root under the data directory."""
+        digest = hashlib.sha256(str(root).encode("utf-8")).hexdigest()[:16]
+        return data_dir() / "retrieval" / f"{digest}.sqlite"
+
+    def close(self) -> None:
+        """Close the index's database connections."""
+        with self._lock:
+            self._engine.dispose()
+
+    def refresh(self) -> int:
+        """Re-chunk new and changed files and drop deleted ones.
+
+        Returns:
+            The number of files that were re-chunked or removed.
+        """
+        with self._lock, self._engine.begin() as connection:
+            indexed = {
+                row.path: (row.mtime_ns, row.size)
+                for row in connection.execute(
+                    text("SELECT path, mtime_ns, size FROM files")
+                )
+            }
+            dirty = self._changes.drain() if self._changes is not None else None
+            if dirty is None:
+                candidates = _indexed_files(self.root)
+            else:
+                candidates = [
+                    self.root / relative
+                    for relative in expand_changes(self.root, dirty, indexed)
+                    if _is_indexed(Path(relative))
+                ]
+
+            current: dict[str, tuple[int, int]] = {}
+            for file in candidates:
+                try:
+                    stat = file.stat()
+                except OSError:
+                    continue
+                current[file.relative_to(self.root).as_posix()] = (
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                )
+
+            changed = [
+                path for path, state in current.items() if indexed.get(path) != state
+            ]
+            checked = (
+                indexed.keys()
+                if dirty is None
+                else {file.relative_to(self.root).as_posix() for file in candidates}
+            )
+            removed = (checked & indexed.keys()) - current.keys()
+            for path in [*changed, *removed]:
+                _delete_file(connection, path)
+            _insert_files(
+                connection, self.root, {path: current[path] for path in changed}
+            )
+            return len(changed) + len(removed)
+
+    def search(self, query: str, *, k: int = 5) -> list[dict[str, Any]]:
+        """Return the ``k`` chunks that best match ``query``, best first.
+
+        Args:
+            query: Free text; identifiers and words are matched as terms.
+            k: Maximum number of chunks to return.
+        """
+        terms = sorted(set(_terms(query)))
+        if not terms:
+            return []
+
+        self.refresh()
+        match = " OR ".join(f'"{term}"' for term in terms)
+        with self._engine.connect() as connection:
+            rows = connection.execute(
+                text(
+                    """
+                    SELECT chunks.path, chunks.name, chunks.start_line,
+                        chunks.end_line, chunks.content,
+                        bm25(chunk_terms, 2.0, 5.0, 1.0) AS score
+                    FROM chunk_terms
+                    JOIN chunks ON chunks.id = chunk_terms.rowid
+                    WHERE chunk_terms MATCH :match
+                    ORDER BY score
+                    LIMIT :k
+                    """
+                ),
+                {"match": match, "k": k},
+            )
+            return [
+                {
+                    "path": row.path,
+                    "name": row.name,
+                    "lines": f"{row.start_line}-{row.end_line}",
+                    "score": round(-row.score, 3),
+                    "content": row.content[:MAX_RESULT_CHARS],
+                }
+                for row in rows
+            ]
+
+
+_indexes: dict[Path, RetrievalIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def retrieval_index(root: Path) -> RetrievalIndex:
+    """Return the shared retrieval index for a workspace root."""
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = RetrievalIndex(
+                root,
+                RetrievalIndex.default_path(root),
+                changes=workspace_watcher(root).subscribe(),
+            )
+        return index
+
+
+def release_retrieval_index(root: Path) -> None:
+    """Close and forget the shared retrieval index for a workspace root, if any."""
+    with _indexes_lock:
+        index = _indexes.pop(root, None)
+    if index is not None:
+        index.close()
+
+
+def chunk_file(path: Path, relative: str, source: str) -> list[Chunk]:
+    """Split a file into symbol chunks and fixed windows for the lines between."""
+    lines = source.splitlines()
+    spans: list[tuple[int, int, str | None]] = []
+    if _is_source(path):
+        spans = [
+            (symbol.start_line, symbol.end_line, symbol.name)
+            for symbol in _parse_file(path, relative)
+            if symbol.parent is None
+        ]
+
+    chunks: list[Chunk] = []
+    next_line = 1
+    for start, end, name in [*spans, (len(lines) + 1, len(lines) + 1, None)]:
+        if start < next_line:
+            continue
+        for window_start in range(next_line, start, WINDOW_LINES):
+            window_end = min(window_start + WINDOW_LINES - 1, start - 1)
+            chunks.append(_chunk(relative, None, window_start, window_end, lines))
+        if start > len(lines):
+            break
+        for part_start in range(start, end + 1, MAX_CHUNK_LINES):
+            part_end = min(part_start + MAX_CHUNK_LINES - 1, end)
+            chunks.append(_chunk(relative, name, part_start, part_end, lines))
+        next_line = end + 1
+
+    return [chunk for chunk in chunks if chunk.content.strip()]
+
+
+def _chunk(
+    relative: str, name: str | None, start: int, end: int, lines: list[str]
+) -> Chunk:
+    return Chunk(
+        path=relative,
+        name=name,
+        start_line=start,
+        end_line=end,
+        content="\n".join(lines[start - 1 : end]),
+    )
+
+
+def _terms(value: str) -> list[str]:
+    """Return lowercase identifiers plus their snake_case and camelCase parts."""
+    terms = []
+    for identifier in _IDENTIFIER_PATTERN.findall(value):
+        lowered = identifier.lower()
+        terms.append(lowered)
+        parts = [
+            word.lower()
+            for piece in identifier.split("_")
+            for word in _WORD_PATTERN.findall(piece)
+        ]
+        if len(parts) > 1 or (parts and parts[0] != lowered):
+            terms.extend(parts)
+    return terms
+
+
+def _indexed_files(root: Path) -> list[Path]:
+    """Return source and text files under ``root``, skipping vendored dirs."""
+    return [path for path in walk_files(root) if _is_indexed(path)]
+
+
+def _is_indexed(path: Path) -> bool:
+    """Return whether retrieval indexes a file by its extension."""
+    return _is_source(path) or path.suffix in TEXT_SUFFIXES
+
+
+def _delete_file(connection: Connection, path: str) -> None:
+    connection.execute(
+        text(
+            "DELETE FROM chunk_terms WHERE rowid IN "
+            "(SELECT id FROM chunks WHERE path = :path)"
+        ),
+        {"path": path},
+    )
+    connection.execute(text("DELETE FROM chunks WHERE path = :path"), {"path": path})
+    connection.execute(text("DELETE FROM files WHERE path = :path"), {"path": path})
+
+
+def _insert_files(
+    connection: Connection, root: Path, states: dict[str, tuple[int, int]]
+) -> None:
+    """Chunk files and add them to the index, skipping unreadable files."""
+    next_id = connection.execute(text("SELECT coalesce(max(id), 0) FROM chunks"))
+    chunk_id = next_id.scalar_one()
+    chunk_rows: list[dict[str, Any]] = []
+    term_rows: list[dict[str, Any]] = []
+    for path, (_mtime_ns, size) in states.items():
+        file = root / path
+        source = ""
+        if size <= MAX_INDEXED_BYTES:
+            try:
+                source = file.read_text(encoding="utf-8")
+            except OSError, UnicodeDecodeError:
+                source = ""
+        for chunk in chunk_file(file, path, source):
+            chunk_id += 1
+            chunk_rows.append(
+                {
+                    "id": chunk_id,
+                    "path": chunk.path,
+                    "name": chunk.name,
+                    "start_line": chunk.start_line,
+                    "end_line": chunk.end_line,
+                    "content": chunk.content,
+                }
+            )
+            term_rows.append(
+                {
+                    "id": chunk_id,
+                    "path": " ".join(_terms(chunk.path)),
+                    "name": " ".join(_terms(chunk.name or "")),
+                    "terms": " ".join(_terms(chunk.content)),
+                }
+            )
+
+    if chunk_rows:
+        connection.execute(
+            text(
+                "INSERT INTO chunks (id, path, name, start_line, end_line, content) "
+                "VALUES (:id, :path, :name, :start_line, :end_line, :content)"
+            ),
+            chunk_rows,
+        )
+        connection.execute(
+            text(
+                "INSERT INTO chunk_terms (rowid, path, name, terms) "
+                "VALUES (:id, :path, :name, :terms)"
+            ),
+            term_rows,
+        )
+    if states:
+        connection.execute(
+            text(
+                "INSERT INTO files (path, mtime_ns, size) "
+                "VALUES (:path, :mtime_ns, :size)"
+            ),
+            [
+                {"path": path, "mtime_ns": mtime_ns, "size": size}
+                for path, (mtime_ns, size) in states.items()
+            ],
+        )
+
+
+def _create_engine(path: Path) -> Engine:
+    """Create a SQLite engine for the index."""
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection: Any, _record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
@@ -0,0 +1,226 @@
+"""Route simple prompts to a fast model and multi-step work to the heavy one.
+
+``RoutedModel`` classifies every model request with local heuristics before
+sending it: short questions go to a fast model at low reasoning effort, while
+long prompts, edit requests, and runs that have started writing files or
+running commands go to the configured heavy model. Each decision is recorded
+with its reason and how long the request took.
+"""
+
+import re
+import statistics
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, Literal
+
+from pydantic_ai import RunContext
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    UserPromptPart,
+)
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings, ThinkingEffort
+
+type Route = Literal["fast", "heavy"]
+
+MAX_FAST_PROMPT_CHARS = 400
+MAX_FAST_TOOL_CALLS = 8
+MUTATING_TOOLS = frozenset({"write", "write_many", "bash"})
+
+_EDIT_PATTERN = re.compile(
+    r"\b(implement|refactor|rewrite|migrate|fix|add|write|create|rename|update|"
+    r"change|edit|delete|remove|replace|convert|port|generate)\b",
+    re.IGNORECASE,
+)
+_STEP_PATTERN = re.compile(r"^\s*(?:[-*]|\d+[.)])\s", re.MULTILINE)
+
+
+@dataclass(frozen=True)
+class RouteDecision:
+    """One routed model request."""
+
+    route: Route
+    model_name: str
+    reason: str
+    elapsed: float
+
+
+@dataclass
+class RouteLog:
+    """Recent routing decisions and their request times."""
+
+    decisions: deque[RouteDecision] = field(default_factory=lambda: deque(maxlen=1000))
+
+    def record(self, decision: RouteDecision) -> None:
+        """Add one routing decision."""
+        self.decisions.append(decision)
+
+    def summary_lines(self) -> list[str]:
+        """Format one line per route with request counts and median time."""
+        lines = []
+        for route in ("fast", "heavy"):
+            decisions = [d for d in self.decisions if d.route == route]
+            if not decisions:
+                continue
+            median = statistics.median(d.elapsed for d in decisions)
+            lines.append(
+                f"{route} route ({decisions[-1].model_name}): "
+                f"{len(decisions)} requests, p50 {median:.2f}s, "
+                f"last reason: {decisions[-1].reason}"
+            )
+        return lines
+
+
+def classify(messages: list[ModelMessage]) -> tuple[Route, str]:
+    """Choose a route for the next request from the latest prompt and tool calls.
+
+    Args:
+        messages: The message history about to be sent to the model.
+
+    Returns:
+        The route and a short reason for choosing it.
+    """
+    prompt = ""
+    tool_calls: list[ToolCallPart] = []
+    for message in reversed(messages):
+        if isinstance(message, ModelResponse):
+            tool_calls.extend(
+                part for part in message.parts if isinstance(part, ToolCallPart)
+            )
+        elif isinstance(message, ModelRequest):
+            prompts = [
+                part.content
+                for part in message.parts
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str)
+            ]
+            if prompts:
+                prompt = "\n".join(prompts)
+                break
+
+    if mutating := sorted({c.tool_name for c in tool_calls} & MUTATING_TOOLS):
+        return "heavy", f"run used {', '.join(mutating)}"
+    if len(tool_calls) >= MAX_FAST_TOOL_CALLS:
+        return "heavy", f"{len(tool_calls)} tool calls this run"
+    if len(prompt) > MAX_FAST_PROMPT_CHARS:
+        return "heavy", f"prompt is {len(prompt)} characters"
+    if _STEP_PATTERN.search(prompt):
+        return "heavy", "prompt lists multiple steps"
+    if match := _EDIT_PATTERN.search(prompt):
+        return "heavy", f"prompt asks to {match.group(0).lower()}"
+    return "fast", "short prompt without edits"
+
+
+class RoutedModel(WrapperModel):
+    """Model that sends each request to a fast or heavy model by heuristics."""
+
+    def __init__(
+        self,
+        fast: Model,
+        heavy: Model,
+        *,
+        fast_effort: ThinkingEffort | None = "low",
+        heavy_effort: ThinkingEffort | None = None,
+        route: Route | None = None,
+        routes: RouteLog | None = None,
+    ) -> None:
+        """Create a router in front of two models.
+
+        Args:
+            fast: Model for simple prompts.
+            heavy: Model for multi-step edits; also the wrapped default.
+            fast_effort: Reasoning effort for fast requests.
+            heavy_effort: Reasoning effort for heavy requests.
+            route: Send every request down this route instead of classifying.
+            routes: Log that decisions are recorded in.
+        """
+        super().__init__(heavy)
+        self.fast = fast
+        self.efforts: dict[Route, ThinkingEffort | None] = {
+            "fast": fast_effort,
+            "heavy": heavy_effort,
+        }
+        self.route = route
+        self.routes = routes or RouteLog()
+
+    def customize_request_parameters(
+        self, model_request_parameters: ModelRequestParameters
+    ) -> ModelRequestParameters:
+        """Leave parameters for the routed model to customize."""
+        return model_request_parameters
+
+    def prepare_request(
+        self,
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> tuple[ModelSettings | None, ModelRequestParameters]:
+        """Leave settings for the routed model to prepare."""
+        return model_settings, model_request_parameters
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        """Send the request to the model chosen for it."""
+        route, reason, model, model_settings = self._choose(messages, model_settings)
+        started = time.perf_counter()
+        try:
+            return await model.request(
+                messages, model_settings, model_request_parameters
+            )
+        finally:
+            self._record(route, reason, model, started)
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+        run_context: RunContext[Any] | None = None,
+    ) -> AsyncIterator[StreamedResponse]:
+        """Stream from the model chosen for the request."""
+        route, reason, model, model_settings = self._choose(messages, model_settings)
+        started = time.perf_counter()
+        try:
+            async with model.request_stream(
+                messages, model_settings, model_request_parameters, run_context
+            ) as response_stream:
+                yield response_stream
+        finally:
+            self._record(route, reason, model, started)
+
+    def _choose(
+        self, messages: list[ModelMessage], model_settings: ModelSettings | None
+    ) -> tuple[Route, str, Model, ModelSettings | None]:
+        """Pick the route, model, and settings for one request."""
+        if self.route is not None:
+            route, reason = self.route, "route override"
+        else:
+            route, reason = classify(messages)
+
+        model = self.fast if route == "fast" else self.wrapped
+        effort = self.efforts[route]
+        if effort is not None:
+            model_settings = ModelSettings(
+                **{**(model_settings or {}), "thinking": effort}
+            )
+        return route, reason, model, model_settings
+
+    def _record(self, route: Route, reason: str, model: Model, started: float) -> None:
+        self.routes.record(
+            RouteDecision(
+                route=route,
+                model_name=model.model_name,
+                reason=reason,
+                elapsed=time.perf_counter() - started,
+            )
+        )
@@ -0,0 +1,334 @@
+"""Rate-limit-aware request scheduling for provider models.
+
+Each provider gets a ``RateLimitScheduler`` that watches the rate-limit headers
+on every HTTP response through an ``httpx`` event hook. Model requests queue on
+the scheduler instead of failing: they wait for a concurrency slot, for the
+request and token budgets to reset when they are exhausted, and for any
+``retry-after`` window. Overload and rate-limit errors, and failures to reach
+the provider at all such as connection resets and timeouts, are retried with
+jittered exponential backoff, and queue wait times are kept as metrics.
+"""
+
+import asyncio
+import random
+import re
+import statistics
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+from typing import Any
+
+import httpx
+from pydantic_ai import RunContext
+from pydantic_ai.exceptions import ModelAPIError, ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.models import Model, ModelRequestParameters, StreamedResponse
+from pydantic_ai.models.wrapper import WrapperModel
+from pydantic_ai.settings import ModelSettings
+
+from llm_code.settings import Settings
+
+RETRYABLE_STATUS_CODES = frozenset({408, 409, 429, 500, 502, 503, 504, 529})
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+@dataclass
+class SchedulerMetrics:
+    """Queue wait times and retry counts for one scheduler."""
+
+    waits: deque[float] = field(default_factory=lambda: deque(maxlen=10_000))
+    requests: int = 0
+    retries: int = 0
+    rate_limited: int = 0
+
+    def summary(self) -> dict[str, float | int]:
+        """Return request counts and queue wait percentiles in seconds."""
+        waits = sorted(self.waits)
+        summary: dict[str, float | int] = {
+            "requests": self.requests,
+            "retries": self.retries,
+            "rate_limited": self.rate_limited,
+            "wait_p50": 0.0,
+            "wait_p95": 0.0,
+            "wait_max": 0.0,
+        }
+        if waits:
+            summary["wait_p50"] = statistics.median(waits)
+            summary["wait_p95"] = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+            summary["wait_max"] = waits[-1]
+        return summary
+
+
+class RateLimitScheduler:
+    """Queue requests to one provider within its concurrency and rate limits."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ) -> None:
+        self.name = name
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.metrics = SchedulerMetrics()
+        self.requests_remaining: int | None = None
+        self.tokens_remaining: int | None = None
+        self._requests_reset_at = 0.0
+        self._tokens_reset_at = 0.0
+        self._blocked_until = 0.0
+        self._slots = asyncio.Semaphore(max_concurrency)
+
+    def http_client(self) -> httpx.AsyncClient:
+        """Return an HTTP client that reports rate-limit headers to this scheduler."""
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout=600, connect=5),
+            event_hooks={"response": [self._on_response]},
+        )
+
+    async def _on_response(self, response: httpx.Response) -> None:
+        self.observe(response.status_code, response.headers)
+
+    def observe(self, status_code: int, headers: httpx.Headers) -> None:
+        """Update budgets from a response's rate-limit headers."""
+        now = time.monotonic()
+
+        requests_remaining = _first_int(
+            headers,
+            "x-ratelimit-remaining-requests",
+            "anthropic-ratelimit-requests-remaining",
+        )
+        if requests_remaining is not None:
+            self.requests_remaining = requests_remaining
+            self._requests_reset_at = now + _first_delay(
+                headers,
+                "x-ratelimit-reset-requests",
+                "anthropic-ratelimit-requests-reset",
+            )
+
+        tokens_remaining = _first_int(
+            headers,
+            "x-ratelimit-remaining-tokens",
+            "anthropic-ratelimit-tokens-remaining",
+        )
+        if tokens_remaining is not None:
+            self.tokens_remaining = tokens_remaining
+            self._tokens_reset_at = now + _first_delay(
+                headers,
+                "x-ratelimit-reset-tokens",
+                "anthropic-ratelimit-tokens-reset",
+            )
+
+        if status_code in RETRYABLE_STATUS_CODES:
+            retry_after = _retry_after(headers)
+            if retry_after is not None:
+                self._blocked_until = max(self._blocked_until, now + retry_after)
+            if status_code == 429:
+                self.metrics.rate_limited += 1
+
+    def delay(self) -> float:
+        """Return how long the next request must wait for its budgets."""
+        now = time.monotonic()
+        delay = self._blocked_until - now
+
+        if self.requests_remaining is not None:
+            if now >= self._requests_reset_at:
+                self.requests_remaining = None
+            elif self.requests_remaining <= 0:
+                delay = max(delay, self._requests_reset_at - now)
+
+        if self.tokens_remaining is not None:
+            if now >= self._tokens_reset_at:
+                self.tokens_remaining = None
+            elif self.tokens_remaining <= 0:
+                delay = max(delay, self._tokens_reset_at - now)
+
+        return max(delay, 0.0)
+
+    def backoff(self, attempt: int) -> float:
+        """Return a full-jitter backoff delay, or the retry-after window if longer."""
+        jittered = random.uniform(
+            0, min(self.backoff_cap, self.backoff_base * 2**attempt)
+        )
+        return max(jittered, self._blocked_until - time.monotonic())
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Wait in the queue for a concurrency slot and an available budget."""
+        queued = time.monotonic()
+        async with self._slots:
+            while (delay := self.delay()) > 0:
+                await asyncio.sleep(delay)
+            self.metrics.waits.append(time.monotonic() - queued)
+            self.metrics.requests += 1
+            if self.requests_remaining is not None:
+                self.requests_remaining -= 1
+            yield
+
+
+def build_schedulers(settings: Settings) -> dict[str, RateLimitScheduler]:
+    """Build one scheduler per provider using the configured limits."""
+    return {
+        name: RateLimitScheduler(
+            name,
+            max_concurrency=settings.max_concurrent_requests,
+            max_retries=settings.max_request_retries,
+        )
+        for name in ("openai", "anthropic", "google", *settings.providers)
+    }
+
+
+class ScheduledModel(WrapperModel):
+    """Model wrapper that queues and retries requests through a scheduler."""
+
+    def __init__(self, wrapped: Model, scheduler: RateLimitScheduler) -> None:
+        super().__init__(wrapped)
+        self.scheduler = scheduler
+
+    async def request(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+    ) -> ModelResponse:
+        """Send a request once a slot is free, retrying retryable failures."""
+        attempt = 0
+        while True:
+            try:
+                async with self.scheduler.slot():
+                    return await super().request(
+                        messages, model_settings, model_request_parameters
+                    )
+            except (ModelAPIError, httpx.TransportError) as exc:
+                attempt = await self._before_retry(exc, attempt)
+
+    @asynccontextmanager
+    async def request_stream(
+        self,
+        messages: list[ModelMessage],
+        model_settings: ModelSettings | None,
+        model_request_parameters: ModelRequestParameters,
+        run_context: RunContext[Any] | None = None,
+    ) -> AsyncIterator[StreamedResponse]:
+        """Open a stream once a slot is free, retrying failures before it starts.
+
+        The slot is held until the stream is fully consumed.
+        """
+        attempt = 0
+        while True:
+            async with AsyncExitStack() as stack:
+                await stack.enter_async_context(self.scheduler.slot())
+                try:
+                    response_stream = await stack.enter_async_context(
+                        super().request_stream(
+                            messages,
+                            model_settings,
+                            model_request_parameters,
+                            run_context,
+                        )
+                    )
+                except (ModelAPIError, httpx.TransportError) as exc:
+                    error = exc
+                else:
+                    yield response_stream
+                    return
+            attempt = await self._before_retry(error, attempt)
+
+    async def _before_retry(
+        self, exc: ModelAPIError | httpx.TransportError, attempt: int
+    ) -> int:
+        """Sleep before the next attempt, or re-raise when retrying is pointless.
+
+        HTTP errors are retried only for ``RETRYABLE_STATUS_CODES``; errors
+        without a response, where the request never reached the provider or
+        the connection dropped, are always retried.
+        """
+        if (
+            isinstance(exc, ModelHTTPError)
+            and exc.status_code not in RETRYABLE_STATUS_CODES
+        ) or attempt >= self.scheduler.max_retries:
+            raise exc
+        self.scheduler.metrics.retries += 1
+        await asyncio.sleep(self.scheduler.backoff(attempt))
+        return attempt + 1
+
+
+def format_metrics(schedulers: dict[str, RateLimitScheduler]) -> list[str]:
+    """Format one queue summary line per scheduler that handled requests."""
+    lines = []
+    for name, scheduler in schedulers.items():
+        summary = scheduler.metrics.summary()
+        if not summary["requests"]:
+            continue
+        lines.append(
+            f"{name}: {summary['requests']} requests, {summary['retries']} retries, "
+            f"queue wait p50 {summary['wait_p50']:.2f}s "
+            f"p95 {summary['wait_p95']:.2f}s max {summary['wait_max']:.2f}s"
+        )
+    return lines
+
+
+def _first_int(headers: httpx.Headers, *names: str) -> int | None:
+    """Return the first header among ``names`` that parses as an integer."""
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            try:
+                return int(value)
+            except ValueError:
+                continue
+    return None
+
+
+def _first_delay(headers: httpx.Headers, *names: str) -> float:
+    """Return seconds until the reset time in the first header among ``names``."""
+    for name in names:
+        value = headers.get(name)
+        if value is not None:
+            return _parse_reset(value)
+    return 0.0
+
+
+def _parse_reset(value: str) -> float:
+    """Parse an OpenAI duration (``6m0s``) or Anthropic RFC 3339 reset time."""
+    parts = _DURATION_PATTERN.findall(value)
+    if parts and "".join(amount + unit for amount, unit in parts) == value:
+        return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in parts)
+
+    try:
+        reset_at = datetime.fromisoformat(value)
+    except ValueError:
+        return 0.0
+    return max((reset_at - datetime.now(reset_at.tzinfo)).total_seconds(), 0.0)
+
+
+def _retry_after(headers: httpx.Headers) -> float | None:
+    """Return the server's requested retry delay in seconds, if any."""
+    if (value := headers.get("retry-after-ms")) is not None:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+
+    value = headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except TypeError, ValueError:
+        return None
+    return max((retry_at - datetime.now(retry_at.tzinfo)).total_seconds(), 0.0)
@@ -1,10 +1,50 @@
 import os
 import tomllib
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
 import yaml
 from pydantic import BaseModel
+from pydantic_ai.settings import ModelSettings, ThinkingEffort
+
+
+class ModelProfile(BaseModel):
+    """Generation and timeout settings for one model."""
+
+    effort: ThinkingEffort | None = None
+    max_tokens: int | None = None
+    temperature: float | None = None
+    request_timeout: float | None = None
+    stream_idle_timeout: float | None = None
+
+    def model_settings(self) -> ModelSettings:
+        """Return the pydantic-ai settings for requests to the model."""
+        model_settings = ModelSettings()
+        if self.effort is not None:
+            model_settings["thinking"] = self.effort
+        if self.max_tokens is not None:
+            model_settings["max_tokens"] = self.max_tokens
+        if self.temperature is not None:
+            model_settings["temperature"] = self.temperature
+        if self.request_timeout is not None:
+            model_settings["timeout"] = self.request_timeout
+        return model_settings
+
+
+type ProviderType = Literal["openai", "openai-chat", "anthropic", "google"]
+
+
+class ProviderConfig(BaseModel):
+    """A named model provider and the models it serves.
+
+    ``openai-chat`` speaks the Chat Completions API that local servers such as
+    llama.cpp and vLLM expose, while ``openai`` uses the Responses API.
+    """
+
+    type: ProviderType = "openai-chat"
+    base_url: str | None = None
+    api_key: str | None = None
+    models: list[str] = []
 
 
 class Settings(BaseModel):
@@ -13,6 +53,37 @@ class Settings(BaseModel):
     model: str = "gpt-5.3-codex"
     openai_api_key: str | None = None
     anthropic_api_key: str | None = None
+    google_api_key: str | None = None
+    providers: dict[str, ProviderConfig] = {}
+    usage_db: Path | None = None
+    record_cassette: Path | None = None
+    replay_latency: Literal["original", "zero"] = "original"
+    max_concurrent_requests: int = 8
+    max_request_retries: int = 5
+    backup_model: str | None = None
+    hedge_after: float | None = None
+    fast_model: str | None = None
+    fast_effort: ThinkingEffort | None = "low"
+    effort: ThinkingEffort | None = None
+    max_tokens: int | None = None
+    model_profiles: dict[str, ModelProfile] = {}
+    route: Literal["auto", "fast", "heavy"] = "auto"
+    repo_map_tokens: int = 0
+    prefetch_budget_mb: int = 0
+    spill_chars: int = 20_000
+    response_cache: bool = False
+    response_cache_ttl_hours: float = 168.0
+    response_cache_mb: int = 100
+    max_requests: int = 50
+    max_total_tokens: int = 0
+    max_tool_calls: int = 0
+    max_run_seconds: float = 0.0
+    max_repeated_calls: int = 3
+    memory_limit_mb: int = 0
+    checkpoints: bool = True
+    checkpoint_snapshot: bool = False
+    checkpoint_dir: Path | None = None
+    checkpoint_runs: int = 50
 
     @classmethod
     def load(
@@ -24,13 +95,81 @@ class Settings(BaseModel):
         """Load settings from user config, project config, and environment."""
         env = env or dict(os.environ)
 
+        user_config = _get_user_config()
+        project_config = _get_project_config(cwd=cwd)
+
         data: dict[str, Any] = {}
-        data.update(_get_user_config())
-        data.update(_get_project_config(cwd=cwd))
+        data.update(user_config)
+        data.update(project_config)
         data.update(_load_env_overrides(env=env, fields=cls.model_fields))
+        if "model_profiles" in user_config and "model_profiles" in project_config:
+            data["model_profiles"] = _merge_profiles(
+                user_config["model_profiles"], project_config["model_profiles"]
+            )
 
         return cls.model_validate(data)
 
+    def profiles(
+        self, configs: dict[str, ProviderConfig] | None = None
+    ) -> dict[str, ModelProfile]:
+        """Return model profiles with top-level overrides applied to ``model``.
+
+        ``effort`` and ``max_tokens`` come from config, the environment, or CLI
+        overrides and take precedence over the main model's profile. They are
+        merged into the profile ``build_models`` picks for the main model: its
+        ``provider:model`` profile if there is one, and its bare one otherwise.
+
+        Args:
+            configs: Enabled providers in the order their models are built, used
+                to find the provider that serves a bare ``model``.
+        """
+        profiles = dict(self.model_profiles)
+        overrides = {
+            name: value
+            for name, value in (
+                ("effort", self.effort),
+                ("max_tokens", self.max_tokens),
+            )
+            if value is not None
+        }
+        if overrides:
+            key = self._model_key(configs or {})
+            bare = key.partition(":")[2] or key
+            profile = profiles.get(key) or profiles.get(bare) or ModelProfile()
+            profiles[key] = profile.model_copy(update=overrides)
+        return profiles
+
+    def _model_key(self, configs: dict[str, ProviderConfig]) -> str:
+        """Return ``model`` qualified with the first provider that serves it."""
+        for provider_name, config in configs.items():
+            if self.model in config.models:
+                return f"{provider_name}:{self.model}"
+        return self.model
+
+
+def data_dir() -> Path:
+    """Return the data directory under XDG data home or ~/.local/share."""
+    xdg_data_home = os.environ.get("XDG_DATA_HOME")
+
+    if xdg_data_home:
+        base_dir = Path(xdg_data_home).expanduser()
+    else:
+        base_dir = Path.home() / ".local" / "share"
+
+    return base_dir / "llm_code"
+
+
+def cache_dir() -> Path:
+    """Return the cache directory under XDG cache home or ~/.cache."""
+    xdg_cache_home = os.environ.get("XDG_CACHE_HOME")
+
+    if xdg_cache_home:
+        base_dir = Path(xdg_cache_home).expanduser()
+    else:
+        base_dir = Path.home() / ".cache"
+
+    return base_dir / "llm_code"
+
 
 def _get_user_config() -> dict[str, Any]:
     """Return user config from XDG config home or ~/.config, or an empty mapping."""
@@ -62,6 +201,21 @@ def _get_project_config(*, cwd: Path | None = None) -> dict[str, Any]:
     return {}
 
 
+def _merge_profiles(user_profiles: Any, project_profiles: Any) -> Any:
+    """Merge project model profiles over user ones, field by field per model."""
+    if not isinstance(user_profiles, dict) or not isinstance(project_profiles, dict):
+        return project_profiles
+
+    merged = dict(user_profiles)
+    for name, profile in project_profiles.items():
+        base = merged.get(name)
+        if isinstance(base, dict) and isinstance(profile, dict):
+            merged[name] = {**base, **profile}
+        else:
+            merged[name] = profile
+    return merged
+
+
 def _load_config_file(path: Path) -> dict[str, Any]:
     """Load a TOML or YAML config file and return its top-level mapping."""
     with path.open("rb") as file_handle:
@@ -81,6 +235,7 @@ def _load_config_file(path: Path) -> dict[str, Any]:
 _ENV_ALIASES: dict[str, list[str]] = {
     "openai_api_key": ["OPENAI_API_KEY"],
     "anthropic_api_key": ["ANTHROPIC_API_KEY"],
+    "google_api_key": ["GOOGLE_API_KEY", "GEMINI_API_KEY"],
 }
 
 
@@ -0,0 +1,189 @@
+"""Session-scoped storage for tool results too large to keep in the history.
+
+Every tool result is sent back to the model with each later request of the
+run, so one large ``bash`` output or multi-file ``read`` is paid for many times.
+Results over a size limit are rendered as text and written to a
+content-addressed file under the cache directory. The model gets a short
+outline, a preview, and a handle it can pass to the ``fetch`` tool to page
+through the rest.
+
+Stores of sessions that have not stored anything for ``SESSION_MAX_AGE`` are
+removed when a new store is opened.
+"""
+
+import hashlib
+import json
+import re
+import shutil
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+from llm_code.settings import cache_dir
+from llm_code.usage import new_session_id
+
+PREVIEW_CHARS = 1000
+MAX_FETCH_CHARS = 20_000
+SESSION_MAX_AGE = timedelta(days=1)
+
+_HANDLE_PATTERN = re.compile(r"[0-9a-f]{16}")
+
+
+class SpillStore:
+    """Content-addressed text files for one session."""
+
+    def __init__(self, directory: Path) -> None:
+        self.directory = directory
+
+    @classmethod
+    def default_path(cls, session_id: str | None = None) -> Path:
+        """Return the spill directory for a session under the cache directory."""
+        return cache_dir() / "spill" / (session_id or new_session_id())
+
+    @classmethod
+    def for_session(
+        cls, session_id: str, *, max_age: timedelta = SESSION_MAX_AGE
+    ) -> SpillStore:
+        """Return a session's store, removing other sessions' stale stores."""
+        directory = cls.default_path(session_id)
+        prune_sessions(directory.parent, max_age=max_age, keep=directory)
+        return cls(directory)
+
+    def put(self, content: str) -> str:
+        """Store text and return its handle; identical text shares one file."""
+        handle = hashlib.sha256(content.encode("utf-8")).hexdigest()[:16]
+        path = self.directory / f"{handle}.txt"
+        if not path.exists():
+            self.directory.mkdir(parents=True, exist_ok=True)
+            temporary = path.with_suffix(".tmp")
+            temporary.write_text(content, encoding="utf-8")
+            temporary.replace(path)
+        return handle
+
+    def fetch(
+        self, handle: str, *, offset: int = 0, length: int = 8000
+    ) -> dict[str, Any]:
+        """Return a slice of stored text.
+
+        Args:
+            handle: A handle returned by ``put``.
+            offset: Character offset to start at.
+            length: Maximum number of characters to return, capped at
+                ``MAX_FETCH_CHARS``.
+
+        Returns:
+            A mapping with the slice, its offset, the total length, and the
+            offset of the next slice or ``None`` at the end.
+
+        Raises:
+            ValueError: If the handle is malformed or unknown.
+        """
+        if not _HANDLE_PATTERN.fullmatch(handle):
+            raise ValueError(f"Invalid handle: {handle!r}")
+        path = self.directory / f"{handle}.txt"
+        if not path.is_file():
+            raise ValueError(f"Unknown handle: {handle}")
+
+        text = path.read_text(encoding="utf-8")
+        offset = max(0, offset)
+        end = min(len(text), offset + max(1, min(length, MAX_FETCH_CHARS)))
+        return {
+            "handle": handle,
+            "offset": offset,
+            "content": text[offset:end],
+            "total_chars": len(text),
+            "next_offset": end if end < len(text) else None,
+        }
+
+    def spill(self, result: Any, *, limit: int) -> Any:
+        """Return ``result`` unchanged if it is small, or a handle to it.
+
+        Args:
+            result: A JSON-compatible tool result.
+            limit: Largest rendered size, in characters, returned inline.
+        """
+        text = render_result(result)
+        if len(text) <= limit:
+            return result
+        return {
+            "spilled": True,
+            "handle": self.put(text),
+            "total_chars": len(text),
+            "outline": outline_result(result),
+            "preview": text[:PREVIEW_CHARS],
+            "note": (
+                "This result was too large to include. Call fetch(handle, offset, "
+                "length) to read it in slices."
+            ),
+        }
+
+
+def prune_sessions(
+    directory: Path, *, max_age: timedelta, keep: Path | None = None
+) -> int:
+    """Remove session stores under ``directory`` not written to within ``max_age``.
+
+    Args:
+        directory: The directory holding one store per session.
+        max_age: How long a store is kept after its last new file.
+        keep: A store to keep regardless of its age.
+
+    Returns:
+        The number of stores removed.
+    """
+    cutoff = time.time() - max_age.total_seconds()
+    removed = 0
+    try:
+        sessions = list(directory.iterdir())
+    except OSError:
+        return 0
+    for session in sessions:
+        if session == keep or not session.is_dir():
+            continue
+        try:
+            stale = session.stat().st_mtime < cutoff
+        except OSError:
+            continue
+        if stale:
+            shutil.rmtree(session, ignore_errors=True)
+            removed += 1
+    return removed
+
+
+def render_result(value: Any) -> str:
+    """Render a tool result as plain text, keeping multi-line strings readable."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        parts = []
+        for key, item in value.items():
+            if isinstance(item, str) and "\n" in item:
+                parts.append(f"--- {key} ---\n{item}")
+            elif isinstance(item, dict | list):
+                parts.append(f"--- {key} ---\n{render_result(item)}")
+            else:
+                parts.append(f"{key}: {json.dumps(item, ensure_ascii=False)}")
+        return "\n".join(parts)
+    if isinstance(value, list):
+        return "\n\n".join(render_result(item) for item in value)
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+
+def outline_result(value: Any) -> Any:
+    """Describe the shape of a tool result without its bulky contents."""
+    if isinstance(value, dict):
+        return {
+            str(key): f"{len(item)} chars, {item.count('\n') + 1} lines"
+            if isinstance(item, str) and len(item) > 80
+            else outline_result(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, list):
+        paths = [
+            item["path"] for item in value if isinstance(item, dict) and "path" in item
+        ]
+        if paths:
+            return {"items": len(value), "paths": paths[:20]}
+        return {"items": len(value)}
+    return value
@@ -0,0 +1,374 @@
+"""Symbol index, file outlines, and a compact repository map.
+
+Python files are parsed with ``ast``; other common languages use line-based
+regular expressions that find top-level definitions. The index is kept per
+workspace root and refreshed incrementally: only files whose modification time
+or size changed are parsed again, and with a workspace watcher only the paths
+it reported as changed are checked at all.
+"""
+
+import ast
+import re
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from llm_code.watcher import DirtyPaths, expand_changes, walk_files, workspace_watcher
+
+MAX_INDEXED_BYTES = 1_000_000
+CHARS_PER_TOKEN = 4
+
+_PYTHON_PATTERNS = [
+    ("class", re.compile(r"^class\s+(\w+)")),
+    ("function", re.compile(r"^(?:async\s+)?def\s+(\w+)")),
+]
+_REGEX_PATTERNS: dict[str, list[tuple[str, re.Pattern[str]]]] = {
+    "js": [
+        ("class", re.compile(r"^\s*(?:export\s+)?(?:default\s+)?class\s+(\w+)")),
+        (
+            "function",
+            re.compile(
+                r"^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?function\*?\s+(\w+)"
+            ),
+        ),
+        (
+            "function",
+            re.compile(
+                r"^\s*(?:export\s+)?(?:const|let|var)\s+(\w+)\s*=\s*"
+                r"(?:async\s+)?(?:\([^)]*\)|\w+)\s*=>"
+            ),
+        ),
+        ("interface", re.compile(r"^\s*(?:export\s+)?interface\s+(\w+)")),
+        ("type", re.compile(r"^\s*(?:export\s+)?type\s+(\w+)\s*=")),
+    ],
+    "go": [
+        ("function", re.compile(r"^func\s+(?:\([^)]*\)\s*)?(\w+)")),
+        ("type", re.compile(r"^type\s+(\w+)")),
+    ],
+    "rust": [
+        (
+            "function",
+            re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:async\s+)?fn\s+(\w+)"),
+        ),
+        (
+            "type",
+            re.compile(r"^\s*(?:pub(?:\([^)]*\))?\s+)?(?:struct|enum|trait)\s+(\w+)"),
+        ),
+        ("impl", re.compile(r"^\s*impl(?:<[^>]*>)?\s+(?:[\w:]+\s+for\s+)?(\w+)")),
+    ],
+    "java": [
+        (
+            "class",
+            re.compile(r"^\s*(?:[\w@]+\s+)*(?:class|interface|enum|record)\s+(\w+)"),
+        ),
+        (
+            "function",
+            re.compile(
+                r"^\s*(?:(?:public|protected|private|static|final|abstract|"
+                r"synchronized|async|override|virtual)\s+)+[\w<>\[\],.? ]+\s+(\w+)\s*\("
+            ),
+        ),
+    ],
+    "ruby": [
+        ("class", re.compile(r"^\s*(?:class|module)\s+([\w:]+)")),
+        ("function", re.compile(r"^\s*def\s+(?:self\.)?(\w+[?!=]?)")),
+    ],
+    "c": [
+        (
+            "type",
+            re.compile(r"^\s*(?:typedef\s+)?(?:struct|enum|union|class)\s+(\w+)\s*\{"),
+        ),
+        ("function", re.compile(r"^[A-Za-z_][\w\s\*&:<>,]*?\b(\w+)\s*\([^;]*$")),
+    ],
+}
+_LANGUAGES = {
+    ".js": "js",
+    ".jsx": "js",
+    ".mjs": "js",
+    ".ts": "js",
+    ".tsx": "js",
+    ".go": "go",
+    ".rs": "rust",
+    ".java": "java",
+    ".kt": "java",
+    ".cs": "java",
+    ".rb": "ruby",
+    ".c": "c",
+    ".h": "c",
+    ".cc": "c",
+    ".cpp": "c",
+    ".hpp": "c",
+}
+
+
+@dataclass(frozen=True)
+class Symbol:
+    """One definition found in a source file."""
+
+    name: str
+    kind: str
+    signature: str
+    path: str
+    start_line: int
+    end_line: int
+    parent: str | None = None
+
+    @property
+    def qualified_name(self) -> str:
+        """The name prefixed with its enclosing class, if any."""
+        return f"{self.parent}.{self.name}" if self.parent else self.name
+
+    def as_dict(self) -> dict[str, str | int | None]:
+        """Return the symbol as a JSON-friendly mapping for tool results."""
+        return {
+            "name": self.qualified_name,
+            "kind": self.kind,
+            "signature": self.signature,
+            "path": self.path,
+            "lines": f"{self.start_line}-{self.end_line}",
+        }
+
+
+class SymbolIndex:
+    """Symbols for every supported file under one root, refreshed incrementally."""
+
+    def __init__(self, root: Path, *, changes: DirtyPaths | None = None) -> None:
+        self.root = root
+        self._changes = changes
+        self._files: dict[str, tuple[int, int, list[Symbol]]] = {}
+        self._lock = threading.Lock()
+
+    def refresh(self) -> None:
+        """Parse new and changed files and drop deleted ones."""
+        with self._lock:
+            self._refresh_all()
+
+    def outline(self, relative: str) -> list[Symbol]:
+        """Return the symbols in one file, in source order."""
+        with self._lock:
+            return list(self._refresh_file(relative))
+
+    def _refresh_all(self) -> None:
+        """Reindex changed files under the root; the caller holds the lock."""
+        dirty = self._changes.drain() if self._changes is not None else None
+        if dirty is not None:
+            for relative in expand_changes(self.root, dirty, self._files):
+                if _is_source(Path(relative)):
+                    self._refresh_file(relative)
+            return
+
+        seen = {
+            path.relative_to(self.root).as_posix()
+            for path in walk_files(self.root)
+            if _is_source(path)
+        }
+        for relative in self._files.keys() - seen:
+            del self._files[relative]
+        for relative in sorted(seen):
+            self._refresh_file(relative)
+
+    def _refresh_file(self, relative: str) -> list[Symbol]:
+        """Parse one file again if it changed since it was last indexed."""
+        path = self.root / relative
+        try:
+            stat = path.stat()
+        except OSError:
+            self._files.pop(relative, None)
+            return []
+
+        cached = self._files.get(relative)
+        if cached and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2]
+        symbols = _parse_file(path, relative) if _is_source(path) else []
+        self._files[relative] = (stat.st_mtime_ns, stat.st_size, symbols)
+        return symbols
+
+    def find(self, name: str, *, limit: int = 50) -> list[Symbol]:
+        """Find symbols by exact or qualified name, then by case-insensitive substring.
+
+        Args:
+            name: A symbol name such as ``build_agent`` or ``Settings.load``.
+            limit: Maximum number of symbols to return.
+        """
+        with self._lock:
+            self._refresh_all()
+            symbols = [
+                symbol for _m, _s, file in self._files.values() for symbol in file
+            ]
+        exact = [
+            symbol for symbol in symbols if name in {symbol.name, symbol.qualified_name}
+        ]
+        if exact:
+            return exact[:limit]
+
+        needle = name.lower()
+        return [
+            symbol for symbol in symbols if needle in symbol.qualified_name.lower()
+        ][:limit]
+
+    def repo_map(self, *, token_budget: int) -> str:
+        """Render a compact map of files and their symbols within a token budget.
+
+        File names come first, then top-level symbols, then methods, so a small
+        budget still covers as many files as possible.
+        """
+        with self._lock:
+            self._refresh_all()
+            files = {
+                path: list(symbols) for path, (_m, _s, symbols) in self._files.items()
+            }
+
+        budget = token_budget * CHARS_PER_TOKEN
+        used = 0
+        entries: dict[str, list[tuple[int, str]]] = {}
+        for path in sorted(files):
+            if used + len(path) + 2 > budget:
+                break
+            entries[path] = []
+            used += len(path) + 2
+
+        for nested in (False, True):
+            for path, lines in entries.items():
+                for symbol in files[path]:
+                    if (symbol.parent is not None) != nested:
+                        continue
+                    indent = "    " if nested else "  "
+                    line = f"{indent}{symbol.signature}  # L{symbol.start_line}"
+                    if used + len(line) + 1 > budget:
+                        return _render_map(entries)
+                    lines.append((symbol.start_line, line))
+                    used += len(line) + 1
+
+        return _render_map(entries)
+
+
+_indexes: dict[Path, SymbolIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def symbol_index(root: Path) -> SymbolIndex:
+    """Return the shared index for a workspace root."""
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = _indexes[root] = SymbolIndex(
+                root, changes=workspace_watcher(root).subscribe()
+            )
+        return index
+
+
+def release_symbol_index(root: Path) -> None:
+    """Forget the shared index for a workspace root, if any."""
+    with _indexes_lock:
+        _indexes.pop(root, None)
+
+
+def _render_map(entries: dict[str, list[tuple[int, str]]]) -> str:
+    """Join per-file symbol lines in source order."""
+    rendered = []
+    for path, lines in entries.items():
+        rendered.append(f"{path}:")
+        rendered.extend(line for _number, line in sorted(lines))
+    return "\n".join(rendered)
+
+
+def _is_source(path: Path) -> bool:
+    """Return whether the index can parse a file by its extension."""
+    return path.suffix == ".py" or path.suffix in _LANGUAGES
+
+
+def _parse_file(path: Path, relative: str) -> list[Symbol]:
+    """Extract symbols from one file, or nothing if it cannot be read."""
+    try:
+        if path.stat().st_size > MAX_INDEXED_BYTES:
+            return []
+        source = path.read_text(encoding="utf-8")
+    except OSError, UnicodeDecodeError:
+        return []
+
+    if path.suffix == ".py":
+        try:
+            return _python_symbols(source, relative)
+        except SyntaxError, ValueError:
+            return _regex_symbols(source, relative, _PYTHON_PATTERNS)
+    return _regex_symbols(source, relative, _REGEX_PATTERNS[_LANGUAGES[path.suffix]])
+
+
+def _python_symbols(source: str, relative: str) -> list[Symbol]:
+    """Extract classes, functions, and methods from Python source."""
+    symbols: list[Symbol] = []
+
+    def visit(body: list[ast.stmt], parent: str | None) -> None:
+        for node in body:
+            if isinstance(node, ast.ClassDef):
+                bases = ", ".join(ast.unparse(base) for base in node.bases)
+                symbols.append(
+                    Symbol(
+                        name=node.name,
+                        kind="class",
+                        signature=f"class {node.name}({bases})"
+                        if bases
+                        else f"class {node.name}",
+                        path=relative,
+                        start_line=node.lineno,
+                        end_line=node.end_lineno or node.lineno,
+                        parent=parent,
+                    )
+                )
+                if parent is None:
+                    visit(node.body, node.name)
+            elif isinstance(node, ast.FunctionDef | ast.AsyncFunctionDef):
+                prefix = (
+                    "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+                )
+                returns = f" -> {ast.unparse(node.returns)}" if node.returns else ""
+                symbols.append(
+                    Symbol(
+                        name=node.name,
+                        kind="method" if parent else "function",
+                        signature=(
+                            f"{prefix} {node.name}({ast.unparse(node.args)}){returns}"
+                        ),
+                        path=relative,
+                        start_line=node.lineno,
+                        end_line=node.end_lineno or node.lineno,
+                        parent=parent,
+                    )
+                )
+
+    visit(ast.parse(source).body, None)
+    return symbols
+
+
+def _regex_symbols(
+    source: str,
+    relative: str,
+    patterns: list[tuple[str, re.Pattern[str]]],
+) -> list[Symbol]:
+    """Extract definitions line by line.
+
+    Each symbol's range runs until the line before the next definition, which
+    is approximate but enough to read the right part of a file.
+    """
+    lines = source.splitlines()
+    found: list[tuple[int, str, str, str]] = []
+    for number, line in enumerate(lines, start=1):
+        for kind, pattern in patterns:
+            if match := pattern.match(line):
+                found.append((number, kind, match.group(1), line.strip().rstrip("{")))
+                break
+
+    symbols = []
+    for position, (number, kind, name, signature) in enumerate(found):
+        end = found[position + 1][0] - 1 if position + 1 < len(found) else len(lines)
+        symbols.append(
+            Symbol(
+                name=name,
+                kind=kind,
+                signature=signature.strip(),
+                path=relative,
+                start_line=number,
+                end_line=max(end, number),
+            )
+        )
+    return symbols
@@ -1,13 +1,24 @@
 import asyncio
+import time
 from typing import Any
 
+from pydantic_ai import capture_run_messages
+from pydantic_ai.exceptions import UsageLimitExceeded
 from pydantic_ai.models import Model
+from pydantic_ai.usage import RunUsage
 from textual.app import App, ComposeResult
 from textual.binding import Binding
 from textual.message import Message
 from textual.widgets import TextArea
 
-from llm_code.agent import build_agent
+from llm_code.agent import build_agent, workspace_root
+from llm_code.checkpoint import CheckpointStore, use_checkpoint
+from llm_code.limits import RunLimits, run_deadline
+from llm_code.memory import MemoryProfiler
+from llm_code.usage import UsageLedger
+
+TRANSCRIPT_KEEP_CHARS = 50_000
+TRANSCRIPT_TRIMMED = "[earlier transcript trimmed]"
 
 
 class PromptInput(TextArea):
@@ -50,11 +61,38 @@ class LlmCodeApp(App[None]):
     }
     """
 
-    def __init__(self, *, model: Model) -> None:
+    def __init__(
+        self,
+        *,
+        model: Model,
+        ledger: UsageLedger | None = None,
+        session_id: str | None = None,
+        repo_map_tokens: int = 0,
+        prefetch_budget_mb: int = 0,
+        spill_chars: int = 0,
+        limits: RunLimits | None = None,
+        profiler: MemoryProfiler | None = None,
+        checkpoints: CheckpointStore | None = None,
+    ) -> None:
         super().__init__()
         self._model = model
-        self._agent = build_agent(model)
+        self._limits = limits or RunLimits()
+        self._ceiling = self._limits.memory_ceiling()
+        self._profiler = profiler
+        self._checkpoints = checkpoints
+        self._agent = build_agent(
+            model,
+            repo_map_tokens=repo_map_tokens,
+            prefetch_budget_mb=prefetch_budget_mb,
+            spill_chars=spill_chars,
+            session_id=session_id,
+            max_repeated_calls=self._limits.repeated_calls,
+            memory_limit_mb=self._limits.memory_mb,
+        )
+        self._ledger = ledger
+        self._session_id = session_id
         self._transcript = ""
+        self._turns = 0
         self._pending_task: asyncio.Task[Any] | None = None
 
     def compose(self) -> ComposeResult:
@@ -97,27 +135,98 @@ class LlmCodeApp(App[None]):
 
     async def _run_prompt(self, prompt: str) -> None:
         """Run one prompt and stream the response into the transcript."""
+        started = time.perf_counter()
+        checkpoint = None
+        usage = RunUsage()
         try:
-            async with self._agent.run_stream(prompt) as result:
-                async for chunk in result.stream_text(delta=True, debounce_by=None):
-                    self._append_transcript(chunk)
-            self._append_transcript("\n")
+            if self._checkpoints is not None:
+                checkpoint = await asyncio.to_thread(
+                    self._checkpoints.begin, workspace_root(), prompt
+                )
+            with capture_run_messages() as messages, use_checkpoint(checkpoint):
+                try:
+                    async with (
+                        run_deadline(self._limits.seconds),
+                        self._agent.run_stream(
+                            prompt,
+                            usage=usage,
+                            usage_limits=self._limits.usage_limits(),
+                        ) as result,
+                    ):
+                        async for chunk in result.stream_text(
+                            delta=True, debounce_by=None
+                        ):
+                            self._append_transcript(chunk)
+                    self._append_transcript("\n")
+                except UsageLimitExceeded as exc:
+                    self._append_transcript(f"\n[stopped early] {exc}\n")
+            if self._ledger is not None:
+                self._ledger.record_run(
+                    model=self._model.model_name,
+                    messages=messages,
+                    usage=usage,
+                    duration_seconds=time.perf_counter() - started,
+                    session_id=self._session_id,
+                )
         except Exception as exc:  # pragma: no cover - defensive UI path
             self._append_transcript(f"\n[error] {exc}\n")
         finally:
+            if checkpoint is not None and (line := checkpoint.summary_line()):
+                self.notify(line, title="Checkpoint")
+            await self._after_turn()
             prompt_input = self.query_one("#prompt", PromptInput)
             prompt_input.disabled = False
             prompt_input.focus()
 
+    async def _after_turn(self) -> None:
+        """Profile the finished turn and shed memory if over the ceiling."""
+        self._turns += 1
+        if self._profiler is not None:
+            report = await asyncio.to_thread(
+                self._profiler.snapshot, f"turn {self._turns}"
+            )
+            self.notify(report.headline(), title="Memory")
+        if self._ceiling is not None and self._ceiling.crossed():
+            await asyncio.to_thread(self._ceiling.relieve)
+
     def _append_transcript(self, text: str) -> None:
-        """Append text to the transcript and refresh the output widget."""
+        """Append text to the transcript and refresh the output widget.
+
+        Only the last ``TRANSCRIPT_KEEP_CHARS`` are kept, from the first line
+        that starts within them.
+        """
         self._transcript += text
+        if len(self._transcript) > TRANSCRIPT_KEEP_CHARS:
+            tail = self._transcript[-TRANSCRIPT_KEEP_CHARS:]
+            tail = tail[tail.find("\n") + 1 :]
+            self._transcript = f"{TRANSCRIPT_TRIMMED}\n{tail}"
         output = self.query_one("#output", TextArea)
         output.load_text(self._transcript)
         output.scroll_end(animate=False)
 
 
-def launch_tui(*, model: Model) -> None:
+def launch_tui(
+    *,
+    model: Model,
+    ledger: UsageLedger | None = None,
+    session_id: str | None = None,
+    repo_map_tokens: int = 0,
+    prefetch_budget_mb: int = 0,
+    spill_chars: int = 0,
+    limits: RunLimits | None = None,
+    profiler: MemoryProfiler | None = None,
+    checkpoints: CheckpointStore | None = None,
+) -> None:
     """Launch the Textual TUI."""
-    app = LlmCodeApp(model=model)
+    app = LlmCodeApp(
+        model=model,
+        ledger=ledger,
+        session_id=session_id,
+        repo_map_tokens=repo_map_tokens,
+        prefetch_budget_mb=prefetch_budget_mb,
+        spill_chars=spill_chars,
+        limits=limits,
+        profiler=profiler,
+        checkpoints=checkpoints,
+    )
     app.run()
@@ -0,0 +1,367 @@
+"""Local token and cost accounting.
+
+Every agent run appends one row to a SQLite ledger so token usage and spend can
+be reported per day, model, and repository. The ledger lives under the user's
+XDG data directory unless ``usage_db`` is configured.
+"""
+
+import uuid
+from collections.abc import Iterable, Sequence
+from datetime import UTC, date, datetime
+from pathlib import Path
+from typing import Any
+
+from pydantic_ai.messages import ModelMessage, ModelResponse
+from pydantic_ai.usage import RunUsage
+from sqlalchemy import (
+    DateTime,
+    Engine,
+    Float,
+    Index,
+    Integer,
+    String,
+    create_engine,
+    event,
+    func,
+    select,
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import DeclarativeBase, Mapped, Session, mapped_column
+
+from llm_code.settings import data_dir
+
+GROUP_BY_COLUMNS = ("day", "model", "project")
+TOTAL_COLUMNS = (
+    "runs",
+    "requests",
+    "input_tokens",
+    "output_tokens",
+    "cache_read_tokens",
+    "cache_write_tokens",
+    "thinking_tokens",
+    "tool_calls",
+    "duration_seconds",
+    "cost",
+)
+
+USAGE_FIELDS = (
+    "requests",
+    "input_tokens",
+    "output_tokens",
+    "cache_read_tokens",
+    "cache_write_tokens",
+    "input_audio_tokens",
+    "cache_audio_read_tokens",
+)
+
+
+class Base(DeclarativeBase):
+    """Declarative base for ledger tables."""
+
+
+class UsageRecord(Base):
+    """One agent run's token usage, tool count, wall time, and cost."""
+
+    __tablename__ = "usage"
+    __table_args__ = (
+        Index("ix_usage_day_model_project", "day", "model", "project"),
+        Index("ix_usage_session_id", "session_id"),
+    )
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    day: Mapped[str] = mapped_column(String(10))
+    session_id: Mapped[str] = mapped_column(String(32))
+    model: Mapped[str] = mapped_column(String(128))
+    project: Mapped[str] = mapped_column(String(1024))
+    requests: Mapped[int] = mapped_column(Integer, default=0)
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_read_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_write_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    thinking_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    tool_calls: Mapped[int] = mapped_column(Integer, default=0)
+    duration_seconds: Mapped[float] = mapped_column(Float, default=0.0)
+    cost: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class DailyUsage(Base):
+    """Per day, model, and project totals maintained alongside ``usage`` rows.
+
+    Reports aggregate this rollup instead of scanning every recorded run, so
+    they stay fast as the ledger grows.
+    """
+
+    __tablename__ = "usage_daily"
+
+    day: Mapped[str] = mapped_column(String(10), primary_key=True)
+    model: Mapped[str] = mapped_column(String(128), primary_key=True)
+    project: Mapped[str] = mapped_column(String(1024), primary_key=True)
+    runs: Mapped[int] = mapped_column(Integer, default=0)
+    requests: Mapped[int] = mapped_column(Integer, default=0)
+    input_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    output_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_read_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    cache_write_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    thinking_tokens: Mapped[int] = mapped_column(Integer, default=0)
+    tool_calls: Mapped[int] = mapped_column(Integer, default=0)
+    duration_seconds: Mapped[float] = mapped_column(Float, default=0.0)
+    cost: Mapped[float] = mapped_column(Float, default=0.0)
+
+
+class UsageLedger:
+    """Append-only SQLite ledger of agent run usage."""
+
+    def __init__(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._engine = _create_engine(path)
+        Base.metadata.create_all(self._engine)
+
+    @classmethod
+    def default_path(cls) -> Path:
+        """Return the ledger path under XDG data home or ~/.local/share."""
+        return data_dir() / "usage.sqlite"
+
+    def record(
+        self,
+        *,
+        model: str,
+        usage: RunUsage,
+        duration_seconds: float,
+        project: Path | None = None,
+        session_id: str | None = None,
+        cost: float = 0.0,
+        created_at: datetime | None = None,
+        runs: int = 1,
+    ) -> None:
+        """Append one run's usage to the ledger.
+
+        Args:
+            model: Name of the model that served the run.
+            usage: Aggregated usage reported by pydantic-ai for the run.
+            duration_seconds: Wall-clock time of the run.
+            project: Repository root the run worked in; detected from the
+                current directory when omitted.
+            session_id: Identifier shared by runs in one CLI or TUI session.
+            cost: Estimated spend in USD.
+            created_at: Timestamp of the run; defaults to now.
+            runs: Number of runs the row counts as in reports.
+        """
+        created_at = created_at or datetime.now(UTC)
+        record = UsageRecord(
+            created_at=created_at,
+            day=created_at.date().isoformat(),
+            session_id=session_id or new_session_id(),
+            model=model,
+            project=str(project or find_project_root()),
+            requests=usage.requests,
+            input_tokens=usage.input_tokens,
+            output_tokens=usage.output_tokens,
+            cache_read_tokens=usage.cache_read_tokens,
+            cache_write_tokens=usage.cache_write_tokens,
+            thinking_tokens=usage.details.get("reasoning_tokens", 0),
+            tool_calls=usage.tool_calls,
+            duration_seconds=duration_seconds,
+            cost=cost,
+        )
+        totals = {column: getattr(record, column) for column in TOTAL_COLUMNS[1:]}
+        rollup = sqlite_insert(DailyUsage).values(
+            day=record.day,
+            model=record.model,
+            project=record.project,
+            runs=runs,
+            **totals,
+        )
+        rollup = rollup.on_conflict_do_update(
+            index_elements=list(GROUP_BY_COLUMNS),
+            set_={
+                column: getattr(DailyUsage, column) + rollup.excluded[column]
+                for column in TOTAL_COLUMNS
+            },
+        )
+
+        with Session(self._engine) as session, session.begin():
+            session.add(record)
+            session.execute(rollup)
+
+    def record_run(
+        self,
+        *,
+        model: str,
+        messages: Sequence[ModelMessage],
+        usage: RunUsage,
+        duration_seconds: float,
+        project: Path | None = None,
+        session_id: str | None = None,
+    ) -> None:
+        """Append a run's usage under the models that answered it.
+
+        A run answered by several models, such as a routed or hedged one, gets
+        one row per model with the tokens and cost of that model's responses.
+        Wall time is shared out by number of responses, and the run is counted
+        once, under the model that answered last.
+
+        Args:
+            model: Name recorded when no response names its model.
+            messages: The run's messages.
+            usage: Aggregated usage reported by pydantic-ai for the run.
+            duration_seconds: Wall-clock time of the run.
+            project: Repository root the run worked in; detected from the
+                current directory when omitted.
+            session_id: Identifier shared by runs in one CLI or TUI session.
+        """
+        created_at = datetime.now(UTC)
+        project = project or find_project_root()
+        session_id = session_id or new_session_id()
+        shares = usage_by_model(messages, usage, model)
+        requests = sum(share.requests for share in shares.values())
+        last = next(reversed(shares))
+        for name, share in shares.items():
+            responses = [
+                message
+                for message in messages
+                if isinstance(message, ModelResponse) and message.model_name == name
+            ]
+            weight = share.requests / requests if requests else 1.0
+            self.record(
+                model=name,
+                usage=share,
+                duration_seconds=duration_seconds * weight,
+                project=project,
+                session_id=session_id,
+                cost=messages_cost(responses),
+                created_at=created_at,
+                runs=int(name == last),
+            )
+
+    def summarize(
+        self,
+        *,
+        group_by: Sequence[str] = GROUP_BY_COLUMNS,
+        since: date | None = None,
+    ) -> list[dict[str, Any]]:
+        """Aggregate ledger rows by any combination of day, model, and project.
+
+        Args:
+            group_by: Columns to group on, from ``day``, ``model``, and
+                ``project``.
+            since: Only include runs on or after this day.
+
+        Returns:
+            One mapping per group with the grouping keys and summed totals,
+            ordered by the grouping keys.
+
+        Raises:
+            ValueError: If ``group_by`` names an unknown column.
+        """
+        unknown = set(group_by) - set(GROUP_BY_COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown usage grouping: {', '.join(sorted(unknown))}")
+
+        keys = [getattr(DailyUsage, column) for column in group_by]
+        totals = [
+            func.sum(getattr(DailyUsage, column)).label(column)
+            for column in TOTAL_COLUMNS
+        ]
+        statement = select(*keys, *totals).group_by(*keys).order_by(*keys)
+        if since is not None:
+            statement = statement.where(DailyUsage.day >= since.isoformat())
+
+        with Session(self._engine) as session:
+            return [dict(row._mapping) for row in session.execute(statement)]
+
+
+def new_session_id() -> str:
+    """Return a fresh identifier for a CLI or TUI session."""
+    return uuid.uuid4().hex
+
+
+def find_project_root(cwd: Path | None = None) -> Path:
+    """Return the nearest git repository root, or cwd when there is none."""
+    current_dir = (cwd or Path.cwd()).resolve()
+
+    for directory in (current_dir, *current_dir.parents):
+        if (directory / ".git").exists():
+            return directory
+
+    return current_dir
+
+
+def usage_by_model(
+    messages: Sequence[ModelMessage], usage: RunUsage, model: str
+) -> dict[str, RunUsage]:
+    """Split a run's usage across the models whose responses it contains.
+
+    Each model gets the requests and tokens of its own responses, and a share
+    of the run's tool calls weighted by its number of responses. Usage that no
+    response reports, such as that of delegated subtasks, goes to the model
+    that answered last, which is also the last key.
+
+    Args:
+        messages: The run's messages.
+        usage: Aggregated usage reported by pydantic-ai for the run.
+        model: Name to attribute the run to when no response names its model.
+
+    Returns:
+        Usage by model name.
+    """
+    shares: dict[str, RunUsage] = {}
+    last = model
+    for message in messages:
+        if not isinstance(message, ModelResponse) or not message.model_name:
+            continue
+        last = message.model_name
+        share = shares.setdefault(last, RunUsage())
+        share.requests += 1
+        share.incr(message.usage)
+    if len(shares) <= 1:
+        return {last: usage}
+
+    shares[last] = shares.pop(last)
+    responses = sum(share.requests for share in shares.values())
+    for share in shares.values():
+        share.tool_calls = usage.tool_calls * share.requests // responses
+    final = shares[last]
+    final.tool_calls += usage.tool_calls - sum(
+        share.tool_calls for share in shares.values()
+    )
+    for field in USAGE_FIELDS:
+        reported = sum(getattr(share, field) for share in shares.values())
+        unreported = max(getattr(usage, field) - reported, 0)
+        setattr(final, field, getattr(final, field) + unreported)
+    for key, value in usage.details.items():
+        reported = sum(share.details.get(key, 0) for share in shares.values())
+        if value > reported:
+            final.details[key] = final.details.get(key, 0) + value - reported
+    return shares
+
+
+def messages_cost(messages: Iterable[ModelMessage]) -> float:
+    """Return the estimated USD cost of the model responses in a run.
+
+    Responses from models without published prices contribute nothing.
+    """
+    total = 0.0
+    for message in messages:
+        if not isinstance(message, ModelResponse) or not message.model_name:
+            continue
+        try:
+            total += float(message.cost().total_price)
+        except LookupError:
+            continue
+    return total
+
+
+def _create_engine(path: Path) -> Engine:
+    """Create a SQLite engine tuned for many small appends."""
+    engine = create_engine(f"sqlite:///{path}")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection: Any, _record: Any) -> None:
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    return engine
@@ -0,0 +1,389 @@
+"""Workspace change notification for cache invalidation.
+
+A ``WorkspaceWatcher`` publishes the relative paths that changed under a
+workspace root, whoever changed them: the agent's tools, ``bash`` commands, or
+the user's editor. On Linux it uses inotify through ``ctypes``; elsewhere, or
+when inotify watches run out, it polls modification times in the background.
+
+Caches subscribe with ``subscribe()`` and receive a ``DirtyPaths`` set they
+drain before answering a query. Draining first reads any inotify events already
+queued by the kernel, so changes that finished before the query are always
+seen. With the polling fallback, changes are seen within one poll interval.
+"""
+
+import contextlib
+import ctypes
+import ctypes.util
+import errno
+import functools
+import os
+import select
+import struct
+import sys
+import threading
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+SKIPPED_DIRS = frozenset(
+    {
+        ".git",
+        ".hg",
+        ".mypy_cache",
+        ".pytest_cache",
+        ".ruff_cache",
+        ".tox",
+        ".venv",
+        "__pycache__",
+        "build",
+        "dist",
+        "node_modules",
+        "target",
+        "venv",
+    }
+)
+
+_IN_MODIFY = 0x00000002
+_IN_ATTRIB = 0x00000004
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+    | _IN_DELETE_SELF
+    | _IN_MOVE_SELF
+    | _IN_ONLYDIR
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def walk_files(root: Path, start: Path | None = None) -> Iterator[Path]:
+    """Yield files under ``start`` (default ``root``), skipping vendored dirs."""
+    for directory, dirnames, filenames in os.walk(start or root):
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if name not in SKIPPED_DIRS and not name.startswith(".")
+        )
+        for filename in sorted(filenames):
+            yield Path(directory) / filename
+
+
+def walk_relative(root: Path, start: Path | None = None) -> Iterator[str]:
+    """Yield relative POSIX paths of files under ``start``, like ``walk_files``.
+
+    Builds paths with string operations only, for walks over large trees.
+    """
+    base = os.fspath(root)
+    prefix_length = len(base) + 1
+    for directory, dirnames, filenames in os.walk(start or root):
+        dirnames[:] = sorted(
+            name
+            for name in dirnames
+            if name not in SKIPPED_DIRS and not name.startswith(".")
+        )
+        relative = directory[prefix_length:].replace(os.sep, "/")
+        for filename in sorted(filenames):
+            yield f"{relative}/{filename}" if relative else filename
+
+
+def expand_changes(root: Path, paths: Iterable[str], known: Iterable[str]) -> set[str]:
+    """Expand changed paths into the files a cache should check again.
+
+    A changed directory stands for every file now inside it and every known
+    file that used to be inside it.
+
+    Args:
+        root: The workspace root.
+        paths: Changed paths relative to ``root``.
+        known: Relative file paths the cache currently holds.
+
+    Returns:
+        Relative file paths to re-stat; missing ones were deleted.
+    """
+    known = list(known)
+    files: set[str] = set()
+    for relative in paths:
+        files.add(relative)
+        prefix = f"{relative}/"
+        files.update(path for path in known if path.startswith(prefix))
+        directory = root / relative
+        if directory.is_dir():
+            files.discard(relative)
+            files.update(
+                path.relative_to(root).as_posix()
+                for path in walk_files(root, directory)
+            )
+    return files
+
+
+class DirtyPaths:
+    """Paths changed since one cache last caught up with the workspace."""
+
+    def __init__(self, watcher: WorkspaceWatcher | None = None) -> None:
+        self._watcher = watcher
+        self._lock = threading.Lock()
+        self._paths: set[str] | None = None
+
+    def add(self, paths: set[str] | None) -> None:
+        """Mark paths as changed, or everything when ``paths`` is ``None``."""
+        with self._lock:
+            if paths is None or self._paths is None:
+                self._paths = None
+            else:
+                self._paths |= paths
+
+    def drain(self) -> set[str] | None:
+        """Return and clear the changed paths.
+
+        Returns:
+            The changed relative paths, or ``None`` when the cache must rescan
+            everything (on first use and after the watcher lost events).
+        """
+        if self._watcher is not None:
+            self._watcher.flush()
+        with self._lock:
+            paths, self._paths = self._paths, set()
+            return paths
+
+
+class WorkspaceWatcher:
+    """Watch a workspace tree and publish changed paths to subscribers."""
+
+    def __init__(
+        self,
+        root: Path,
+        *,
+        poll_interval: float = 1.0,
+        use_inotify: bool = True,
+    ) -> None:
+        self.root = root
+        self.poll_interval = poll_interval
+        self.backend = "inotify" if use_inotify and _libc() is not None else "polling"
+        self._subscribers: list[DirtyPaths] = []
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._read_lock = threading.Lock()
+        self._fd = -1
+        self._watches: dict[int, str] = {}
+        self._snapshot: dict[str, tuple[int, int]] = {}
+
+    def subscribe(self) -> DirtyPaths:
+        """Return a new set of dirty paths that this watcher keeps updated."""
+        dirty = DirtyPaths(self)
+        self._subscribers.append(dirty)
+        return dirty
+
+    def start(self) -> None:
+        """Start watching; inotify falls back to polling if watches run out."""
+        if self.backend == "inotify":
+            try:
+                self._start_inotify()
+            except OSError:
+                self._close_inotify()
+                self.backend = "polling"
+        if self.backend == "polling":
+            self._snapshot = self._scan()
+
+        self._thread = threading.Thread(
+            target=self._run_inotify
+            if self.backend == "inotify"
+            else self._run_polling,
+            name=f"watch {self.root}",
+            daemon=True,
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop watching and release the inotify descriptor.
+
+        Subscribers are marked fully dirty, since changes after this point are
+        no longer reported to them.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._close_inotify()
+        self.publish(None)
+
+    def flush(self) -> None:
+        """Publish inotify events the kernel has already queued."""
+        if self.backend == "inotify" and self._fd >= 0:
+            self._read_events()
+
+    def publish(self, paths: set[str] | None) -> None:
+        """Mark paths as changed for every subscriber."""
+        if paths is not None and not paths:
+            return
+        for dirty in self._subscribers:
+            dirty.add(paths)
+
+    def _run_polling(self) -> None:
+        while not self._stopped.wait(self.poll_interval):
+            snapshot = self._scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+            self.publish(changed)
+
+    def _scan(self) -> dict[str, tuple[int, int]]:
+        snapshot = {}
+        for path in walk_files(self.root):
+            with contextlib.suppress(OSError):
+                stat = path.stat()
+                snapshot[path.relative_to(self.root).as_posix()] = (
+                    stat.st_mtime_ns,
+                    stat.st_size,
+                )
+        return snapshot
+
+    def _start_inotify(self) -> None:
+        libc = _libc()
+        assert libc is not None
+        self._fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._watch_tree("")
+
+    def _close_inotify(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+        self._watches.clear()
+
+    def _watch_tree(self, relative: str) -> None:
+        """Add a watch for a directory and every non-skipped directory below it."""
+        libc = _libc()
+        assert libc is not None
+        start = self.root / relative if relative else self.root
+        for directory, dirnames, _filenames in os.walk(start):
+            dirnames[:] = [
+                name
+                for name in dirnames
+                if name not in SKIPPED_DIRS and not name.startswith(".")
+            ]
+            wd = libc.inotify_add_watch(self._fd, os.fsencode(directory), _WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, "inotify watch limit reached")
+                continue
+            self._watches[wd] = Path(directory).relative_to(self.root).as_posix()
+
+    def _unwatch_tree(self, relative: str) -> None:
+        libc = _libc()
+        assert libc is not None
+        prefix = f"{relative}/"
+        for wd, path in list(self._watches.items()):
+            if path == relative or path.startswith(prefix):
+                libc.inotify_rm_watch(self._fd, wd)
+                del self._watches[wd]
+
+    def _run_inotify(self) -> None:
+        while not self._stopped.is_set():
+            ready, _w, _x = select.select([self._fd], [], [], 0.2)
+            if ready:
+                self._read_events()
+
+    def _read_events(self) -> None:
+        """Read every queued inotify event and publish the changed paths."""
+        with self._read_lock:
+            changed: set[str] = set()
+            overflowed = False
+            while True:
+                try:
+                    data = os.read(self._fd, 64 * 1024)
+                except BlockingIOError:
+                    break
+                except OSError:
+                    return
+                overflowed |= self._parse_events(data, changed)
+            self.publish(None if overflowed else changed)
+
+    def _parse_events(self, data: bytes, changed: set[str]) -> bool:
+        """Add the paths named by raw inotify events; return True on overflow."""
+        overflowed = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = os.fsdecode(data[offset : offset + length].rstrip(b"\0"))
+            offset += length
+
+            if mask & _IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+            directory = self._watches.get(wd)
+            if directory is None:
+                continue
+            if mask & _IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            if not name:
+                if not directory:
+                    overflowed = True
+                changed.add(directory)
+                continue
+
+            relative = f"{directory}/{name}" if directory else name
+            if mask & _IN_ISDIR and (name in SKIPPED_DIRS or name.startswith(".")):
+                continue
+            changed.add(relative)
+            if mask & _IN_ISDIR:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    with contextlib.suppress(OSError):
+                        self._watch_tree(relative)
+                elif mask & _IN_MOVED_FROM:
+                    self._unwatch_tree(relative)
+        return overflowed
+
+
+@functools.cache
+def _libc() -> ctypes.CDLL | None:
+    """Return libc when it provides inotify, or ``None``."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        libc.inotify_init1  # noqa: B018
+    except OSError, AttributeError:
+        return None
+    return libc
+
+
+_watchers: dict[Path, WorkspaceWatcher] = {}
+_watchers_lock = threading.Lock()
+
+
+def workspace_watcher(root: Path) -> WorkspaceWatcher:
+    """Return the started, shared watcher for a workspace root."""
+    with _watchers_lock:
+        watcher = _watchers.get(root)
+        if watcher is None:
+            watcher = _watchers[root] = WorkspaceWatcher(root)
+            watcher.start()
+        return watcher
+
+
+def release_watcher(root: Path) -> None:
+    """Stop and forget the shared watcher for a workspace root, if any."""
+    with _watchers_lock:
+        watcher = _watchers.pop(root, None)
+    if watcher is not None:
+        watcher.stop()
@@ -1,10 +1,32 @@
 import asyncio
+import json
 import subprocess
 from pathlib import Path
 
 import pytest
-
-from llm_code.agent import _read_files, _run_bash, _search_files, _write_file
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.usage import UsageLimits
+
+from llm_code import checkpoint
+from llm_code.agent import (
+    SUBAGENT_INSTRUCTIONS,
+    _read_files,
+    _run_bash,
+    _search_files,
+    _write_file,
+    _write_files,
+    build_agent,
+    use_workspace,
+)
 
 
 def test_read_files_reads_a_single_file(tmp_path: Path, monkeypatch) -> None:
@@ -47,6 +69,51 @@ def test_write_file_writes_a_single_file(tmp_path: Path, monkeypatch) -> None:
     assert (tmp_path / "nested/out.txt").read_text(encoding="utf-8") == "hello"
 
 
+def test_write_many_skips_unchanged_files(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "same.txt").write_text("same", encoding="utf-8")
+    (tmp_path / "old.txt").write_text("old", encoding="utf-8")
+    inode = (tmp_path / "same.txt").stat().st_ino
+
+    summary = asyncio.run(
+        _write_files(
+            {"same.txt": "same", "old.txt": "new", "nested/created.txt": "hello"}
+        )
+    )
+
+    assert summary == {
+        "written": ["old.txt", "nested/created.txt"],
+        "unchanged": ["same.txt"],
+    }
+    assert (tmp_path / "same.txt").stat().st_ino == inode
+    assert (tmp_path / "old.txt").read_text(encoding="utf-8") == "new"
+    assert (tmp_path / "nested/created.txt").read_text(encoding="utf-8") == "hello"
+    assert asyncio.run(_write_file("old.txt", "new")) == "Unchanged old.txt"
+
+
+def test_write_many_rolls_back_every_file_on_failure(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.txt").write_text("a", encoding="utf-8")
+    (tmp_path / "b.txt").write_text("b", encoding="utf-8")
+    backup = checkpoint._backup
+
+    def failing_backup(path: Path) -> Path | None:
+        if path.name == "b.txt":
+            raise OSError("disk full")
+        return backup(path)
+
+    monkeypatch.setattr(checkpoint, "_backup", failing_backup)
+
+    with pytest.raises(OSError, match="disk full"):
+        asyncio.run(_write_files({"a.txt": "A", "new/c.txt": "C", "b.txt": "B"}))
+
+    assert (tmp_path / "a.txt").read_text(encoding="utf-8") == "a"
+    assert (tmp_path / "b.txt").read_text(encoding="utf-8") == "b"
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["a.txt", "b.txt"]
+
+
 def test_write_file_rejects_paths_outside_cwd(tmp_path: Path, monkeypatch) -> None:
     monkeypatch.chdir(tmp_path)
 
@@ -134,31 +201,21 @@ def test_search_files_rejects_paths_outside_cwd(tmp_path: Path, monkeypatch) ->
         asyncio.run(_search_files("hello", path="../src/*.py", context_lines=1))
 
 
-def test_search_files_falls_back_to_grep_when_rg_is_unavailable(
+def test_search_files_falls_back_to_python_when_rg_is_unavailable(
     tmp_path: Path, monkeypatch
 ) -> None:
     monkeypatch.chdir(tmp_path)
-    file_path = tmp_path / "app.py"
-    file_path.write_text("zero\nhello world\nomega\n", encoding="utf-8")
-
+    (tmp_path / "a:b.py").write_text("zero\nhello world\nomega\n", encoding="utf-8")
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "lib.js").write_text("hello\n", encoding="utf-8")
+    (tmp_path / "blob.bin").write_bytes(b"\0hello\n")
     monkeypatch.setattr("llm_code.agent.shutil.which", lambda name: None)
 
-    def fake_run(command: list[str], **kwargs) -> subprocess.CompletedProcess[str]:
-        assert command[:4] == ["grep", "-R", "-n", "-E"]
-        return subprocess.CompletedProcess(
-            args=command,
-            returncode=0,
-            stdout="./app.py:2:hello world\n",
-            stderr="",
-        )
-
-    monkeypatch.setattr("llm_code.agent.subprocess.run", fake_run)
-
-    result = asyncio.run(_search_files("hello", path="app.py", context_lines=1))
+    result = asyncio.run(_search_files("^hello", context_lines=1))
 
     assert result == [
         {
-            "path": "app.py",
+            "path": "a:b.py",
             "matches": [
                 {
                     "line_number": 2,
@@ -167,3 +224,188 @@ def test_search_files_falls_back_to_grep_when_rg_is_unavailable(
             ],
         }
     ]
+
+
+def test_search_files_runs_several_patterns_with_filters(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "app.py").write_text(
+        "def load_config():\n    return save_state()\n", encoding="utf-8"
+    )
+    (tmp_path / "src" / "app.js").write_text("load_config()\n", encoding="utf-8")
+    (tmp_path / "src" / "big.py").write_text(
+        "load_config()\n" + "x" * 5000, encoding="utf-8"
+    )
+    (tmp_path / "src" / "test_app.py").write_text("load_config\n", encoding="utf-8")
+    monkeypatch.setattr("llm_code.agent.shutil.which", lambda name: None)
+
+    result = asyncio.run(
+        _search_files(
+            ["load_config", "save_state"],
+            context_lines=0,
+            include=["src/**"],
+            exclude=["test_*"],
+            file_types=["py"],
+            max_filesize=1000,
+        )
+    )
+
+    assert result == [
+        {
+            "path": "src/app.py",
+            "matches": [
+                {
+                    "line_number": 1,
+                    "snippet": "1: def load_config():",
+                    "patterns": ["load_config"],
+                },
+                {
+                    "line_number": 2,
+                    "snippet": "2:     return save_state()",
+                    "patterns": ["save_state"],
+                },
+            ],
+        }
+    ]
+
+
+def test_search_files_passes_patterns_and_filters_to_rg(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app.py").write_text("alpha beta\n", encoding="utf-8")
+    monkeypatch.setattr("llm_code.agent.shutil.which", lambda name: "/usr/bin/rg")
+
+    def fake_run(command: list[str], **kwargs) -> subprocess.CompletedProcess[str]:
+        assert command == [
+            "rg",
+            "-n",
+            "--json",
+            "--glob=*.py",
+            "--glob=!vendor/**",
+            "--type-add=llmpy:*.py",
+            "--type-add=llmpy:*.pyi",
+            "--type=llmpy",
+            "--max-filesize=100",
+            "-e",
+            "alpha",
+            "-e",
+            "beta",
+            "--",
+            ".",
+        ]
+        event = {
+            "type": "match",
+            "data": {
+                "path": {"text": "./app.py"},
+                "line_number": 1,
+                "lines": {"text": "alpha beta\n"},
+            },
+        }
+        return subprocess.CompletedProcess(
+            args=command, returncode=0, stdout=json.dumps(event) + "\n", stderr=""
+        )
+
+    monkeypatch.setattr("llm_code.agent.subprocess.run", fake_run)
+
+    result = asyncio.run(
+        _search_files(
+            ["alpha", "beta"],
+            context_lines=0,
+            include=["*.py"],
+            exclude=["vendor/**"],
+            file_types=["py"],
+            max_filesize=100,
+        )
+    )
+
+    assert result[0]["matches"][0]["patterns"] == ["alpha", "beta"]
+
+
+def test_search_files_rejects_unknown_file_types(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+
+    with pytest.raises(ValueError, match="Unknown file types"):
+        asyncio.run(_search_files("x", file_types=["cobol"]))
+
+
+def test_use_workspace_roots_tools_in_another_directory(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "hello.txt").write_text("hello\n", encoding="utf-8")
+
+    async def run_in_workspace() -> tuple[dict[str, str], str]:
+        with use_workspace(workspace):
+            read = await _read_files("hello.txt")
+            await _write_file("out.txt", "written")
+            bash = await _run_bash("pwd")
+        return read, bash["stdout"].strip()
+
+    read, pwd = asyncio.run(run_in_workspace())
+
+    assert read == {"hello.txt": "hello\n"}
+    assert (workspace / "out.txt").read_text(encoding="utf-8") == "written"
+    assert not (tmp_path / "out.txt").exists()
+    assert pwd == str(workspace.resolve())
+
+
+def test_delegate_runs_subtasks_in_child_agents(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("", encoding="utf-8")
+    (tmp_path / "b.py").write_text("", encoding="utf-8")
+    child_prompts: list[str] = []
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        if SUBAGENT_INSTRUCTIONS in (info.instructions or ""):
+            prompt = next(
+                part.content
+                for part in messages[0].parts
+                if isinstance(part, UserPromptPart) and isinstance(part.content, str)
+            )
+            child_prompts.append(prompt)
+            return ModelResponse(parts=[TextPart(f"done: {prompt.splitlines()[0]}")])
+
+        returns = [
+            part
+            for message in messages
+            if isinstance(message, ModelRequest)
+            for part in message.parts
+            if isinstance(part, ToolReturnPart)
+        ]
+        if returns:
+            return ModelResponse(parts=[TextPart("finished")])
+        tasks = [
+            {"instructions": "audit modules", "paths": ["*.py"]},
+            {"instructions": "audit docs", "token_budget": 1},
+        ]
+        return ModelResponse(parts=[ToolCallPart("delegate", {"tasks": tasks})])
+
+    agent = build_agent(FunctionModel(respond))
+    # The children's requests must not count against the parent's limit.
+    result = agent.run_sync(
+        "audit everything", usage_limits=UsageLimits(request_limit=2)
+    )
+
+    tool_return = next(
+        part
+        for message in result.all_messages()
+        if isinstance(message, ModelRequest)
+        for part in message.parts
+        if isinstance(part, ToolReturnPart)
+    )
+    modules, docs = json.loads(tool_return.model_response_str())
+    assert modules["status"] == "ok"
+    assert modules["summary"] == "done: audit modules"
+    assert docs["status"] == "budget_exceeded"
+    assert "a.py\nb.py" in child_prompts[0]
+    assert result.usage().requests == 2
+    assert result.usage().input_tokens > sum(
+        message.usage.input_tokens
+        for message in result.all_messages()
+        if isinstance(message, ModelResponse)
+    )
@@ -0,0 +1,189 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from pydantic_ai.exceptions import ModelAPIError
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from llm_code import batch
+from llm_code.agent import workspace_root
+from llm_code.batch import BatchItem, load_batch, load_progress, run_batch
+from llm_code.watcher import WorkspaceWatcher, workspace_watcher
+
+
+def _write_then_finish(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+    if len(messages) == 1:
+        prompt = messages[0].parts[-1]
+        assert isinstance(prompt, UserPromptPart)
+        return ModelResponse(
+            parts=[
+                ToolCallPart("write", {"path": "out.txt", "content": prompt.content}),
+            ]
+        )
+    return ModelResponse(parts=[TextPart("done")])
+
+
+def test_run_batch_uses_each_items_workspace(tmp_path: Path) -> None:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    items = [
+        BatchItem(id="a", prompt="alpha", cwd=tmp_path / "a"),
+        BatchItem(id="b", prompt="beta", cwd=tmp_path / "b"),
+    ]
+
+    results = asyncio.run(
+        run_batch(
+            items,
+            model=FunctionModel(_write_then_finish),
+            progress_path=tmp_path / "progress.jsonl",
+            concurrency=2,
+        )
+    )
+
+    assert sorted(result.status for result in results) == ["ok", "ok"]
+    assert (tmp_path / "a" / "out.txt").read_text(encoding="utf-8") == "alpha"
+    assert (tmp_path / "b" / "out.txt").read_text(encoding="utf-8") == "beta"
+
+
+def test_run_batch_stops_workspace_watchers_when_done(tmp_path: Path) -> None:
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    watchers: list[WorkspaceWatcher] = []
+
+    def find_then_finish(
+        messages: list[ModelMessage], _info: AgentInfo
+    ) -> ModelResponse:
+        if len(messages) == 1:
+            return ModelResponse(parts=[ToolCallPart("find_symbol", {"name": "x"})])
+        watchers.append(workspace_watcher(workspace_root()))
+        return ModelResponse(parts=[TextPart("done")])
+
+    items = [
+        BatchItem(id="a", prompt="alpha", cwd=tmp_path / "a"),
+        BatchItem(id="b", prompt="beta", cwd=tmp_path / "b"),
+    ]
+
+    asyncio.run(
+        run_batch(
+            items,
+            model=FunctionModel(find_then_finish),
+            progress_path=tmp_path / "progress.jsonl",
+            concurrency=2,
+        )
+    )
+
+    assert sorted(watcher.root.name for watcher in watchers) == ["a", "b"]
+    for watcher in watchers:
+        assert watcher._thread is not None
+        assert not watcher._thread.is_alive()
+
+
+def test_run_batch_skips_completed_items(tmp_path: Path) -> None:
+    progress_path = tmp_path / "progress.jsonl"
+    items = [BatchItem(id="a", prompt="alpha", cwd=tmp_path)]
+    model = FunctionModel(_write_then_finish)
+
+    asyncio.run(run_batch(items, model=model, progress_path=progress_path))
+    second = asyncio.run(run_batch(items, model=model, progress_path=progress_path))
+
+    assert second == []
+    assert load_progress(progress_path)["a"].status == "ok"
+
+
+def test_run_batch_records_failures_after_retries(tmp_path: Path) -> None:
+    async def slow(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(1)
+        return ModelResponse(parts=[TextPart("late")])
+
+    items = [BatchItem(id="slow", prompt="wait", cwd=tmp_path, timeout=0.01)]
+
+    (result,) = asyncio.run(
+        run_batch(
+            items,
+            model=FunctionModel(slow),
+            progress_path=tmp_path / "progress.jsonl",
+            retries=0,
+        )
+    )
+
+    assert result.status == "error"
+    assert result.error == "Timed out after 0.01s"
+
+
+def test_run_batch_retries_transient_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(batch.random, "uniform", lambda _low, _high: 0)
+    calls = 0
+
+    def flaky(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise ModelAPIError("flaky", "connection reset")
+        return ModelResponse(parts=[TextPart("done")])
+
+    items = [BatchItem(id="a", prompt="alpha", cwd=tmp_path)]
+
+    (result,) = asyncio.run(
+        run_batch(
+            items,
+            model=FunctionModel(flaky),
+            progress_path=tmp_path / "progress.jsonl",
+            retries=2,
+        )
+    )
+
+    assert result.status == "ok"
+    assert result.attempts == 2
+
+
+def test_run_batch_does_not_retry_other_errors(tmp_path: Path) -> None:
+    items = [BatchItem(id="a", prompt="alpha", cwd=tmp_path / "missing")]
+
+    (result,) = asyncio.run(
+        run_batch(
+            items,
+            model=FunctionModel(_write_then_finish),
+            progress_path=tmp_path / "progress.jsonl",
+            retries=2,
+        )
+    )
+
+    assert result.status == "error"
+    assert result.attempts == 1
+    assert result.error == f"Working directory does not exist: {tmp_path / 'missing'}"
+
+
+def test_load_batch_reads_jsonl(tmp_path: Path) -> None:
+    batch_file = tmp_path / "prompts.jsonl"
+    batch_file.write_text(
+        '{"id": "one", "prompt": "fix lint"}\n\n{"id": "two", "prompt": "add hints"}\n',
+        encoding="utf-8",
+    )
+
+    items = load_batch(batch_file)
+
+    assert [item.id for item in items] == ["one", "two"]
+
+
+def test_load_batch_resolves_cwd_against_the_batch_file(tmp_path: Path) -> None:
+    batch_file = tmp_path / "batches" / "prompts.jsonl"
+    batch_file.parent.mkdir()
+    batch_file.write_text(
+        '{"id": "one", "prompt": "p", "cwd": "repos/a"}\n'
+        f'{{"id": "two", "prompt": "p", "cwd": "{tmp_path}"}}\n',
+        encoding="utf-8",
+    )
+
+    one, two = load_batch(batch_file)
+
+    assert one.cwd == tmp_path / "batches" / "repos" / "a"
+    assert two.cwd == tmp_path
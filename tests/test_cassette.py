@@ -0,0 +1,67 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from llm_code.cassette import Cassette, RecordingModel, build_replay_model
+
+
+async def _live_stream(messages: list[ModelMessage], _info: AgentInfo):
+    if len(messages) == 1:
+        yield {0: DeltaToolCall(name="echo", json_args='{"text": "hi"}')}
+    else:
+        yield "Hello"
+        yield " world"
+
+
+def _build_agent(model) -> Agent:
+    agent = Agent(model)
+
+    @agent.tool_plain
+    def echo(text: str) -> str:
+        return text
+
+    return agent
+
+
+async def _stream_text(agent: Agent, prompt: str) -> str:
+    async with agent.run_stream(prompt) as result:
+        return "".join(
+            [chunk async for chunk in result.stream_text(delta=True, debounce_by=None)]
+        )
+
+
+def test_replay_reproduces_a_recorded_stream(tmp_path: Path) -> None:
+    cassette_path = tmp_path / "run.json"
+    recording = RecordingModel(
+        FunctionModel(stream_function=_live_stream), Cassette(cassette_path)
+    )
+
+    recorded = asyncio.run(_stream_text(_build_agent(recording), "go"))
+
+    replay = build_replay_model(Cassette.load(cassette_path), latency="zero")
+    replayed = asyncio.run(_stream_text(_build_agent(replay), "go"))
+
+    assert recorded == replayed == "Hello world"
+    assert len(Cassette.load(cassette_path).exchanges) == 2
+
+
+def test_replay_serves_non_streamed_responses(tmp_path: Path) -> None:
+    cassette = Cassette(tmp_path / "run.json")
+    cassette.append(ModelResponse(parts=[TextPart("done")]), [])
+
+    replay = build_replay_model(Cassette.load(cassette.path), latency="zero")
+    result = Agent(replay).run_sync("go")
+
+    assert result.output == "done"
+
+
+def test_replay_fails_when_cassette_is_exhausted(tmp_path: Path) -> None:
+    cassette = Cassette(tmp_path / "run.json")
+    replay = build_replay_model(cassette, latency="zero")
+
+    with pytest.raises(RuntimeError, match="no more recorded responses"):
+        Agent(replay).run_sync("go")
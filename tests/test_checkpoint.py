@@ -0,0 +1,151 @@
+import asyncio
+import io
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from rich.console import Console
+
+from llm_code.agent import use_workspace
+from llm_code.checkpoint import CLONE_METHODS, CheckpointStore, replace_file
+from llm_code.llm_code import run_prompt
+
+
+def _write_calls(*files: tuple[str, str]) -> FunctionModel:
+    """Return a model that writes ``files`` in one response and then answers."""
+
+    async def stream(messages: list[ModelMessage], _info: AgentInfo):
+        if len(messages) == 1 and files:
+            for index, (path, content) in enumerate(files):
+                yield {
+                    index: DeltaToolCall(
+                        name="write",
+                        json_args=json.dumps({"path": path, "content": content}),
+                    )
+                }
+        else:
+            yield "Done."
+
+    return FunctionModel(stream_function=stream)
+
+
+def _run(workspace: Path, model: FunctionModel, store: CheckpointStore) -> str:
+    output = io.StringIO()
+
+    async def run() -> None:
+        with use_workspace(workspace):
+            await run_prompt(
+                "edit", model=model, console=Console(file=output), checkpoints=store
+            )
+
+    asyncio.run(run())
+    return output.getvalue()
+
+
+def test_undo_restores_edited_files_and_removes_created_ones(tmp_path: Path) -> None:
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("x = 1\n", encoding="utf-8")
+    (workspace / "a.py").chmod(0o755)
+    store = CheckpointStore(tmp_path / "checkpoints")
+    model = _write_calls(("a.py", "x = 2\n"), ("pkg/b.py", "y = 1\n"))
+
+    _run(workspace, model, store)
+
+    assert (workspace / "a.py").read_text(encoding="utf-8") == "x = 2\n"
+    assert (workspace / "a.py").stat().st_mode & 0o777 == 0o755
+    [run] = store.runs(workspace)
+    assert run.files == 2
+    assert run.prompt == "edit"
+
+    result = store.undo(workspace)
+
+    assert result.restored == ["a.py"]
+    assert result.removed == ["pkg/b.py"]
+    assert (workspace / "a.py").read_text(encoding="utf-8") == "x = 1\n"
+    assert not (workspace / "pkg" / "b.py").exists()
+    assert store.runs(workspace)[0].undone
+    with pytest.raises(ValueError, match="No runs to undo"):
+        store.undo(workspace)
+    with pytest.raises(ValueError, match="already undone"):
+        store.undo(workspace, run.id[:8])
+
+
+def test_runs_without_edits_are_not_recorded(tmp_path: Path) -> None:
+    store = CheckpointStore(tmp_path / "checkpoints")
+
+    _run(tmp_path, _write_calls(), store)
+
+    assert store.runs(tmp_path) == []
+
+
+def test_pre_images_are_deduplicated_and_pruned_with_old_runs(tmp_path: Path) -> None:
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    store = CheckpointStore(tmp_path / "checkpoints", keep_runs=2)
+    objects = tmp_path / "checkpoints" / "objects"
+
+    for content in ("same\n", "same\n", "other\n"):
+        (workspace / "a.py").write_text("same\n", encoding="utf-8")
+        (workspace / "b.py").write_text(content, encoding="utf-8")
+        _run(workspace, _write_calls(("a.py", "new\n"), ("b.py", "new\n")), store)
+
+    assert len(store.runs(workspace)) == 2
+    assert sorted(path.read_bytes() for path in objects.glob("*/*")) == [
+        b"other\n",
+        b"same\n",
+    ]
+
+
+def test_snapshot_undoes_changes_made_outside_the_tools(tmp_path: Path) -> None:
+    workspace = tmp_path / "workspace"
+    (workspace / "src").mkdir(parents=True)
+    (workspace / "src" / "a.py").write_text("a = 1\n", encoding="utf-8")
+    (workspace / "src" / "b.py").write_text("b = 1\n", encoding="utf-8")
+    store = CheckpointStore(tmp_path / "checkpoints", snapshot=True)
+
+    checkpoint = store.begin(workspace, "refactor")
+    replace_file(workspace / "src" / "a.py", "a = 2\n")
+    (workspace / "src" / "b.py").unlink()
+    (workspace / "c.py").write_text("c = 1\n", encoding="utf-8")
+
+    assert checkpoint.snapshot in CLONE_METHODS
+    assert store.runs(workspace)[0].snapshot == checkpoint.snapshot
+    snapshot = tmp_path / "checkpoints" / "snapshots" / checkpoint.id
+    assert (snapshot / "src" / "a.py").read_text(encoding="utf-8") == "a = 1\n"
+
+    result = store.undo(workspace)
+
+    assert result.restored == ["src/a.py", "src/b.py"]
+    assert result.left == ["c.py"]
+    assert (workspace / "src" / "a.py").read_text(encoding="utf-8") == "a = 1\n"
+    assert (workspace / "src" / "b.py").read_text(encoding="utf-8") == "b = 1\n"
+
+
+def test_snapshot_is_not_changed_by_in_place_edits(tmp_path: Path) -> None:
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("a = 1\n", encoding="utf-8")
+    store = CheckpointStore(tmp_path / "checkpoints", snapshot=True)
+
+    store.begin(workspace, "edit in place")
+    with (workspace / "a.py").open("r+", encoding="utf-8") as file:
+        file.write("a = 2\n")
+
+    assert store.undo(workspace).restored == ["a.py"]
+    assert (workspace / "a.py").read_text(encoding="utf-8") == "a = 1\n"
+
+
+def test_undo_recreates_deleted_directories(tmp_path: Path) -> None:
+    workspace = tmp_path / "workspace"
+    (workspace / "pkg").mkdir(parents=True)
+    (workspace / "pkg" / "a.py").write_text("x = 1\n", encoding="utf-8")
+    store = CheckpointStore(tmp_path / "checkpoints")
+    _run(workspace, _write_calls(("pkg/a.py", "x = 2\n")), store)
+    shutil.rmtree(workspace / "pkg")
+
+    assert store.undo(workspace).restored == ["pkg/a.py"]
+    assert (workspace / "pkg" / "a.py").read_text(encoding="utf-8") == "x = 1\n"
@@ -0,0 +1,89 @@
+import asyncio
+import re
+from pathlib import Path
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelResponse,
+    ToolCallPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from llm_code.codemod import (
+    build_codemod_agent,
+    run_codemod,
+    shard_files,
+    summarize_codemod,
+)
+
+FILE_PATTERN = re.compile(r"<file path='([^']+)'>\n(.*?)</file>", re.DOTALL)
+
+
+def _edit_model(edit=lambda path, content: content + "# edited\n") -> FunctionModel:
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        prompt = messages[0].parts[-1]
+        assert isinstance(prompt, UserPromptPart)
+        assert isinstance(prompt.content, str)
+        edits = [
+            {"path": path, "content": edit(path, content)}
+            for path, content in FILE_PATTERN.findall(prompt.content)
+        ]
+        return ModelResponse(
+            parts=[ToolCallPart(info.output_tools[0].name, {"response": edits})]
+        )
+
+    return FunctionModel(respond)
+
+
+def test_shard_files_splits_in_order() -> None:
+    files = [Path(f"{index}.py") for index in range(5)]
+
+    assert shard_files(files, 2) == [files[0:2], files[2:4], files[4:]]
+
+
+def test_codemod_read_tool_only_takes_a_path() -> None:
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        [read] = [tool for tool in info.function_tools if tool.name == "read"]
+        assert list(read.parameters_json_schema["properties"]) == ["path"]
+        return ModelResponse(
+            parts=[ToolCallPart(info.output_tools[0].name, {"response": []})]
+        )
+
+    agent = build_codemod_agent(FunctionModel(respond))
+
+    assert asyncio.run(agent.run("change nothing")).output == []
+
+
+def test_run_codemod_applies_edits_per_file(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "src").mkdir()
+    (tmp_path / "src" / "a.py").write_text("a = 1\n", encoding="utf-8")
+    (tmp_path / "src" / "b.py").write_text("b = 2\n", encoding="utf-8")
+    (tmp_path / "src" / "notes.txt").write_text("skip\n", encoding="utf-8")
+
+    results = asyncio.run(run_codemod("mark", "src/*.py", model=_edit_model()))
+
+    assert sorted(result.path for result in results) == ["src/a.py", "src/b.py"]
+    assert {result.shard for result in results} == {0, 1}
+    assert summarize_codemod(results)["changed"] == 2
+    assert (tmp_path / "src" / "a.py").read_text(encoding="utf-8") == (
+        "a = 1\n# edited\n"
+    )
+    assert (tmp_path / "src" / "notes.txt").read_text(encoding="utf-8") == "skip\n"
+
+
+def test_run_codemod_reports_conflicts(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("a = 1\n", encoding="utf-8")
+
+    def edit(path: str, content: str) -> str:
+        (tmp_path / path).write_text("changed meanwhile\n", encoding="utf-8")
+        return content + "# edited\n"
+
+    results = asyncio.run(run_codemod("mark", "a.py", model=_edit_model(edit)))
+
+    assert [(result.path, result.status) for result in results] == [
+        ("a.py", "conflict")
+    ]
+    assert (tmp_path / "a.py").read_text(encoding="utf-8") == "changed meanwhile\n"
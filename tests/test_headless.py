@@ -0,0 +1,111 @@
+import asyncio
+import io
+import json
+from pathlib import Path
+
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+from llm_code.headless import NdjsonWriter, run_prompt_ndjson
+from llm_code.limits import RunLimits
+from llm_code.usage import UsageLedger
+
+
+async def _stream(messages: list[ModelMessage], _info: AgentInfo):
+    if len(messages) == 1:
+        yield {0: DeltaToolCall(name="bash", json_args='{"command": "printf hi"}')}
+    else:
+        yield "Hello"
+        yield " world"
+
+
+def test_run_prompt_ndjson_emits_one_event_per_line() -> None:
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream)
+
+    succeeded = asyncio.run(
+        run_prompt_ndjson(
+            "go", model=FunctionModel(stream_function=_stream), writer=writer
+        )
+    )
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert succeeded is True
+    assert [event["type"] for event in events] == [
+        "start",
+        "tool_call",
+        "tool_result",
+        "text",
+        "text",
+        "usage",
+        "end",
+    ]
+    assert events[1]["args"] == {"command": "printf hi"}
+    assert events[2]["content"]["stdout"] == "hi"
+    assert events[2]["elapsed"] >= 0
+    assert "".join(event["delta"] for event in events if event["type"] == "text") == (
+        "Hello world"
+    )
+    assert events[-1]["status"] == "ok"
+
+
+def test_ndjson_writer_batches_until_flush() -> None:
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream, max_events=10, max_delay=60)
+
+    writer.emit("text", delta="a")
+    writer.emit("text", delta="b")
+    assert stream.getvalue() == ""
+
+    writer.flush()
+    assert stream.getvalue() == (
+        '{"type":"text","delta":"a"}\n{"type":"text","delta":"b"}\n'
+    )
+
+
+def test_ndjson_writer_flushes_tool_events_immediately() -> None:
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream, max_events=10, max_delay=60)
+
+    writer.emit("text", delta="a")
+    writer.emit("tool_call", tool_name="bash")
+
+    assert [json.loads(line)["type"] for line in stream.getvalue().splitlines()] == [
+        "text",
+        "tool_call",
+    ]
+
+
+def test_ndjson_writer_flushes_text_from_a_timer() -> None:
+    stream = io.StringIO()
+    writer = NdjsonWriter(stream, max_events=10, max_delay=0.01)
+
+    async def run() -> None:
+        writer.emit("text", delta="a")
+        await asyncio.sleep(0.05)
+
+    asyncio.run(run())
+
+    assert stream.getvalue() == '{"type":"text","delta":"a"}\n'
+
+
+def test_run_prompt_ndjson_records_runs_stopped_by_a_limit(tmp_path: Path) -> None:
+    stream = io.StringIO()
+    ledger = UsageLedger(tmp_path / "usage.db")
+
+    succeeded = asyncio.run(
+        run_prompt_ndjson(
+            "go",
+            model=FunctionModel(stream_function=_stream),
+            writer=NdjsonWriter(stream),
+            limits=RunLimits(requests=1),
+            ledger=ledger,
+        )
+    )
+
+    events = [json.loads(line) for line in stream.getvalue().splitlines()]
+    assert succeeded is False
+    assert events[-1]["status"] == "limit"
+    [row] = ledger.summarize(group_by=["model"])
+    assert row["runs"] == 1
+    assert row["requests"] == 1
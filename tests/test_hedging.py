@@ -0,0 +1,77 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import FallbackExceptionGroup, ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from llm_code.hedging import HedgedModel
+
+
+def _stream_model(text: str, *, delay: float = 0.0) -> FunctionModel:
+    async def stream(_messages: list[ModelMessage], _info: AgentInfo):
+        await asyncio.sleep(delay)
+        yield text
+
+    async def respond(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(delay)
+        return ModelResponse(parts=[TextPart(text)])
+
+    return FunctionModel(respond, stream_function=stream, model_name=text)
+
+
+def _failing_model() -> FunctionModel:
+    def fail(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        raise ModelHTTPError(status_code=503, model_name="down")
+
+    return FunctionModel(fail, model_name="down")
+
+
+async def _stream_text(agent: Agent) -> str:
+    async with agent.run_stream("go") as result:
+        return await result.get_output()
+
+
+def test_hedged_model_uses_backup_when_primary_is_slow() -> None:
+    model = HedgedModel(
+        _stream_model("primary", delay=1.0),
+        _stream_model("backup"),
+        hedge_after=0.01,
+    )
+
+    output = asyncio.run(_stream_text(Agent(model)))
+
+    assert output == "backup"
+    assert model.latency.hedges == 1
+    assert model.latency.hedge_wins == 1
+    assert model.latency.percentiles("backup")["p50"] < 0.5
+
+
+def test_hedged_model_keeps_fast_primary() -> None:
+    model = HedgedModel(
+        _stream_model("primary"),
+        _stream_model("backup"),
+        hedge_after=0.5,
+    )
+
+    output = asyncio.run(_stream_text(Agent(model)))
+
+    assert output == "primary"
+    assert model.latency.hedges == 0
+
+
+def test_hedged_model_fails_over_on_errors() -> None:
+    model = HedgedModel(_failing_model(), _stream_model("backup"))
+
+    result = Agent(model).run_sync("go")
+
+    assert result.output == "backup"
+    assert model.latency.failovers == 1
+
+
+def test_hedged_model_raises_when_both_fail() -> None:
+    model = HedgedModel(_failing_model(), _failing_model())
+
+    with pytest.raises(FallbackExceptionGroup):
+        Agent(model).run_sync("go")
@@ -0,0 +1,132 @@
+import asyncio
+import io
+import json
+from pathlib import Path
+
+import pytest
+from pydantic_ai import RunContext
+from pydantic_ai.exceptions import UsageLimitExceeded
+from pydantic_ai.messages import ModelMessage, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.tools import ToolDefinition
+from pydantic_ai.usage import RunUsage
+from rich.console import Console
+
+from llm_code.agent import build_agent, use_workspace
+from llm_code.headless import NdjsonWriter, run_prompt_ndjson
+from llm_code.limits import LoopGuard, RunLimits, run_deadline
+from llm_code.llm_code import run_prompt
+from llm_code.settings import Settings
+
+
+async def _read_forever(messages: list[ModelMessage], _info: AgentInfo):
+    yield {len(messages): DeltaToolCall(name="read", json_args='{"path": "a.py"}')}
+
+
+def test_run_limits_come_from_settings() -> None:
+    limits = RunLimits.from_settings(
+        Settings(max_requests=0, max_tool_calls=7, max_repeated_calls=5)
+    )
+
+    usage_limits = limits.usage_limits()
+
+    assert limits.repeated_calls == 5
+    assert usage_limits.request_limit is None
+    assert usage_limits.tool_calls_limit == 7
+    assert usage_limits.total_tokens_limit is None
+
+
+def test_loop_guard_stops_repeated_identical_calls(tmp_path: Path) -> None:
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    agent = build_agent(
+        FunctionModel(stream_function=_read_forever), max_repeated_calls=3
+    )
+
+    async def run() -> None:
+        with use_workspace(tmp_path):
+            async with agent.run_stream("go") as result:
+                await result.get_output()
+
+    with pytest.raises(UsageLimitExceeded, match="read was called 3 times"):
+        asyncio.run(run())
+
+
+def _after_read(guard: LoopGuard, path: str, result: str) -> None:
+    ctx = RunContext(deps=None, model=TestModel(), usage=RunUsage())
+    args = {"path": path}
+    asyncio.run(
+        guard.after_tool_execute(
+            ctx,
+            call=ToolCallPart("read", args),
+            tool_def=ToolDefinition(name="read"),
+            args=args,
+            result=result,
+        )
+    )
+
+
+def test_loop_guard_resets_when_the_result_changes() -> None:
+    guard = LoopGuard(2)
+
+    _after_read(guard, "a.py", "x = 1")
+    _after_read(guard, "a.py", "x = 2")
+    with pytest.raises(UsageLimitExceeded):
+        _after_read(guard, "a.py", "x = 2")
+
+
+def test_loop_guard_only_counts_consecutive_calls() -> None:
+    guard = LoopGuard(2)
+
+    for _ in range(3):
+        _after_read(guard, "a.py", "x = 1")
+        _after_read(guard, "b.py", "y = 1")
+
+
+def test_run_deadline_raises_a_usage_limit() -> None:
+    async def run() -> None:
+        async with run_deadline(0.01):
+            await asyncio.sleep(1)
+
+    with pytest.raises(UsageLimitExceeded, match="time limit of 0.01s"):
+        asyncio.run(run())
+
+
+def test_run_prompt_reports_why_a_run_stopped(
+    tmp_path: Path, capsys: pytest.CaptureFixture[str]
+) -> None:
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    output = io.StringIO()
+
+    async def run() -> None:
+        with use_workspace(tmp_path):
+            await run_prompt(
+                "go",
+                model=FunctionModel(stream_function=_read_forever),
+                console=Console(file=output),
+                limits=RunLimits(tool_calls=1, repeated_calls=0),
+            )
+
+    asyncio.run(run())
+
+    assert output.getvalue() == "\n"
+    assert "Stopped early" in capsys.readouterr().err
+
+
+def test_ndjson_run_ends_with_limit_status(tmp_path: Path) -> None:
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    stream = io.StringIO()
+
+    async def run() -> bool:
+        with use_workspace(tmp_path):
+            return await run_prompt_ndjson(
+                "go",
+                model=FunctionModel(stream_function=_read_forever),
+                writer=NdjsonWriter(stream),
+                limits=RunLimits(requests=2, repeated_calls=0),
+            )
+
+    assert asyncio.run(run()) is False
+    end = json.loads(stream.getvalue().splitlines()[-1])
+    assert end["status"] == "limit"
+    assert "request_limit" in end["error"]
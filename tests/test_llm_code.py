@@ -1,10 +1,14 @@
 import json
-from types import SimpleNamespace
+import tracemalloc
+from pathlib import Path
 
 from click.testing import CliRunner
 from pydantic_ai.messages import FunctionToolCallEvent, ToolCallPart
 
+from llm_code.checkpoint import CheckpointStore
 from llm_code.llm_code import _format_tool_call_status, _tool_args_as_dict, main
+from llm_code.memory import MemoryProfiler
+from llm_code.settings import Settings
 
 
 def test_tool_args_as_dict_returns_dict_input() -> None:
@@ -79,16 +83,39 @@ def test_format_tool_call_status_for_bash_is_human_friendly() -> None:
     assert result == "[yellow]Bash[/yellow] uv run pytest"
 
 
-def test_main_runs_prompt_when_prompt_is_given(monkeypatch) -> None:
+def test_main_runs_prompt_when_prompt_is_given(tmp_path: Path, monkeypatch) -> None:
     monkeypatch.setattr(
         "llm_code.llm_code.Settings.load",
-        lambda: SimpleNamespace(model="test-model", api_key=None),
+        lambda: Settings(
+            model="test-model",
+            usage_db=tmp_path / "usage.db",
+            checkpoint_dir=tmp_path / "checkpoints",
+        ),
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_providers", lambda settings, **kwargs: {}
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_models",
+        lambda providers, **kwargs: {"test-model": "test-model"},
     )
 
     called: dict[str, str] = {}
 
     async def fake_run_prompt(
-        prompt: str, *, console, model: str, api_key: str | None = None
+        prompt: str,
+        *,
+        console,
+        model: str,
+        ledger=None,
+        session_id=None,
+        repo_map_tokens=0,
+        prefetch_budget_mb=0,
+        spill_chars=0,
+        response_cache=None,
+        limits=None,
+        profiler=None,
+        checkpoints=None,
     ) -> None:
         called["prompt"] = prompt
         called["model"] = model
@@ -106,15 +133,37 @@ def test_main_runs_prompt_when_prompt_is_given(monkeypatch) -> None:
     }
 
 
-def test_main_launches_tui_when_no_prompt_is_given(monkeypatch) -> None:
+def test_main_launches_tui_when_no_prompt_is_given(tmp_path: Path, monkeypatch) -> None:
     monkeypatch.setattr(
         "llm_code.llm_code.Settings.load",
-        lambda: SimpleNamespace(model="test-model", api_key=None),
+        lambda: Settings(
+            model="test-model",
+            usage_db=tmp_path / "usage.db",
+            checkpoint_dir=tmp_path / "checkpoints",
+        ),
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_providers", lambda settings, **kwargs: {}
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_models",
+        lambda providers, **kwargs: {"test-model": "test-model"},
     )
 
     called: dict[str, str] = {}
 
-    def fake_launch_tui(*, model: str, api_key: str | None = None) -> None:
+    def fake_launch_tui(
+        *,
+        model: str,
+        ledger=None,
+        session_id=None,
+        repo_map_tokens=0,
+        prefetch_budget_mb=0,
+        spill_chars=0,
+        limits=None,
+        profiler=None,
+        checkpoints=None,
+    ) -> None:
         called["model"] = model
 
     monkeypatch.setattr("llm_code.llm_code.launch_tui", fake_launch_tui)
@@ -123,3 +172,155 @@ def test_main_launches_tui_when_no_prompt_is_given(monkeypatch) -> None:
 
     assert result.exit_code == 0
     assert called == {"model": "test-model"}
+
+
+def test_main_routes_usage_subcommand(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(
+        "llm_code.llm_code.Settings.load",
+        lambda: Settings(model="test-model", usage_db=tmp_path / "usage.db"),
+    )
+
+    result = CliRunner().invoke(main, ["usage", "--by", "model"])
+
+    assert result.exit_code == 0
+    assert "Model" in result.output
+
+
+def test_main_runs_prompts_starting_with_a_subcommand_name(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(
+        "llm_code.llm_code.Settings.load",
+        lambda: Settings(
+            model="test-model",
+            usage_db=tmp_path / "usage.db",
+            checkpoint_dir=tmp_path / "checkpoints",
+        ),
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_providers", lambda settings, **kwargs: {}
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_models",
+        lambda providers, **kwargs: {"test-model": "test-model"},
+    )
+    prompts: list[str] = []
+
+    async def fake_run_prompt(prompt: str, **kwargs) -> None:
+        prompts.append(prompt)
+
+    monkeypatch.setattr("llm_code.llm_code.run_prompt", fake_run_prompt)
+
+    for args in (
+        ["usage", "of", "foo", "in", "bar.py"],
+        ["map", "the", "callers"],
+        ["undo", "the", "last", "change"],
+    ):
+        result = CliRunner().invoke(main, args)
+        assert result.exit_code == 0, result.output
+
+    assert prompts == [
+        "usage of foo in bar.py",
+        "map the callers",
+        "undo the last change",
+    ]
+
+
+def test_main_applies_effort_and_max_tokens_overrides(
+    tmp_path: Path, monkeypatch
+) -> None:
+    monkeypatch.setattr(
+        "llm_code.llm_code.Settings.load",
+        lambda: Settings(
+            model="test-model",
+            usage_db=tmp_path / "usage.db",
+            checkpoint_dir=tmp_path / "checkpoints",
+        ),
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_providers", lambda settings, **kwargs: {}
+    )
+    profiles = {}
+
+    def fake_build_models(providers, **kwargs):
+        profiles.update(kwargs["profiles"])
+        return {"test-model": "test-model"}
+
+    async def fake_run_prompt(prompt: str, **kwargs) -> None:
+        pass
+
+    monkeypatch.setattr("llm_code.llm_code.build_models", fake_build_models)
+    monkeypatch.setattr("llm_code.llm_code.run_prompt", fake_run_prompt)
+
+    result = CliRunner().invoke(
+        main, ["--effort", "high", "--max-tokens", "300", "hello"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert profiles["test-model"].model_settings() == {
+        "thinking": "high",
+        "max_tokens": 300,
+    }
+
+
+def test_main_reports_memory_with_memprofile(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.setattr(
+        "llm_code.llm_code.Settings.load",
+        lambda: Settings(
+            model="test-model",
+            usage_db=tmp_path / "usage.db",
+            checkpoint_dir=tmp_path / "checkpoints",
+        ),
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_providers", lambda settings, **kwargs: {}
+    )
+    monkeypatch.setattr(
+        "llm_code.llm_code.build_models",
+        lambda providers, **kwargs: {"test-model": "test-model"},
+    )
+    profilers = []
+
+    async def fake_run_prompt(
+        prompt: str, *, profiler: MemoryProfiler, **kwargs
+    ) -> None:
+        profilers.append(profiler)
+        profiler.snapshot("prompt")
+
+    monkeypatch.setattr("llm_code.llm_code.run_prompt", fake_run_prompt)
+
+    try:
+        result = CliRunner().invoke(main, ["--memprofile", "hello"])
+    finally:
+        tracemalloc.stop()
+
+    assert result.exit_code == 0, result.output
+    assert len(profilers[0].reports) == 1
+    assert "prompt: traced" in result.output
+    assert "top allocators:" in result.output
+
+
+def test_undo_subcommand_lists_and_undoes_runs(tmp_path: Path, monkeypatch) -> None:
+    store_path = tmp_path / "checkpoints"
+    monkeypatch.setattr(
+        "llm_code.llm_code.Settings.load",
+        lambda: Settings(checkpoint_dir=store_path),
+    )
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    checkpoint = CheckpointStore(store_path).begin(tmp_path.resolve(), "change a")
+    checkpoint.save("a.py")
+    (tmp_path / "a.py").write_text("x = 2\n", encoding="utf-8")
+
+    listed = CliRunner().invoke(main, ["undo", "--list"])
+    undone = CliRunner().invoke(main, ["undo", "--run", checkpoint.id[:12]])
+    again = CliRunner().invoke(main, ["undo"])
+
+    assert listed.exit_code == 0
+    assert checkpoint.id[:12] in listed.output
+    assert "change a" in listed.output
+    assert undone.exit_code == 0
+    assert "restored a.py" in undone.output
+    assert (tmp_path / "a.py").read_text(encoding="utf-8") == "x = 1\n"
+    assert again.exit_code == 1
+    assert "No runs to undo" in again.output
@@ -0,0 +1,161 @@
+import asyncio
+import tracemalloc
+from pathlib import Path
+
+import pytest
+from pydantic_ai import RunContext
+from pydantic_ai.messages import (
+    ModelRequest,
+    ModelResponse,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models import ModelRequestContext, ModelRequestParameters
+from pydantic_ai.models.test import TestModel
+from pydantic_ai.usage import RunUsage
+
+from llm_code.limits import RunLimits
+from llm_code.memory import (
+    COMPACTED_TOOL_RESULT,
+    MIB,
+    MemoryCeiling,
+    MemoryGuard,
+    MemoryProfiler,
+    categorize,
+    compact_history,
+)
+from llm_code.prefetch import ReadCache
+from llm_code.settings import Settings
+
+
+def _history(turns: int) -> list:
+    messages: list = [ModelRequest(parts=[UserPromptPart("go")])]
+    for index in range(turns):
+        messages.append(
+            ModelResponse(parts=[ToolCallPart("read", {"path": "a.py"}, f"c{index}")])
+        )
+        messages.append(
+            ModelRequest(parts=[ToolReturnPart("read", "x" * 1000, f"c{index}")])
+        )
+    return messages
+
+
+def test_categorize_uses_the_innermost_known_frame() -> None:
+    traceback = tracemalloc.Traceback(
+        (
+            ("/usr/lib/python3/json/decoder.py", 3),
+            ("/site-packages/llm_code/agent.py", 10),
+            ("/site-packages/pydantic_ai/_agent_graph.py", 5),
+            ("/site-packages/textual/app.py", 1),
+        )
+    )
+
+    assert categorize(traceback) == "tool buffers"
+    assert categorize(tracemalloc.Traceback((("/app/main.py", 1),))) == "other"
+
+
+def test_profiler_reports_growth_between_turns() -> None:
+    profiler = MemoryProfiler(top=5)
+    profiler.start()
+    try:
+        profiler.snapshot("turn 1")
+        retained = [str(index) * 100 for index in range(20_000)]
+        report = profiler.snapshot("turn 2")
+    finally:
+        profiler.stop()
+
+    assert retained
+    assert report.traced > 2 * MIB
+    assert sum(report.categories.values()) > 2 * MIB
+    assert any("test_memory.py" in where for where, _size in report.growth)
+    lines = profiler.summary_lines()
+    assert lines[0].startswith("turn 1: traced")
+    assert "  grew since the previous turn:" in lines
+
+
+def test_compact_history_keeps_the_latest_tool_results() -> None:
+    messages = _history(3)
+
+    assert compact_history(messages, keep=2) == 1
+    assert compact_history(messages, keep=2) == 0
+
+    contents = [
+        part.content
+        for message in messages
+        for part in message.parts
+        if isinstance(part, ToolReturnPart)
+    ]
+    assert contents == [COMPACTED_TOOL_RESULT, "x" * 1000, "x" * 1000]
+
+
+def _before_request(guard: MemoryGuard, messages: list) -> None:
+    asyncio.run(
+        guard.before_model_request(
+            RunContext(deps=None, model=TestModel(), usage=RunUsage()),
+            ModelRequestContext(messages, None, ModelRequestParameters()),
+        )
+    )
+
+
+def test_memory_guard_relieves_memory_over_the_ceiling(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    cache = ReadCache(tmp_path, budget=1024)
+    cache.read("a.py")
+    monkeypatch.setattr("llm_code.memory.read_caches", lambda: [cache])
+    monkeypatch.setattr("llm_code.memory.resident_memory", lambda: 2 * MIB)
+    ceiling = MemoryCeiling(MIB)
+    messages = _history(4)
+
+    _before_request(MemoryGuard(ceiling), messages)
+
+    assert ceiling.relieved == 1
+    cache.read("a.py")
+    assert cache.stats.hits == 0
+    assert compact_history(messages) == 0
+
+
+def test_memory_guard_leaves_history_alone_under_the_ceiling(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    monkeypatch.setattr("llm_code.memory.resident_memory", lambda: MIB)
+    ceiling = MemoryCeiling(2 * MIB)
+    messages = _history(4)
+
+    _before_request(MemoryGuard(ceiling), messages)
+
+    assert ceiling.relieved == 0
+    assert compact_history(messages) == 2
+
+
+def test_memory_guard_relieves_once_per_threshold_crossing(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    resident = 2 * MIB
+    monkeypatch.setattr("llm_code.memory.resident_memory", lambda: resident)
+    monkeypatch.setattr("llm_code.memory.read_caches", lambda: [])
+    ceiling = MemoryCeiling(MIB)
+    guard = MemoryGuard(ceiling)
+
+    _before_request(guard, _history(4))
+    _before_request(guard, _history(4))
+    assert ceiling.relieved == 1
+
+    resident = 2 * MIB + MIB // 5
+    _before_request(guard, _history(4))
+    assert ceiling.relieved == 2
+
+    resident = MIB // 2
+    _before_request(guard, _history(4))
+    resident = 2 * MIB
+    _before_request(guard, _history(4))
+    assert ceiling.relieved == 3
+
+
+def test_memory_ceiling_comes_from_settings() -> None:
+    limits = RunLimits.from_settings(Settings(memory_limit_mb=512))
+
+    assert limits.memory_ceiling() == MemoryCeiling(512 * MIB)
+    assert RunLimits().memory_ceiling() is None
@@ -0,0 +1,150 @@
+import asyncio
+import time
+
+import httpx
+from anthropic import AsyncAnthropic
+from pydantic_ai import Agent
+from pydantic_ai.models.openai import OpenAIResponsesModel
+from pydantic_ai.providers.openai import OpenAIProvider
+
+from llm_code.mock_provider import MockConfig, MockProviderServer, ToolCall, Turn
+from llm_code.models import build_models
+from llm_code.providers import build_providers, provider_configs
+from llm_code.scheduler import build_schedulers
+from llm_code.settings import ProviderConfig, Settings
+
+LOOKUP_SCRIPT = (
+    Turn(tool_calls=(ToolCall("lookup", {"key": "answer"}),)),
+    Turn(text="The answer is 42."),
+)
+
+
+def _agent(model) -> Agent:
+    agent = Agent(model)
+
+    @agent.tool_plain
+    def lookup(key: str) -> str:
+        return f"{key} = 42"
+
+    return agent
+
+
+def test_mock_config_loads_scripts_from_json_data() -> None:
+    config = MockConfig.from_dict(
+        {
+            "ttft": 0.5,
+            "script": [
+                {"tool_calls": [{"name": "read", "arguments": {"path": "a.py"}}]},
+                {"text": "done"},
+            ],
+            "error_statuses": [429],
+        }
+    )
+
+    assert config.ttft == 0.5
+    assert config.script[0].tool_calls == (ToolCall("read", {"path": "a.py"}),)
+    assert config.script[1] == Turn(text="done")
+    assert config.error_statuses == (429,)
+
+
+def test_openai_stream_runs_a_tool_call_script_over_one_connection() -> None:
+    async def run() -> tuple[str, MockProviderServer]:
+        async with MockProviderServer(MockConfig(script=LOOKUP_SCRIPT)) as server:
+            model = OpenAIResponsesModel(
+                "mock-model",
+                provider=OpenAIProvider(base_url=server.base_url, api_key="test"),
+            )
+            async with _agent(model).run_stream("what is the answer?") as result:
+                output = await result.get_output()
+        return output, server
+
+    output, server = asyncio.run(run())
+
+    assert output == "The answer is 42."
+    assert server.stats.streams == 2
+    assert server.stats.connections == 1
+
+
+def test_anthropic_stream_parses_with_the_sdk() -> None:
+    async def run() -> tuple[list, list]:
+        async with MockProviderServer(MockConfig(script=LOOKUP_SCRIPT)) as server:
+            client = AsyncAnthropic(base_url=server.base_url, api_key="test")
+            async with client.messages.stream(
+                model="mock-model",
+                max_tokens=100,
+                messages=[{"role": "user", "content": "what is the answer?"}],
+            ) as stream:
+                first = await stream.get_final_message()
+            second = await client.messages.create(
+                model="mock-model",
+                max_tokens=100,
+                messages=[
+                    {"role": "user", "content": "what is the answer?"},
+                    {"role": "assistant", "content": "Looking."},
+                    {"role": "user", "content": "answer = 42"},
+                ],
+            )
+        return first.content, second.content
+
+    first, second = asyncio.run(run())
+
+    assert first[0].type == "tool_use"
+    assert first[0].input == {"key": "answer"}
+    assert second[0].text == "The answer is 42."
+
+
+def test_injected_errors_are_retried_by_the_scheduler() -> None:
+    config = MockConfig(fail_first=1, error_statuses=(429,), script=LOOKUP_SCRIPT)
+
+    async def run() -> tuple[str, dict]:
+        async with MockProviderServer(config) as server:
+            settings = Settings(
+                providers={
+                    "mock": ProviderConfig(
+                        type="openai",
+                        base_url=server.base_url,
+                        models=["mock-model"],
+                    )
+                }
+            )
+            schedulers = build_schedulers(settings)
+            schedulers["mock"].backoff_base = 0.01
+            models = build_models(
+                build_providers(settings, schedulers=schedulers),
+                schedulers=schedulers,
+                configs=provider_configs(settings),
+            )
+            result = await _agent(models["mock:mock-model"]).run("answer?")
+        return result.output, schedulers["mock"].metrics.summary()
+
+    output, metrics = asyncio.run(run())
+
+    assert output == "The answer is 42."
+    assert metrics["retries"] == 1
+    assert metrics["rate_limited"] == 1
+
+
+def test_responses_are_paced_by_ttft_and_token_rate() -> None:
+    config = MockConfig(
+        ttft=0.1, tokens_per_second=50, script=(Turn(text="one two three four five"),)
+    )
+
+    async def run() -> tuple[float, dict]:
+        async with MockProviderServer(config) as server:
+            async with httpx.AsyncClient(base_url=server.base_url) as client:
+                started = time.perf_counter()
+                response = await client.post(
+                    "/responses", json={"model": "mock-model", "input": "hi"}
+                )
+                elapsed = time.perf_counter() - started
+                stats = (await client.get("/stats")).json()
+        assert response.json()["output"][0]["content"][0]["text"] == (
+            "one two three four five"
+        )
+        return elapsed, stats
+
+    elapsed, stats = asyncio.run(run())
+
+    assert elapsed >= 0.1 + 5 / 50
+    assert stats["requests"] == 2
+    assert stats["connections"] == 1
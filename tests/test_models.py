@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import UnexpectedModelBehavior
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.providers.openai import OpenAIProvider
+
+from llm_code.models import IdleTimeoutModel, build_models
+from llm_code.settings import ModelProfile
+
+
+def _stalling_model(stall: float) -> FunctionModel:
+    async def stream(_messages: list[ModelMessage], _info: AgentInfo):
+        yield "Hello"
+        await asyncio.sleep(stall)
+        yield " world"
+
+    return FunctionModel(stream_function=stream)
+
+
+async def _stream_text(agent: Agent) -> str:
+    async with agent.run_stream("go") as result:
+        return await result.get_output()
+
+
+def test_build_models_applies_profiles() -> None:
+    models = build_models(
+        {"openai": OpenAIProvider(api_key="test")},
+        profiles={
+            "gpt-5.4": ModelProfile(effort="high", max_tokens=2000),
+            "gpt-5.3-codex": ModelProfile(stream_idle_timeout=30),
+        },
+    )
+
+    assert models["gpt-5.4"].settings == {"thinking": "high", "max_tokens": 2000}
+    assert isinstance(models["gpt-5.3-codex"], IdleTimeoutModel)
+    assert models["gpt-5.3-codex"].settings is None
+
+
+def test_idle_timeout_model_passes_steady_streams() -> None:
+    agent = Agent(IdleTimeoutModel(_stalling_model(0.0), idle_timeout=1.0))
+
+    assert asyncio.run(_stream_text(agent)) == "Hello world"
+
+
+def test_idle_timeout_model_fails_stalled_streams() -> None:
+    agent = Agent(IdleTimeoutModel(_stalling_model(1.0), idle_timeout=0.01))
+
+    with pytest.raises(UnexpectedModelBehavior, match="sent nothing for 0.01s"):
+        asyncio.run(_stream_text(agent))
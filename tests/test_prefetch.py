@@ -0,0 +1,99 @@
+import asyncio
+import os
+from pathlib import Path
+
+from llm_code.agent import _read_files, use_workspace
+from llm_code.prefetch import ReadCache, read_caches, related_paths
+
+APP_SOURCE = """import json
+import pkg.models
+from pkg import helpers
+from .util import slugify
+"""
+
+
+def _write(root: Path, relative: str, content: str = "") -> None:
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(content, encoding="utf-8")
+
+
+def test_related_paths_predicts_local_imports_and_tests(tmp_path: Path) -> None:
+    for relative in (
+        "src/pkg/__init__.py",
+        "src/pkg/app.py",
+        "src/pkg/models.py",
+        "src/pkg/helpers.py",
+        "src/pkg/util.py",
+        "tests/test_app.py",
+    ):
+        _write(tmp_path, relative)
+
+    assert related_paths(tmp_path, "src/pkg/app.py", APP_SOURCE) == [
+        "src/pkg/models.py",
+        "src/pkg/__init__.py",
+        "src/pkg/helpers.py",
+        "src/pkg/util.py",
+        "tests/test_app.py",
+    ]
+
+
+def test_prefetched_files_are_served_from_the_cache(tmp_path: Path) -> None:
+    _write(tmp_path, "app.py", "import helpers\n")
+    _write(tmp_path, "helpers.py", "VALUE = 1\n")
+    cache = ReadCache(tmp_path, budget=1024)
+
+    cache.read("app.py")
+    assert cache.prefetch(["app.py"]).result() == 1
+    assert cache.read("helpers.py") == "VALUE = 1\n"
+
+    assert cache.stats.reads == 2
+    assert cache.stats.hits == 1
+    assert cache.stats.prefetch_hits == 1
+    assert cache.stats.summary_lines() == [
+        "read cache: 2 reads, 50% hits; prefetched 1 files, 1 used (100%), "
+        "0 dropped unused"
+    ]
+
+
+def test_read_cache_never_returns_stale_contents(tmp_path: Path) -> None:
+    _write(tmp_path, "app.py", "old\n")
+    cache = ReadCache(tmp_path, budget=1024)
+    cache.read("app.py")
+
+    _write(tmp_path, "app.py", "new contents\n")
+    os.utime(tmp_path / "app.py", ns=(1, 1))
+
+    assert cache.read("app.py") == "new contents\n"
+    assert cache.stats.hits == 0
+
+
+def test_read_cache_evicts_least_recently_used_within_budget(tmp_path: Path) -> None:
+    for name in ("a", "b", "c", "d"):
+        _write(tmp_path, f"{name}.py", name * 45)
+    _write(tmp_path, "main.py", "import d\n")
+    cache = ReadCache(tmp_path, budget=180)
+
+    for name in ("a", "b", "c", "a", "main"):
+        cache.read(f"{name}.py")
+    cache.prefetch(["main.py"]).result()
+
+    assert list(cache._entries) == ["c.py", "a.py", "main.py", "d.py"]
+    assert cache._used <= 180
+
+
+def test_read_tool_prefetches_when_enabled(tmp_path: Path) -> None:
+    _write(tmp_path, "app.py", "import helpers\n")
+    _write(tmp_path, "helpers.py", "VALUE = 1\n")
+
+    async def read_twice() -> dict[str, str]:
+        with use_workspace(tmp_path):
+            await _read_files("app.py", prefetch_budget_mb=1)
+            cache = next(c for c in read_caches() if c.root == tmp_path.resolve())
+            await asyncio.wrap_future(cache.prefetch([]))
+            files = await _read_files("helpers.py", prefetch_budget_mb=1)
+            assert cache.stats.prefetch_hits == 1
+            return files
+
+    assert asyncio.run(read_twice()) == {"helpers.py": "VALUE = 1\n"}
+    assert all(cache.root != tmp_path.resolve() for cache in read_caches())
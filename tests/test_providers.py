@@ -0,0 +1,72 @@
+from pydantic_ai.models.google import GoogleModel
+from pydantic_ai.models.openai import OpenAIChatModel, OpenAIResponsesModel
+
+from llm_code.models import OPENAI_MODELS, build_models
+from llm_code.providers import build_providers, provider_configs
+from llm_code.scheduler import ScheduledModel, build_schedulers
+from llm_code.settings import ProviderConfig, Settings
+
+
+def _local_settings(**kwargs) -> Settings:
+    return Settings(
+        providers={
+            "local": ProviderConfig(
+                base_url="http://127.0.0.1:8080/v1",
+                models=["qwen2.5-coder", "gpt-5.4"],
+            )
+        },
+        **kwargs,
+    )
+
+
+def test_provider_configs_enable_builtins_by_api_key() -> None:
+    configs = provider_configs(Settings(google_api_key="g-key"))
+
+    assert list(configs) == ["google"]
+    assert configs["google"].type == "google"
+    assert "gemini-2.5-flash" in configs["google"].models
+
+
+def test_named_providers_override_builtin_fields() -> None:
+    settings = Settings(
+        openai_api_key="sk-test",
+        providers={"openai": ProviderConfig(base_url="http://proxy.internal/v1")},
+    )
+
+    config = provider_configs(settings)["openai"]
+
+    assert config.type == "openai"
+    assert config.api_key == "sk-test"
+    assert config.base_url == "http://proxy.internal/v1"
+    assert config.models == OPENAI_MODELS
+
+
+def test_local_provider_models_use_chat_completions() -> None:
+    settings = _local_settings(openai_api_key="sk-test")
+
+    models = build_models(build_providers(settings), configs=provider_configs(settings))
+
+    local = models["local:qwen2.5-coder"]
+    assert isinstance(local, OpenAIChatModel)
+    assert models["qwen2.5-coder"] is local
+    assert local.base_url == "http://127.0.0.1:8080/v1/"
+    assert isinstance(models["gpt-5.4"], OpenAIResponsesModel)
+    assert isinstance(models["local:gpt-5.4"], OpenAIChatModel)
+
+
+def test_named_providers_get_their_own_scheduler() -> None:
+    settings = _local_settings(google_api_key="g-key")
+    schedulers = build_schedulers(settings)
+
+    models = build_models(
+        build_providers(settings, schedulers=schedulers),
+        schedulers=schedulers,
+        configs=provider_configs(settings),
+    )
+
+    local = models["local:qwen2.5-coder"]
+    assert isinstance(local, ScheduledModel)
+    assert local.scheduler is schedulers["local"]
+    gemini = models["gemini-2.5-flash"]
+    assert isinstance(gemini, ScheduledModel)
+    assert isinstance(gemini.wrapped, GoogleModel)
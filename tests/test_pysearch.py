@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from llm_code.pysearch import Match, search_files
+
+
+def test_search_files_tags_lines_with_every_matching_pattern(tmp_path: Path) -> None:
+    (tmp_path / "a.py").write_text(
+        "alpha\nalpha beta\n\nbeta alpha alpha\nlast", encoding="utf-8"
+    )
+
+    matches = search_files(["alpha", "beta$"], ["a.py"], tmp_path, workers=1)
+
+    assert matches == [
+        Match("a.py", 1, ("alpha",)),
+        Match("a.py", 2, ("alpha", "beta$")),
+        Match("a.py", 4, ("alpha",)),
+    ]
+
+
+def test_search_files_matches_across_worker_processes(tmp_path: Path) -> None:
+    files = []
+    for index in range(300):
+        name = f"file_{index:03d}.txt"
+        (tmp_path / name).write_text(f"line\nneedle_{index}\n", encoding="utf-8")
+        files.append(name)
+
+    matches = search_files([r"needle_\d*7\b"], files, tmp_path, workers=2)
+
+    assert [match.path for match in matches] == [
+        f"file_{index:03d}.txt" for index in range(300) if index % 10 == 7
+    ]
+    assert {match.line_number for match in matches} == {2}
+
+
+def test_search_files_rejects_invalid_patterns(tmp_path: Path) -> None:
+    with pytest.raises(ValueError, match="Invalid pattern"):
+        search_files(["("], [], tmp_path)
@@ -0,0 +1,222 @@
+import asyncio
+import io
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models import Model
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from pydantic_ai.settings import ModelSettings
+from rich.console import Console
+
+from llm_code.agent import use_workspace
+from llm_code.hedging import HedgedModel
+from llm_code.llm_code import _response_cache_key, run_prompt
+from llm_code.response_cache import ResponseCache, TouchLog, text_hash
+
+
+def _touches(files: dict[str, str | None], effects: dict[str, str]) -> TouchLog:
+    return TouchLog(
+        files={
+            path: None if content is None else text_hash(content)
+            for path, content in files.items()
+        },
+        effects=effects,
+    )
+
+
+def test_lookup_hits_when_touched_files_are_unchanged(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    key = ResponseCache.key(model="m", instructions="i", prompt="p")
+
+    assert cache.store(key, _touches({"a.py": "x = 1\n", "new.py": None}, {}), "ok")
+    hit = cache.lookup(key, tmp_path)
+
+    assert hit is not None
+    assert hit.output == "ok"
+    assert (
+        cache.lookup(
+            ResponseCache.key(model="m", instructions="i", prompt="q"), tmp_path
+        )
+        is None
+    )
+
+
+def test_lookup_misses_when_a_touched_file_changed(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    (tmp_path / "a.py").write_text("x = 2\n", encoding="utf-8")
+    key = ResponseCache.key(model="m", instructions="i", prompt="p")
+
+    cache.store(key, _touches({"a.py": "x = 1\n"}, {}), "ok")
+
+    assert cache.lookup(key, tmp_path) is None
+
+
+def test_runs_with_unreplayable_effects_are_not_stored(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    key = ResponseCache.key(model="m", instructions="i", prompt="p")
+
+    assert not cache.store(key, TouchLog(replayable=False), "ok")
+    assert cache.lookup(key, tmp_path) is None
+
+
+def test_expired_entries_are_ignored(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "responses.sqlite", ttl=timedelta(0))
+    key = ResponseCache.key(model="m", instructions="i", prompt="p")
+
+    cache.store(key, TouchLog(), "ok")
+
+    assert cache.lookup(key, tmp_path) is None
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path: Path) -> None:
+    cache = ResponseCache(tmp_path / "responses.sqlite", max_bytes=150)
+    keys = [
+        ResponseCache.key(model="m", instructions="i", prompt=str(index))
+        for index in range(3)
+    ]
+
+    cache.store(keys[0], TouchLog(), "a" * 60)
+    cache.store(keys[1], TouchLog(), "b" * 60)
+    assert cache.lookup(keys[0], tmp_path) is not None
+    cache.store(keys[2], TouchLog(), "c" * 60)
+
+    assert cache.lookup(keys[0], tmp_path) is not None
+    assert cache.lookup(keys[1], tmp_path) is None
+    assert cache.lookup(keys[2], tmp_path) is not None
+
+
+def test_run_prompt_replays_cached_writes_without_the_model(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "a.py").write_text("x = 1\n", encoding="utf-8")
+    calls = 0
+
+    async def stream(messages: list[ModelMessage], _info: AgentInfo):
+        nonlocal calls
+        calls += 1
+        if len(messages) == 1:
+            yield {0: DeltaToolCall(name="read", json_args='{"path": "a.py"}')}
+            yield {
+                1: DeltaToolCall(
+                    name="write", json_args='{"path": "b.py", "content": "y = 2\\n"}'
+                )
+            }
+        else:
+            yield "Wrote b.py"
+
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    model = FunctionModel(stream_function=stream)
+
+    async def run() -> str:
+        output = io.StringIO()
+        with use_workspace(workspace):
+            await run_prompt(
+                "add b",
+                model=model,
+                console=Console(file=output),
+                response_cache=cache,
+            )
+        return output.getvalue()
+
+    assert asyncio.run(run()) == "Wrote b.py\n"
+    assert calls == 2
+    (workspace / "b.py").unlink()
+
+    assert asyncio.run(run()) == "Wrote b.py\n"
+    assert calls == 2
+    assert (workspace / "b.py").read_text(encoding="utf-8") == "y = 2\n"
+
+    (workspace / "a.py").write_text("x = 3\n", encoding="utf-8")
+    asyncio.run(run())
+    assert calls == 4
+
+
+def test_cache_key_includes_generation_settings() -> None:
+    def reply(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        return ModelResponse(parts=[TextPart("ok")])
+
+    keys = {
+        _response_cache_key(FunctionModel(reply, settings=settings), "p", 0)
+        for settings in (
+            None,
+            ModelSettings(max_tokens=100),
+            ModelSettings(max_tokens=200),
+            ModelSettings(temperature=0.0),
+            ModelSettings(thinking="high"),
+        )
+    }
+
+    assert len(keys) == 5
+    assert _response_cache_key(
+        FunctionModel(reply, settings=ModelSettings(timeout=10)), "p", 0
+    ) == _response_cache_key(FunctionModel(reply), "p", 0)
+
+
+def test_cache_key_includes_hedged_models_and_their_settings() -> None:
+    def reply(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        return ModelResponse(parts=[TextPart("ok")])
+
+    def hedged(primary_tokens: int, backup: str, backup_tokens: int) -> Model:
+        return HedgedModel(
+            FunctionModel(
+                reply,
+                model_name="primary",
+                settings=ModelSettings(max_tokens=primary_tokens),
+            ),
+            FunctionModel(
+                reply,
+                model_name=backup,
+                settings=ModelSettings(max_tokens=backup_tokens),
+            ),
+        )
+
+    keys = {
+        _response_cache_key(model, "p", 0)
+        for model in (
+            hedged(100, "backup", 100),
+            hedged(200, "backup", 100),
+            hedged(100, "other-backup", 100),
+            hedged(100, "backup", 200),
+        )
+    }
+
+    assert len(keys) == 4
+
+
+def test_runs_that_scan_the_workspace_are_not_cached(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    calls = 0
+
+    async def stream(messages: list[ModelMessage], _info: AgentInfo):
+        nonlocal calls
+        calls += 1
+        if len(messages) == 1:
+            yield {0: DeltaToolCall(name="search", json_args='{"pattern": "x"}')}
+        else:
+            yield "Found x"
+
+    cache = ResponseCache(tmp_path / "responses.sqlite")
+    model = FunctionModel(stream_function=stream)
+
+    async def run() -> None:
+        with use_workspace(tmp_path):
+            await run_prompt(
+                "find x",
+                model=model,
+                console=Console(file=io.StringIO()),
+                response_cache=cache,
+            )
+
+    asyncio.run(run())
+    asyncio.run(run())
+
+    assert calls == 4
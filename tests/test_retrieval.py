@@ -0,0 +1,68 @@
+import asyncio
+import os
+from pathlib import Path
+
+from llm_code.agent import _retrieve
+from llm_code.retrieval import RetrievalIndex, chunk_file
+
+
+def test_chunk_file_uses_symbols_and_windows(tmp_path: Path) -> None:
+    source = "import os\n\n\ndef first():\n    return 1\n\n\nclass Second:\n    pass\n"
+    path = tmp_path / "app.py"
+    path.write_text(source, encoding="utf-8")
+
+    chunks = chunk_file(path, "app.py", source)
+
+    assert [(c.name, c.start_line, c.end_line) for c in chunks] == [
+        (None, 1, 3),
+        ("first", 4, 5),
+        ("Second", 8, 9),
+    ]
+
+
+def test_search_ranks_chunks_by_identifier_parts(tmp_path: Path) -> None:
+    (tmp_path / "agent.py").write_text(
+        "def build_agent(model):\n    return Agent(model)\n\n\n"
+        "def parse_config(path):\n    return load(path)\n",
+        encoding="utf-8",
+    )
+    (tmp_path / "notes.md").write_text("How the agent is built.\n", encoding="utf-8")
+    index = RetrievalIndex(tmp_path, tmp_path / "index.sqlite")
+
+    results = index.search("build agent", k=2)
+
+    assert results[0]["path"] == "agent.py"
+    assert results[0]["name"] == "build_agent"
+    assert results[0]["lines"] == "1-2"
+    assert len(results) == 2
+
+
+def test_refresh_only_rechunks_changed_files(tmp_path: Path) -> None:
+    (tmp_path / "a.py").write_text("def alpha():\n    pass\n", encoding="utf-8")
+    (tmp_path / "b.py").write_text("def beta():\n    pass\n", encoding="utf-8")
+    index = RetrievalIndex(tmp_path, tmp_path / "index.sqlite")
+    assert index.refresh() == 2
+    assert index.refresh() == 0
+
+    (tmp_path / "a.py").write_text("def gamma():\n    pass\n", encoding="utf-8")
+    os.utime(tmp_path / "a.py", ns=(1, 1))
+    (tmp_path / "b.py").unlink()
+
+    assert index.refresh() == 2
+    assert index.search("alpha") == []
+    assert [result["name"] for result in index.search("gamma")] == ["gamma"]
+
+
+def test_retrieve_uses_the_workspace_index(tmp_path: Path, monkeypatch) -> None:
+    workspace = tmp_path / "workspace"
+    workspace.mkdir()
+    (workspace / "server.py").write_text(
+        "class HttpServer:\n    pass\n", encoding="utf-8"
+    )
+    monkeypatch.chdir(workspace)
+    monkeypatch.setenv("XDG_DATA_HOME", str(tmp_path / "data"))
+
+    results = asyncio.run(_retrieve("http server"))
+
+    assert [result["name"] for result in results] == ["HttpServer"]
+    assert list((tmp_path / "data" / "llm_code" / "retrieval").glob("*.sqlite"))
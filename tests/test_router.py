@@ -0,0 +1,73 @@
+from pydantic_ai import Agent
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from llm_code.router import RoutedModel, classify
+
+
+def _echo_model(name: str, seen: list[object]) -> FunctionModel:
+    def respond(_messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        seen.append((info.model_settings or {}).get("thinking"))
+        return ModelResponse(parts=[TextPart(name)])
+
+    return FunctionModel(respond, model_name=name)
+
+
+def test_classify_sends_short_questions_to_fast_route() -> None:
+    route, _reason = classify([ModelRequest.user_text_prompt("what does main do?")])
+
+    assert route == "fast"
+
+
+def test_classify_sends_edits_and_long_prompts_to_heavy_route() -> None:
+    assert classify([ModelRequest.user_text_prompt("rename foo to bar")])[0] == "heavy"
+    assert classify([ModelRequest.user_text_prompt("why " * 200)])[0] == "heavy"
+    assert classify([ModelRequest.user_text_prompt("1. read\n2. test")])[0] == "heavy"
+
+
+def test_classify_escalates_runs_that_write_files() -> None:
+    messages: list[ModelMessage] = [
+        ModelRequest.user_text_prompt("what does main do?"),
+        ModelResponse(parts=[ToolCallPart("write", {"path": "a.py"}, "call-1")]),
+        ModelRequest(parts=[ToolReturnPart("write", "ok", "call-1")]),
+    ]
+
+    route, reason = classify(messages)
+
+    assert route == "heavy"
+    assert "write" in reason
+
+
+def test_routed_model_uses_fast_model_with_low_effort() -> None:
+    fast_seen: list[object] = []
+    heavy_seen: list[object] = []
+    model = RoutedModel(
+        _echo_model("fast", fast_seen),
+        _echo_model("heavy", heavy_seen),
+        heavy_effort="high",
+    )
+    agent = Agent(model)
+
+    assert agent.run_sync("what does main do?").output == "fast"
+    assert agent.run_sync("refactor main").output == "heavy"
+    assert fast_seen == ["low"]
+    assert heavy_seen == ["high"]
+    assert [d.route for d in model.routes.decisions] == ["fast", "heavy"]
+
+
+def test_routed_model_honors_route_override() -> None:
+    model = RoutedModel(
+        _echo_model("fast", []),
+        _echo_model("heavy", []),
+        route="heavy",
+    )
+
+    assert Agent(model).run_sync("what does main do?").output == "heavy"
+    assert model.routes.decisions[0].reason == "route override"
@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+from openai import AsyncOpenAI
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelMessage, ModelResponse, TextPart
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+from pydantic_ai.models.openai import OpenAIChatModel
+from pydantic_ai.providers.openai import OpenAIProvider
+
+from llm_code.scheduler import RateLimitScheduler, ScheduledModel, _parse_reset
+
+
+def test_parse_reset_handles_openai_durations() -> None:
+    assert _parse_reset("6m0s") == 360
+    assert _parse_reset("1.5s") == 1.5
+    assert _parse_reset("20ms") == pytest.approx(0.02)
+
+
+def test_observe_blocks_until_request_budget_resets() -> None:
+    scheduler = RateLimitScheduler("openai")
+
+    scheduler.observe(
+        200,
+        httpx.Headers(
+            {
+                "x-ratelimit-remaining-requests": "0",
+                "x-ratelimit-reset-requests": "2s",
+            }
+        ),
+    )
+
+    assert 1.5 < scheduler.delay() <= 2
+
+
+def test_observe_honors_retry_after_on_429() -> None:
+    scheduler = RateLimitScheduler("anthropic")
+
+    scheduler.observe(429, httpx.Headers({"retry-after": "3"}))
+
+    assert 2.5 < scheduler.delay() <= 3
+    assert scheduler.metrics.rate_limited == 1
+
+
+def test_scheduled_model_retries_retryable_errors() -> None:
+    calls = 0
+
+    def flaky(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise ModelHTTPError(status_code=529, model_name="test")
+        return ModelResponse(parts=[TextPart("ok")])
+
+    scheduler = RateLimitScheduler("test", backoff_base=0.001)
+    model = ScheduledModel(FunctionModel(flaky), scheduler)
+
+    result = Agent(model).run_sync("go")
+
+    assert result.output == "ok"
+    assert calls == 3
+    assert scheduler.metrics.retries == 2
+    assert scheduler.metrics.summary()["requests"] == 3
+
+
+def test_scheduled_model_does_not_retry_client_errors() -> None:
+    def rejected(_messages: list[ModelMessage], _info: AgentInfo) -> ModelResponse:
+        raise ModelHTTPError(status_code=400, model_name="test")
+
+    model = ScheduledModel(FunctionModel(rejected), RateLimitScheduler("test"))
+
+    with pytest.raises(ModelHTTPError):
+        Agent(model).run_sync("go")
+
+
+def test_scheduled_model_retries_connection_errors() -> None:
+    calls = 0
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        nonlocal calls
+        calls += 1
+        if calls == 1:
+            raise httpx.ConnectError("connection reset", request=request)
+        return httpx.Response(
+            200,
+            json={
+                "id": "chatcmpl-1",
+                "object": "chat.completion",
+                "created": 0,
+                "model": "gpt-test",
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "ok"},
+                        "finish_reason": "stop",
+                    }
+                ],
+            },
+        )
+
+    client = AsyncOpenAI(
+        api_key="test",
+        http_client=httpx.AsyncClient(transport=httpx.MockTransport(handler)),
+        max_retries=0,
+    )
+    scheduler = RateLimitScheduler("openai", backoff_base=0.001)
+    model = ScheduledModel(
+        OpenAIChatModel("gpt-test", provider=OpenAIProvider(openai_client=client)),
+        scheduler,
+    )
+
+    result = Agent(model).run_sync("go")
+
+    assert result.output == "ok"
+    assert calls == 2
+    assert scheduler.metrics.retries == 1
+
+
+def test_slot_limits_concurrency_and_records_queue_wait() -> None:
+    scheduler = RateLimitScheduler("test", max_concurrency=1)
+
+    async def hold() -> None:
+        async with scheduler.slot():
+            await asyncio.sleep(0.05)
+
+    async def run_both() -> None:
+        await asyncio.gather(hold(), hold())
+
+    started = time.monotonic()
+    asyncio.run(run_both())
+
+    assert time.monotonic() - started >= 0.1
+    assert scheduler.metrics.summary()["wait_max"] >= 0.04
@@ -3,6 +3,8 @@ from pathlib import Path
 import pytest
 
 from llm_code.settings import (
+    ModelProfile,
+    ProviderConfig,
     Settings,
     _get_project_config,
     _get_user_config,
@@ -104,9 +106,7 @@ def test_api_key_from_config_file(
     assert settings.api_key == "sk-from-config"
 
 
-def test_api_key_from_env_var(
-    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
-) -> None:
+def test_api_key_from_env_var(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     home_dir = tmp_path / "home"
     monkeypatch.setattr(Path, "home", lambda: home_dir)
 
@@ -159,3 +159,99 @@ def test_get_user_config_prefers_toml_over_yaml(
     config = _get_user_config()
 
     assert config == {"model": "toml-model"}
+
+
+def test_settings_load_merges_model_profiles_per_field(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    xdg_config_home = tmp_path / "xdg-config"
+    monkeypatch.setenv("XDG_CONFIG_HOME", str(xdg_config_home))
+    user_config = xdg_config_home / "llm_code" / "config.toml"
+    user_config.parent.mkdir(parents=True)
+    user_config.write_text(
+        '[model_profiles."gpt-5.4"]\neffort = "high"\nrequest_timeout = 120\n\n'
+        '[model_profiles."claude-opus-4-6"]\nmax_tokens = 8000\n',
+        encoding="utf-8",
+    )
+    project_dir = tmp_path / "workspace"
+    project_dir.mkdir()
+    (project_dir / ".config.yaml").write_text(
+        "model_profiles:\n  gpt-5.4:\n    effort: low\n    temperature: 0.2\n",
+        encoding="utf-8",
+    )
+
+    settings = Settings.load(cwd=project_dir, env={})
+
+    profile = settings.model_profiles["gpt-5.4"]
+    assert (profile.effort, profile.request_timeout, profile.temperature) == (
+        "low",
+        120,
+        0.2,
+    )
+    assert settings.model_profiles["claude-opus-4-6"].max_tokens == 8000
+    assert profile.model_settings() == {
+        "thinking": "low",
+        "temperature": 0.2,
+        "timeout": 120,
+    }
+
+
+def test_profiles_apply_top_level_overrides_to_the_main_model() -> None:
+    settings = Settings(
+        model="gpt-5.4",
+        effort="xhigh",
+        max_tokens=500,
+        model_profiles={
+            "gpt-5.4": ModelProfile(effort="low", temperature=0.5),
+            "gpt-5.3-codex": ModelProfile(effort="low"),
+        },
+    )
+
+    profiles = settings.profiles()
+
+    assert profiles["gpt-5.4"].model_settings() == {
+        "thinking": "xhigh",
+        "max_tokens": 500,
+        "temperature": 0.5,
+    }
+    assert profiles["gpt-5.3-codex"].effort == "low"
+    assert settings.model_profiles["gpt-5.4"].effort == "low"
+
+
+def test_profile_overrides_go_to_the_qualified_profile_of_a_bare_model() -> None:
+    settings = Settings(
+        model="gpt-5.4",
+        effort="xhigh",
+        model_profiles={
+            "openai:gpt-5.4": ModelProfile(effort="low", temperature=0.5),
+        },
+    )
+    configs = {
+        "local": ProviderConfig(models=["qwen2.5-coder"]),
+        "openai": ProviderConfig(type="openai", models=["gpt-5.4"]),
+    }
+
+    profiles = settings.profiles(configs)
+
+    assert profiles["openai:gpt-5.4"].effort == "xhigh"
+    assert profiles["openai:gpt-5.4"].temperature == 0.5
+    assert "gpt-5.4" not in profiles
+
+
+def test_profile_overrides_for_a_qualified_model_keep_its_bare_profile() -> None:
+    settings = Settings(
+        model="openai:gpt-5.4",
+        max_tokens=500,
+        model_profiles={
+            "gpt-5.4": ModelProfile(temperature=0.5, request_timeout=30),
+        },
+    )
+
+    profiles = settings.profiles()
+
+    assert profiles["openai:gpt-5.4"].model_settings() == {
+        "max_tokens": 500,
+        "temperature": 0.5,
+        "timeout": 30,
+    }
+    assert profiles["gpt-5.4"].max_tokens is None
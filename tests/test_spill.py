@@ -0,0 +1,145 @@
+import os
+from datetime import timedelta
+from pathlib import Path
+
+import pytest
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+)
+from pydantic_ai.models.function import AgentInfo, FunctionModel
+
+from llm_code.agent import build_agent
+from llm_code.spill import SpillStore, prune_sessions
+
+
+def test_small_results_stay_inline(tmp_path: Path) -> None:
+    store = SpillStore(tmp_path)
+
+    assert store.spill({"a.py": "x = 1\n"}, limit=100) == {"a.py": "x = 1\n"}
+    assert not tmp_path.exists() or not any(tmp_path.iterdir())
+
+
+def test_large_results_are_replaced_by_a_handle(tmp_path: Path) -> None:
+    store = SpillStore(tmp_path)
+    content = "".join(f"line {index}\n" for index in range(500))
+
+    spilled = store.spill({"a.py": content, "b.py": "short"}, limit=1000)
+
+    assert spilled["spilled"] is True
+    assert spilled["outline"] == {
+        "a.py": f"{len(content)} chars, 501 lines",
+        "b.py": "short",
+    }
+    assert spilled["preview"].startswith("--- a.py ---\nline 0\n")
+    assert (
+        store.spill({"a.py": content, "b.py": "short"}, limit=1000)["handle"]
+        == (spilled["handle"])
+    )
+    assert len(list(tmp_path.iterdir())) == 1
+
+    chunks = []
+    offset = 0
+    while offset is not None:
+        page = store.fetch(spilled["handle"], offset=offset, length=2000)
+        chunks.append(page["content"])
+        offset = page["next_offset"]
+    assert "".join(chunks) == f'--- a.py ---\n{content}\nb.py: "short"'
+    assert page["total_chars"] == spilled["total_chars"]
+
+
+def test_fetch_rejects_unknown_handles(tmp_path: Path) -> None:
+    store = SpillStore(tmp_path)
+
+    with pytest.raises(ValueError, match="Invalid handle"):
+        store.fetch("../secret")
+    with pytest.raises(ValueError, match="Unknown handle"):
+        store.fetch("0" * 16)
+
+
+def test_agent_spills_bash_output_and_fetches_it(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    returns: list[ToolReturnPart] = []
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        returns[:] = [
+            part
+            for message in messages
+            if isinstance(message, ModelRequest)
+            for part in message.parts
+            if isinstance(part, ToolReturnPart)
+        ]
+        if not returns:
+            return ModelResponse(
+                parts=[ToolCallPart("bash", {"command": "seq 1 5000"})]
+            )
+        if len(returns) == 1:
+            handle = returns[0].model_response_object()["handle"]
+            args = {"handle": handle, "offset": 0, "length": 40}
+            return ModelResponse(parts=[ToolCallPart("fetch", args)])
+        return ModelResponse(parts=[TextPart("done")])
+
+    agent = build_agent(FunctionModel(respond), spill_chars=1000, session_id="s1")
+    agent.run_sync("count")
+
+    bash_result, fetched = (part.model_response_object() for part in returns)
+    assert bash_result["outline"]["returncode"] == 0
+    assert fetched["content"].startswith("returncode: 0\n--- stdout ---\n1\n2\n")
+    assert (tmp_path / "cache" / "llm_code" / "spill" / "s1").is_dir()
+
+
+def test_single_file_reads_are_never_spilled(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("XDG_CACHE_HOME", str(tmp_path / "cache"))
+    content = "x = 1\n" * 1000
+    (tmp_path / "a.py").write_text(content, encoding="utf-8")
+    (tmp_path / "b.py").write_text(content, encoding="utf-8")
+    returns: list[ToolReturnPart] = []
+
+    def respond(messages: list[ModelMessage], info: AgentInfo) -> ModelResponse:
+        returns[:] = [
+            part
+            for message in messages
+            if isinstance(message, ModelRequest)
+            for part in message.parts
+            if isinstance(part, ToolReturnPart)
+        ]
+        if not returns:
+            return ModelResponse(
+                parts=[
+                    ToolCallPart("read", {"path": "a.py"}),
+                    ToolCallPart("read", {"path": "*.py"}),
+                ]
+            )
+        return ModelResponse(parts=[TextPart("done")])
+
+    agent = build_agent(FunctionModel(respond), spill_chars=1000, session_id="s1")
+    agent.run_sync("read")
+
+    single, several = (part.model_response_object() for part in returns)
+    assert single == {"a.py": content}
+    assert several["spilled"] is True
+
+
+def test_prune_sessions_removes_stale_stores(tmp_path: Path) -> None:
+    stale = tmp_path / "old"
+    fresh = tmp_path / "new"
+    for directory in (stale, fresh):
+        directory.mkdir()
+        (directory / f"{'0' * 16}.txt").write_text("x", encoding="utf-8")
+    os.utime(stale, (0, 0))
+
+    removed = prune_sessions(tmp_path, max_age=timedelta(days=1), keep=tmp_path / "s")
+
+    assert removed == 1
+    assert not stale.exists()
+    assert fresh.is_dir()
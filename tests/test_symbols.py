@@ -0,0 +1,125 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pytest
+
+from llm_code import symbols
+from llm_code.agent import _find_symbol, _outline_files
+from llm_code.symbols import SymbolIndex, release_symbol_index, symbol_index
+from llm_code.watcher import release_watcher, workspace_watcher
+
+PYTHON_SOURCE = """class Greeter(Base):
+    def greet(self, name: str) -> str:
+        return f"hi {name}"
+
+
+async def main() -> None:
+    pass
+"""
+
+
+def test_outline_lists_python_symbols_with_line_ranges(tmp_path: Path) -> None:
+    (tmp_path / "app.py").write_text(PYTHON_SOURCE, encoding="utf-8")
+
+    symbols = SymbolIndex(tmp_path).outline("app.py")
+
+    assert [symbol.as_dict() for symbol in symbols] == [
+        {
+            "name": "Greeter",
+            "kind": "class",
+            "signature": "class Greeter(Base)",
+            "path": "app.py",
+            "lines": "1-3",
+        },
+        {
+            "name": "Greeter.greet",
+            "kind": "method",
+            "signature": "def greet(self, name: str) -> str",
+            "path": "app.py",
+            "lines": "2-3",
+        },
+        {
+            "name": "main",
+            "kind": "function",
+            "signature": "async def main() -> None",
+            "path": "app.py",
+            "lines": "6-7",
+        },
+    ]
+
+
+def test_outline_falls_back_to_regex_for_other_languages(tmp_path: Path) -> None:
+    (tmp_path / "main.go").write_text(
+        "package main\n\ntype Server struct{}\n\nfunc (s *Server) Run() {\n}\n",
+        encoding="utf-8",
+    )
+
+    symbols = SymbolIndex(tmp_path).outline("main.go")
+
+    assert [(s.name, s.kind, s.start_line, s.end_line) for s in symbols] == [
+        ("Server", "type", 3, 4),
+        ("Run", "function", 5, 6),
+    ]
+
+
+def test_index_reparses_only_changed_files(tmp_path: Path) -> None:
+    source = tmp_path / "app.py"
+    source.write_text("def old() -> None:\n    pass\n", encoding="utf-8")
+    index = SymbolIndex(tmp_path)
+    assert [symbol.name for symbol in index.find("old")] == ["old"]
+
+    source.write_text("def new() -> None:\n    pass\n", encoding="utf-8")
+    os.utime(source, ns=(1, 1))
+
+    assert index.find("old") == []
+    assert [symbol.name for symbol in index.find("new")] == ["new"]
+
+
+def test_shared_index_is_built_once_across_threads(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    class SlowIndex(SymbolIndex):
+        def __init__(self, *args, **kwargs) -> None:
+            time.sleep(0.05)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(symbols, "SymbolIndex", SlowIndex)
+    try:
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            indexes = list(pool.map(symbol_index, [tmp_path] * 4))
+
+        assert all(index is indexes[0] for index in indexes)
+        assert len(workspace_watcher(tmp_path)._subscribers) == 1
+    finally:
+        release_symbol_index(tmp_path)
+        release_watcher(tmp_path)
+
+
+def test_find_symbol_matches_qualified_names(tmp_path: Path, monkeypatch) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "app.py").write_text(PYTHON_SOURCE, encoding="utf-8")
+
+    exact = asyncio.run(_find_symbol("Greeter.greet"))
+    fuzzy = asyncio.run(_find_symbol("greet"))
+    outline = asyncio.run(_outline_files("*.py"))
+
+    assert [symbol["lines"] for symbol in exact] == ["2-3"]
+    assert [symbol["name"] for symbol in fuzzy] == ["Greeter.greet"]
+    assert list(outline) == ["app.py"]
+
+
+def test_repo_map_stays_within_token_budget(tmp_path: Path) -> None:
+    for index in range(20):
+        (tmp_path / f"module_{index:02d}.py").write_text(
+            PYTHON_SOURCE, encoding="utf-8"
+        )
+
+    full = SymbolIndex(tmp_path).repo_map(token_budget=10_000)
+    small = SymbolIndex(tmp_path).repo_map(token_budget=100)
+
+    assert "    def greet(self, name: str) -> str  # L2" in full
+    assert len(small) <= 400
+    assert small.startswith("module_00.py:\n  class Greeter(Base)  # L1")
@@ -1,4 +1,16 @@
-from llm_code.tui import PromptInput
+import asyncio
+import json
+from pathlib import Path
+
+import pytest
+from pydantic_ai.messages import ModelMessage
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+from pydantic_ai.models.test import TestModel
+from textual.widgets import TextArea
+
+from llm_code.limits import RunLimits
+from llm_code.tui import LlmCodeApp, PromptInput
+from llm_code.usage import UsageLedger
 
 
 def test_prompt_input_binds_enter_to_submit() -> None:
@@ -22,3 +34,49 @@ def test_prompt_input_submit_action_posts_message(monkeypatch) -> None:
     prompt.action_submit()
 
     assert posted == {"prompt": "hello"}
+
+
+def test_transcript_keeps_only_the_end(monkeypatch) -> None:
+    monkeypatch.setattr("llm_code.tui.TRANSCRIPT_KEEP_CHARS", 100)
+
+    async def run() -> str:
+        app = LlmCodeApp(model=TestModel())
+        async with app.run_test():
+            for index in range(50):
+                app._append_transcript(f"line {index}\n")
+            return app.query_one("#output", TextArea).text
+
+    text = asyncio.run(run())
+
+    assert text.startswith("[earlier transcript trimmed]\n")
+    assert len(text) <= 100 + len("[earlier transcript trimmed]\n")
+    assert text.endswith("line 49\n")
+    assert "line 0\n" not in text
+
+
+def test_turns_stopped_by_a_limit_are_recorded(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "a.py").write_text("x = 1\n", encoding="utf-8")
+    ledger = UsageLedger(tmp_path / "usage.db")
+
+    async def stream(_messages: list[ModelMessage], _info: AgentInfo):
+        yield {0: DeltaToolCall(name="read", json_args=json.dumps({"path": "a.py"}))}
+
+    async def run() -> str:
+        app = LlmCodeApp(
+            model=FunctionModel(stream_function=stream),
+            ledger=ledger,
+            limits=RunLimits(requests=1),
+        )
+        async with app.run_test():
+            await app._run_prompt("read a.py")
+            return app.query_one("#output", TextArea).text
+
+    text = asyncio.run(run())
+
+    assert "[stopped early]" in text
+    [row] = ledger.summarize(group_by=["model"])
+    assert row["runs"] == 1
+    assert row["requests"] == 1
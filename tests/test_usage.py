@@ -0,0 +1,151 @@
+from datetime import UTC, date, datetime
+from pathlib import Path
+
+import pytest
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.usage import RequestUsage, RunUsage
+
+from llm_code.usage import UsageLedger, find_project_root
+
+
+def _usage(**kwargs) -> RunUsage:
+    return RunUsage(requests=1, input_tokens=100, output_tokens=20, **kwargs)
+
+
+def test_ledger_summarizes_by_model(tmp_path: Path) -> None:
+    ledger = UsageLedger(tmp_path / "usage.db")
+    ledger.record(model="a", usage=_usage(), duration_seconds=1.5, project=tmp_path)
+    ledger.record(
+        model="a",
+        usage=_usage(details={"reasoning_tokens": 7}, tool_calls=2),
+        duration_seconds=0.5,
+        project=tmp_path,
+        cost=0.25,
+    )
+    ledger.record(model="b", usage=_usage(), duration_seconds=1.0, project=tmp_path)
+
+    rows = ledger.summarize(group_by=["model"])
+
+    assert [row["model"] for row in rows] == ["a", "b"]
+    assert rows[0]["runs"] == 2
+    assert rows[0]["input_tokens"] == 200
+    assert rows[0]["thinking_tokens"] == 7
+    assert rows[0]["tool_calls"] == 2
+    assert rows[0]["duration_seconds"] == pytest.approx(2.0)
+    assert rows[0]["cost"] == pytest.approx(0.25)
+
+
+def test_ledger_filters_by_day(tmp_path: Path) -> None:
+    ledger = UsageLedger(tmp_path / "usage.db")
+    ledger.record(
+        model="a",
+        usage=_usage(),
+        duration_seconds=1.0,
+        project=tmp_path,
+        created_at=datetime(2026, 1, 1, tzinfo=UTC),
+    )
+    ledger.record(
+        model="a",
+        usage=_usage(),
+        duration_seconds=1.0,
+        project=tmp_path,
+        created_at=datetime(2026, 2, 1, tzinfo=UTC),
+    )
+
+    rows = ledger.summarize(group_by=["day"], since=date(2026, 1, 15))
+
+    assert rows == [
+        {
+            "day": "2026-02-01",
+            "runs": 1,
+            "requests": 1,
+            "input_tokens": 100,
+            "output_tokens": 20,
+            "cache_read_tokens": 0,
+            "cache_write_tokens": 0,
+            "thinking_tokens": 0,
+            "tool_calls": 0,
+            "duration_seconds": 1.0,
+            "cost": 0.0,
+        }
+    ]
+
+
+def test_record_run_splits_usage_across_the_models_that_answered(
+    tmp_path: Path,
+) -> None:
+    ledger = UsageLedger(tmp_path / "usage.db")
+    messages = [
+        ModelResponse(
+            parts=[TextPart("plan")],
+            usage=RequestUsage(input_tokens=100, output_tokens=20),
+            model_name="heavy",
+        ),
+        ModelResponse(
+            parts=[TextPart("done")],
+            usage=RequestUsage(input_tokens=10, output_tokens=2),
+            model_name="fast",
+        ),
+    ]
+    # A delegated subtask's 50 input tokens are not on any response.
+    usage = RunUsage(requests=2, input_tokens=160, output_tokens=22, tool_calls=3)
+
+    ledger.record_run(
+        model="routed",
+        messages=messages,
+        usage=usage,
+        duration_seconds=4.0,
+        project=tmp_path,
+    )
+
+    rows = {row["model"]: row for row in ledger.summarize(group_by=["model"])}
+    assert set(rows) == {"fast", "heavy"}
+    assert rows["heavy"]["runs"] == 0
+    assert rows["heavy"]["input_tokens"] == 100
+    assert rows["heavy"]["tool_calls"] == 1
+    assert rows["heavy"]["duration_seconds"] == pytest.approx(2.0)
+    assert rows["fast"]["runs"] == 1
+    assert rows["fast"]["input_tokens"] == 60
+    assert rows["fast"]["output_tokens"] == 2
+    assert rows["fast"]["tool_calls"] == 2
+
+
+def test_record_run_uses_the_answering_model_name(tmp_path: Path) -> None:
+    ledger = UsageLedger(tmp_path / "usage.db")
+    messages = [ModelResponse(parts=[TextPart("ok")], model_name="backup")]
+
+    ledger.record_run(
+        model="primary",
+        messages=messages,
+        usage=_usage(),
+        duration_seconds=1.0,
+        project=tmp_path,
+    )
+    ledger.record_run(
+        model="primary",
+        messages=[],
+        usage=_usage(),
+        duration_seconds=1.0,
+        project=tmp_path,
+    )
+
+    rows = ledger.summarize(group_by=["model"])
+    assert [(row["model"], row["runs"]) for row in rows] == [
+        ("backup", 1),
+        ("primary", 1),
+    ]
+
+
+def test_ledger_rejects_unknown_grouping(tmp_path: Path) -> None:
+    ledger = UsageLedger(tmp_path / "usage.db")
+
+    with pytest.raises(ValueError, match="Unknown usage grouping"):
+        ledger.summarize(group_by=["session"])
+
+
+def test_find_project_root_walks_up_to_git_dir(tmp_path: Path) -> None:
+    (tmp_path / ".git").mkdir()
+    nested = tmp_path / "src" / "pkg"
+    nested.mkdir(parents=True)
+
+    assert find_project_root(nested) == tmp_path.resolve()
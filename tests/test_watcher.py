@@ -0,0 +1,116 @@
+import time
+from pathlib import Path
+
+import pytest
+
+from llm_code.retrieval import RetrievalIndex
+from llm_code.symbols import SymbolIndex
+from llm_code.watcher import DirtyPaths, WorkspaceWatcher, expand_changes
+
+
+def _wait_for(dirty: DirtyPaths, timeout: float = 5.0) -> set[str]:
+    deadline = time.monotonic() + timeout
+    changed: set[str] = set()
+    while time.monotonic() < deadline:
+        paths = dirty.drain()
+        assert paths is not None
+        changed |= paths
+        if changed:
+            return changed
+        time.sleep(0.01)
+    return changed
+
+
+@pytest.mark.parametrize("use_inotify", [True, False])
+def test_watcher_reports_written_files(tmp_path: Path, use_inotify: bool) -> None:
+    (tmp_path / "pkg").mkdir()
+    watcher = WorkspaceWatcher(tmp_path, poll_interval=0.02, use_inotify=use_inotify)
+    dirty = watcher.subscribe()
+    watcher.start()
+    try:
+        assert dirty.drain() is None
+        (tmp_path / "pkg" / "app.py").write_text("x = 1\n", encoding="utf-8")
+
+        assert "pkg/app.py" in _wait_for(dirty)
+    finally:
+        watcher.stop()
+
+
+def test_inotify_changes_are_seen_without_waiting(tmp_path: Path) -> None:
+    watcher = WorkspaceWatcher(tmp_path)
+    if watcher.backend != "inotify":
+        pytest.skip("inotify is not available")
+    dirty = watcher.subscribe()
+    watcher.start()
+    try:
+        dirty.drain()
+        (tmp_path / "new").mkdir()
+        (tmp_path / "new" / "mod.py").write_text("x = 1\n", encoding="utf-8")
+        _wait_for(dirty)
+        (tmp_path / "new" / "mod.py").write_text("x = 2\n", encoding="utf-8")
+
+        assert dirty.drain() == {"new/mod.py"}
+    finally:
+        watcher.stop()
+
+
+def test_watcher_skips_vendored_directories(tmp_path: Path) -> None:
+    watcher = WorkspaceWatcher(tmp_path, use_inotify=False)
+    (tmp_path / "node_modules").mkdir()
+    (tmp_path / "node_modules" / "lib.js").write_text("x", encoding="utf-8")
+    (tmp_path / "app.py").write_text("x = 1\n", encoding="utf-8")
+
+    assert set(watcher._scan()) == {"app.py"}
+
+
+def test_expand_changes_covers_created_and_deleted_directories(
+    tmp_path: Path,
+) -> None:
+    (tmp_path / "new" / "sub").mkdir(parents=True)
+    (tmp_path / "new" / "sub" / "a.py").write_text("", encoding="utf-8")
+
+    files = expand_changes(
+        tmp_path, {"new", "old"}, ["old/b.py", "old/c/d.py", "other.py"]
+    )
+
+    assert files == {"new/sub/a.py", "old/b.py", "old/c/d.py", "old"}
+
+
+def test_dirty_paths_rescan_after_overflow() -> None:
+    dirty = DirtyPaths()
+    dirty.drain()
+    dirty.add({"a.py"})
+    dirty.add(None)
+    dirty.add({"b.py"})
+
+    assert dirty.drain() is None
+    assert dirty.drain() == set()
+
+
+def test_indexes_only_check_changed_paths(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    (tmp_path / "app.py").write_text("def old():\n    pass\n", encoding="utf-8")
+    symbols_changes = DirtyPaths()
+    retrieval_changes = DirtyPaths()
+    symbols = SymbolIndex(tmp_path, changes=symbols_changes)
+    retrieval = RetrievalIndex(
+        tmp_path, tmp_path / "index.sqlite", changes=retrieval_changes
+    )
+    assert [symbol.name for symbol in symbols.find("old")] == ["old"]
+    assert retrieval.refresh() == 1
+
+    def fail_walk(*_args: object) -> None:
+        raise AssertionError("full walk")
+
+    monkeypatch.setattr("llm_code.symbols.walk_files", fail_walk)
+    monkeypatch.setattr("llm_code.retrieval.walk_files", fail_walk)
+    (tmp_path / "app.py").write_text("def renamed():\n    pass\n", encoding="utf-8")
+    (tmp_path / "gone.py").write_text("", encoding="utf-8")
+    symbols_changes.add({"app.py"})
+    retrieval_changes.add({"app.py"})
+
+    assert [symbol.name for symbol in symbols.find("renamed")] == ["renamed"]
+    assert symbols.find("old") == []
+    assert retrieval.refresh() == 1
+    assert retrieval.search("renamed")[0]["path"] == "app.py"